@@ -1,22 +1,56 @@
 # Author - Akshita Patil
 
+import collections
+import itertools
+
 import grpc
 import data_model_pb2_grpc, data_model_pb2
+import batching
+import bulk_io
+import idempotency
+import replication
+import resilience
+import routing
+import tracing
 
 
 # A client class for interacting with the Reddit gRPC service.
 
 class RedditClient:
-    def __init__(self, host='localhost', port=50053):
+    def __init__(self, host='localhost', port=50053, replicas=None, read_your_writes=False, nodes=None,
+                 tracer=None, call_options=None):
         """
                Initializes the RedditClient.
 
                Args:
                    host (str): The hostname or IP address of the gRPC server. Defaults to 'localhost'.
                    port (int): The port number of the gRPC server. Defaults to 50053.
+                   replicas (list): 'host:port' addresses of read-only followers. Reads are spread
+                       across them; writes always go to the server at host:port.
+                   read_your_writes (bool): Make replicas wait until they have applied this
+                       client's latest write before answering a read.
+                   nodes (list): 'host:port' addresses of partitioned nodes. When given, every RPC is
+                       routed to the node owning its post by consistent hashing, and host/port are unused.
+                   tracer (tracing.Tracer): Traces calls and propagates the trace to the server through
+                       gRPC metadata. Calls are not traced when omitted.
+                   call_options (dict): Method name -> resilience.CallOptions, overriding the default
+                       deadline, retry policy and hedging of those methods.
                """
-        channel = grpc.insecure_channel(f'{host}:{port}')
-        self.stub = data_model_pb2_grpc.RedditServiceStub(channel)
+        if nodes:
+            self.stub = routing.PartitionedStub(nodes)
+        else:
+            channel = grpc.insecure_channel(f'{host}:{port}')
+            self.stub = data_model_pb2_grpc.RedditServiceStub(channel)
+        self.read_stubs = [data_model_pb2_grpc.RedditServiceStub(grpc.insecure_channel(address))
+                           for address in replicas or []]
+        self.read_your_writes = read_your_writes
+        self.last_write_seq = 0
+        self._next_replica = itertools.count()
+        self.tracer = tracer
+        self.call_options = dict(resilience.DEFAULT_CALL_OPTIONS, **(call_options or {}))
+        self._latencies = collections.defaultdict(resilience.LatencyTracker)
+        # Cleared once a server turns out not to have the batched comment streams
+        self._batched_streams = True
 
     def create_post(self):
         """
@@ -32,10 +66,10 @@ class RedditClient:
             video_url="https://example.com/dummy_video.mp4",
             author="Dummy Author",
             score=-1,  # Dummy score (negative)
-            state=data_model_pb2.HIDDEN,  # Dummy state (hidden)
+            state=data_model_pb2.NORMAL,  # Dummy state (hidden posts can't be read back)
             publication_date="2023-12-10T12:00:00Z"  # Dummy publication date (ISO 8601 format)
         )
-        result = self.stub.CreatePost(post)
+        result = self._write("CreatePost", post, idempotency_key=idempotency.new_key())
         print(f"\nCreated Post: {result}")
 
     def vote_post(self):
@@ -47,18 +81,21 @@ class RedditClient:
            """
         post_id = "1"  # Dummy post ID
         action = 0  # Dummy vote action (0 for UPVOTE)
-        result = self.stub.VotePost(data_model_pb2.VoteRequest(post_id=post_id, action=action))
+        result = self._write("VotePost", data_model_pb2.VoteRequest(post_id=post_id, action=action))
         print(f"\nVoted Post: {result}")
 
-    def get_post_content(self):
+    def get_post_content(self, options=None):
         """
             Retrieve and print the content of a post.
 
             Sends a request to the Reddit service to get the content of a dummy post and prints the retrieved post content.
 
+            Args:
+                options (resilience.CallOptions): Deadline, retries and hedging of this call,
+                    instead of the client's defaults for GetPostContent.
             """
         post_id = "1"  # Dummy post ID
-        post = self.stub.GetPostContent(data_model_pb2.Post(post_id=str(post_id)))
+        post = self._read("GetPostContent", data_model_pb2.Post(post_id=str(post_id)), options=options)
         print(f"\nRetrieved Post Content:\n{post}")
 
     def create_comment(self):
@@ -77,7 +114,7 @@ class RedditClient:
             publication_date="2023-12-10T12:00:00Z"
         )
 
-        result = self.stub.CreateComment(comment)
+        result = self._write("CreateComment", comment, idempotency_key=idempotency.new_key())
 
         print(f"\nCreated Comment:\n{result}")
 
@@ -90,20 +127,26 @@ class RedditClient:
            """
         comment_id = "1"  # Dummy post ID
         action = 0  # Dummy vote action (0 for UPVOTE)
-        result = self.stub.VoteComment(data_model_pb2.VoteRequest(comment_id=comment_id, action=action))
+        post_id = "1"  # Dummy post ID of the comment, used to route to its partition
+        result = self._write("VoteComment",
+                             data_model_pb2.VoteRequest(post_id=post_id, comment_id=comment_id, action=action))
         print(f"\nVoted Comment: {result}")
 
-    def get_top_comments(self):
+    def get_top_comments(self, options=None):
         """
             Retrieve and print the top N comments under a dummy post.
 
             Sends a request to the Reddit service to retrieve the top N comments under a dummy post
             and prints details such as comment ID, score, and whether replies exist.
 
+            Args:
+                options (resilience.CallOptions): Deadline, retries and hedging of this call,
+                    instead of the client's defaults for GetTopComments.
             """
         post_id = "1"  # Dummy post ID
         N = 5  # Replace with the desired value of N
-        top_comments_response = self.stub.GetTopComments(data_model_pb2.TopCommentsRequest(post_id=post_id, N=N))
+        top_comments_response = self._read_comments("GetTopComments",
+                                                    data_model_pb2.TopCommentsRequest(post_id=post_id, N=N), options)
 
         print(f"\nTop {N} Comments under Post {post_id}:\n")
         for comment in top_comments_response:
@@ -119,7 +162,8 @@ class RedditClient:
             """
         comment_id = "1"  # Dummy comment ID
         N = 5  # Replace with the desired value of N
-        expanded_comments = self.stub.ExpandCommentBranch(data_model_pb2.TopCommentsRequest(comment_id=comment_id, N=N))
+        expanded_comments = self._read_comments("ExpandCommentBranch",
+                                                data_model_pb2.TopCommentsRequest(comment_id=comment_id, N=N))
 
         print(f"\nExpanded Comment Branch for Comment {comment_id}:\n")
         for expanded_comment in expanded_comments:
@@ -147,6 +191,218 @@ class RedditClient:
         for update in updates:
             print(f"Entity ID: {update.entity_id}, Updated Score: {update.score}")
 
+    def export_store(self, path):
+        """
+            Export every post and comment on the server to a file.
+
+            Streams the server's stores and writes them to the file one record at a time, as
+            length-delimited protobuf or, for '.jsonl' paths, JSON lines.
+
+            Args:
+                path (str): Destination file.
+
+            """
+        fmt = bulk_io.detect_format(path)
+        records = self.stub.ExportStore(data_model_pb2.ExportRequest())
+        with open(path, "wb", buffering=1 << 20) as fh:
+            count = bulk_io.write_records(records, fh, fmt)
+        print(f"\nExported {count} records to {path}")
+
+    def import_store(self, path):
+        """
+            Seed the server with the posts and comments in a file.
+
+            Streams a file produced by export_store to the server, which loads it straight into
+            its stores, and prints the reported throughput.
+
+            Args:
+                path (str): Source file.
+
+            """
+        with open(path, "rb", buffering=1 << 20) as fh:
+            summary = self.stub.ImportStore(bulk_io.read_records(fh, bulk_io.detect_format(path)))
+        print(f"\n{bulk_io.format_summary('Imported', summary)}")
+
+    def replication_status(self):
+        """
+            Print the replication position and lag of the server and of each replica.
+
+            """
+        for name, stub in [("server", self.stub)] + [(f"replica {i + 1}", s) for i, s in enumerate(self.read_stubs)]:
+            status = stub.GetReplicationStatus(data_model_pb2.ReplicationStatusRequest())
+            print(f"\n{name} ({status.role}): applied seq {status.applied_seq}, leader seq {status.leader_seq}, "
+                  f"lag {status.lag_mutations} mutations / {status.lag_seconds * 1000:.1f} ms")
+
+    def store_stats(self, top_posts=10):
+        """
+            Print the entity counts, estimated memory per structure and largest posts of the server.
+
+            Args:
+                top_posts (int): How many of the largest posts to list.
+            """
+        stats = self.stub.GetStoreStats(data_model_pb2.StoreStatsRequest(top_posts=top_posts))
+        print(f"\n{stats.posts} posts, {stats.comments} comments, "
+              f"~{stats.total_bytes / 2**20:.1f} MiB estimated ({stats.total_bytes_delta / 2**20:+.1f} MiB), "
+              f"RSS {stats.rss_bytes / 2**20:.1f} MiB")
+        for structure in stats.structures:
+            print(f"  {structure.name:<20}{structure.entries:>12,} entries{structure.bytes / 2**20:>10.1f} MiB"
+                  f"{structure.bytes_delta / 2**20:>+10.1f} MiB{structure.bytes / max(structure.entries, 1):>8.0f} B/entry")
+        for post in stats.largest_posts:
+            print(f"  post {post.post_id}: {post.comments:,} comments")
+        return stats
+
+    def set_moderation_state(self, post_id="", state=data_model_pb2.NORMAL, comment_id="", hidden=False,
+                             subreddit_id=""):
+        """
+            Lock, hide or restore a post, hide or show a comment, or hide or show a subreddit.
+
+            Args:
+                post_id (str): The post to change, or the post of the comment to change.
+                state: The new POST_STATE of the post.
+                comment_id (str): The comment to hide or show, instead of changing the post.
+                hidden (bool): Whether the comment or subreddit is hidden.
+                subreddit_id (str): The subreddit to hide or show, when no post_id is given.
+            """
+        request = data_model_pb2.ModerationRequest(post_id=post_id, state=state, comment_id=comment_id,
+                                                   hidden=hidden, subreddit_id=subreddit_id)
+        summary = self._write("SetModerationState", request)
+        print(f"\n{summary.hidden_posts} hidden posts, {summary.locked_posts} locked posts, "
+              f"{summary.hidden_comments} hidden comments, {summary.hidden_subreddits} hidden subreddits")
+        return summary
+
+    def get_user_activity(self, author, limit=20, cursor="", options=None):
+        """
+            Print a page of an author's posts and comments, most recent first.
+
+            Args:
+                author (str): The author.
+                limit (int): Items in the page.
+                cursor (str): Cursor returned for the previous page; empty for the most recent.
+                options (resilience.CallOptions): Deadline, retries and hedging of this call,
+                    instead of the client's defaults for GetUserActivity.
+
+            Returns:
+                tuple: The ActivityItem messages and the cursor of the next page (empty when
+                the page came back short, so there is nothing more).
+            """
+        request = data_model_pb2.ActivityRequest(author=author, limit=limit, cursor=cursor)
+        items = self._read("GetUserActivity", request, stream=True, options=options)
+        print(f"\nActivity of {author}:")
+        for item in items:
+            if item.WhichOneof("entity") == "post":
+                print(f"  {item.post.publication_date}  post {item.post.post_id}: {item.post.title}")
+            else:
+                print(f"  {item.comment.publication_date}  comment {item.comment.comment_id} "
+                      f"on post {item.comment.post_id}")
+        return items, items[-1].cursor if len(items) == limit else ""
+
+    def get_trending_posts(self, window=data_model_pb2.FIVE_MINUTES, limit=10, options=None):
+        """
+            Print the posts that gained the most votes over a recent window.
+
+            Args:
+                window: data_model_pb2.FIVE_MINUTES, ONE_HOUR or ONE_DAY.
+                limit (int): Posts to return.
+                options (resilience.CallOptions): Deadline, retries and hedging of this call,
+                    instead of the client's defaults for GetTrendingPosts.
+
+            Returns:
+                list: The TrendingPost messages, most votes first.
+            """
+        request = data_model_pb2.TrendingRequest(window=window, limit=limit)
+        trending = self._read("GetTrendingPosts", request, stream=True, options=options)
+        print(f"\nTrending over {data_model_pb2.TrendingWindow.Name(window).replace('_', ' ').lower()}:")
+        for rank, item in enumerate(trending, 1):
+            print(f"  {rank:>2}. {item.votes:+d}  post {item.post.post_id}: {item.post.title}")
+        return trending
+
+    def _trace(self, method_name):
+        if self.tracer is None:
+            return tracing.NOOP_SPAN
+        return self.tracer.start_trace(f"client/{method_name}")
+
+    def _write(self, method_name, request, idempotency_key=None, options=None):
+        # Remember the sequence number of the write so replicas can be asked to catch up to it.
+        # Sending the same idempotency key again makes a retried create return the original,
+        # so writes are only retried when they carry one.
+        options = options or self.call_options.get(method_name, resilience.CallOptions())
+        if not idempotency_key:
+            options = options.replace(retry=resilience.NO_RETRY, hedge=None)
+        with self._trace(method_name) as span:
+            metadata = tuple(self._trace_metadata(span))
+            if idempotency_key:
+                metadata += ((idempotency.METADATA_KEY, idempotency_key),)
+
+            def start(timeout, copy):
+                future = getattr(self.stub, method_name).future(request, timeout=timeout, metadata=metadata)
+                return future, lambda: (future.result(), future)
+
+            response, call = resilience.call(start, options, self._latencies[method_name], span)
+        for key, value in call.trailing_metadata() or ():
+            if key == replication.SEQ_METADATA_KEY:
+                self.last_write_seq = max(self.last_write_seq, int(value))
+        return response
+
+    def _read(self, method_name, request, stream=False, options=None):
+        # Send reads to the next replica, falling back to the server if the replica is
+        # unreachable or can't yet see this client's writes. A hedged copy goes to the
+        # replica after that (or the server again when there are no replicas).
+        options = options or self.call_options.get(method_name, resilience.CallOptions())
+        with self._trace(method_name) as span:
+            metadata = self._trace_metadata(span)
+            if self.read_your_writes and self.last_write_seq:
+                metadata += ((replication.MIN_SEQ_METADATA_KEY, str(self.last_write_seq)),)
+
+            def start(timeout, copy):
+                stub = self.read_stubs[next(self._next_replica) % len(self.read_stubs)] if self.read_stubs else self.stub
+                call = self._start_read(stub, method_name, request, stream, timeout, metadata)
+
+                def result():
+                    try:
+                        return _collect(call)
+                    except grpc.RpcError as e:
+                        if stub is self.stub or e.code() not in (grpc.StatusCode.FAILED_PRECONDITION,
+                                                                 grpc.StatusCode.UNAVAILABLE):
+                            raise
+                    span.set_attribute("fallback", True)
+                    fallback = self._start_read(self.stub, method_name, request, stream, timeout,
+                                                self._trace_metadata(span))
+                    return _collect(fallback)
+
+                return call, result
+
+            return resilience.call(start, options, self._latencies[method_name], span)
+
+    def _read_comments(self, method_name, request, options=None):
+        # Prefer the batched variant of a comment stream and unpack its batches; servers that
+        # predate it answer UNIMPLEMENTED and get the one-message-per-comment RPC instead
+        if self._batched_streams:
+            try:
+                batches = self._read(method_name + "Batched", request, stream=True, options=options)
+                return batching.unpack(batches)
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                    raise
+                self._batched_streams = False
+        return iter(self._read(method_name, request, stream=True, options=options))
+
+    @staticmethod
+    def _start_read(stub, method_name, request, stream, timeout, metadata):
+        method = getattr(stub, method_name)
+        if stream:
+            call = method(request, timeout=timeout, metadata=metadata)
+            # PartitionedStub merges some streams into a list before returning
+            return resilience.StreamCall(call) if isinstance(call, grpc.Call) else call
+        return method.future(request, timeout=timeout, metadata=metadata)
+
+    def _trace_metadata(self, span):
+        return span.metadata() if self.tracer is not None else ()
+
+
+def _collect(call):
+    # The reply of a started read: a future's result, or a list already collected
+    return call.result() if hasattr(call, "result") else call
+
 
 def main():
     client = RedditClient()
@@ -160,6 +416,13 @@ def main():
     print("6. Get N most upvoted Comments under a post")
     print("7. Expand Comment branch")
     print("8. Monitor Updates")
+    print("9. Export posts and comments to a file")
+    print("10. Import posts and comments from a file")
+    print("11. Show replication status")
+    print("12. Show store memory statistics")
+    print("13. Lock a Post")
+    print("14. Show a user's recent activity")
+    print("15. Show trending posts")
 
     choice = input("Enter the number of your choice: ")
 
@@ -187,6 +450,29 @@ def main():
     elif choice == "8":
         client.monitor_updates()
 
+    elif choice == "9":
+        client.export_store(input("Export file path: "))
+
+    elif choice == "10":
+        client.import_store(input("Import file path: "))
+
+    elif choice == "11":
+        client.replication_status()
+
+    elif choice == "12":
+        client.store_stats()
+
+    elif choice == "13":
+        client.set_moderation_state(post_id=input("Post ID: "), state=data_model_pb2.LOCKED)
+
+    elif choice == "14":
+        client.get_user_activity(input("Author: "))
+
+    elif choice == "15":
+        window = input("Window (5m, 1h or 24h): ").strip()
+        client.get_trending_posts({"1h": data_model_pb2.ONE_HOUR, "24h": data_model_pb2.ONE_DAY}.get(
+            window, data_model_pb2.FIVE_MINUTES))
+
     else:
         print("Invalid choice. Exiting.")
 
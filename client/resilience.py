@@ -0,0 +1,399 @@
+# Author - Akshita Patil
+
+import collections
+import queue
+import random
+import sys
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+"""
+    Deadlines, retries and hedged requests for RedditClient.
+
+    Every call has an overall deadline. Attempts share it: a retry only gets the time left
+    after the earlier attempts and backoffs. Retries use exponential backoff with full
+    jitter, and only happen for methods that are safe to repeat: reads, and creates that
+    carry an idempotency key.
+
+    A hedged call sends a second copy of a read when the first hasn't answered within
+    the method's recent p95 latency, takes whichever reply arrives first and cancels the
+    other. Only the slowest ~5% of calls are hedged, so the extra load stays around 5%.
+    The caller waits on completion callbacks of the copies rather than on pool threads,
+    so under load a hedge is never queued behind the calls it is meant to beat.
+    """
+
+RETRYABLE_CODES = frozenset((grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED,
+                             grpc.StatusCode.RESOURCE_EXHAUSTED))
+
+
+class RetryPolicy:
+    """
+        When and how often to retry a failed attempt.
+
+        Args:
+            max_attempts (int): Attempts in total, including the first.
+            initial_backoff (float): Upper bound in seconds of the first backoff.
+            max_backoff (float): Upper bound in seconds of any backoff.
+            multiplier (float): Growth of the backoff bound per attempt.
+            codes: Status codes that are retried.
+        """
+
+    def __init__(self, max_attempts=3, initial_backoff=0.02, max_backoff=0.5, multiplier=2.0,
+                 codes=RETRYABLE_CODES):
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.codes = codes
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number `attempt` (1 for the first retry), with full jitter."""
+        return random.uniform(0, min(self.max_backoff, self.initial_backoff * self.multiplier ** (attempt - 1)))
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class HedgePolicy:
+    """
+        When to send a second copy of a call.
+
+        Args:
+            quantile (float): Latency quantile of recent calls after which to hedge.
+            default_delay (float): Hedging delay in seconds until enough calls have been seen.
+            min_delay (float): Lower bound of the hedging delay in seconds.
+            min_samples (int): Calls observed before the quantile is trusted.
+        """
+
+    def __init__(self, quantile=0.95, default_delay=0.05, min_delay=0.002, min_samples=50):
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+
+
+class CallOptions:
+    """
+        Deadline, retry policy and hedging of one method, or one call.
+
+        Args:
+            timeout (float): Overall deadline in seconds, across retries; None for no deadline.
+            retry (RetryPolicy): How to retry failed attempts.
+            hedge (HedgePolicy): When to send a second copy; None to never hedge.
+        """
+
+    def __init__(self, timeout=None, retry=NO_RETRY, hedge=None):
+        self.timeout = timeout
+        self.retry = retry
+        self.hedge = hedge
+
+    def replace(self, **changes):
+        options = CallOptions(self.timeout, self.retry, self.hedge)
+        for name, value in changes.items():
+            setattr(options, name, value)
+        return options
+
+
+_READ = CallOptions(timeout=2.0, retry=RetryPolicy())
+_HEDGED_READ = CallOptions(timeout=2.0, retry=RetryPolicy(), hedge=HedgePolicy())
+
+# Per-method defaults. Retries are limited to calls that are safe to repeat: votes would
+# be counted twice, and ExpandCommentBranch stores the child comments it returns.
+DEFAULT_CALL_OPTIONS = {
+    "CreatePost": CallOptions(timeout=2.0, retry=RetryPolicy()),  # retried only with an idempotency key
+    "CreateComment": CallOptions(timeout=2.0, retry=RetryPolicy()),
+    "VotePost": CallOptions(timeout=2.0),
+    "VoteComment": CallOptions(timeout=2.0),
+    "GetPostContent": _HEDGED_READ,
+    "GetTopComments": _HEDGED_READ,
+    "GetTopCommentsBatched": _HEDGED_READ,
+    "ExpandCommentBranch": CallOptions(timeout=2.0),
+    "ExpandCommentBranchBatched": CallOptions(timeout=2.0),
+    "GetReplicationStatus": _READ,
+    "GetStoreStats": _READ,
+    "SetModerationState": CallOptions(timeout=2.0),
+    "GetUserActivity": _READ,
+    "GetTrendingPosts": _READ,
+    "ExportStore": CallOptions(),
+    "ImportStore": CallOptions(),
+}
+
+
+class LatencyTracker:
+    """
+        Recent latencies of one method, for picking the hedging delay.
+
+        Args:
+            window (int): Latencies kept.
+            refresh (int): Calls between recomputations of the quantile.
+        """
+
+    def __init__(self, window=1000, refresh=100):
+        self._latencies = collections.deque(maxlen=window)
+        self._refresh = refresh
+        self._since_refresh = 0
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._since_refresh += 1
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def quantile(self, fraction):
+        with self._lock:
+            if self._since_refresh >= self._refresh or len(self._sorted) < len(self._latencies) < self._refresh:
+                self._sorted = sorted(self._latencies)
+                self._since_refresh = 0
+            ordered = self._sorted
+        if not ordered:
+            return None
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def hedge_delay(self, policy):
+        if len(self) < policy.min_samples:
+            return policy.default_delay
+        return max(policy.min_delay, self.quantile(policy.quantile))
+
+
+class StreamCall:
+    """
+        A server-streaming call whose replies are collected into a list, like a unary future.
+
+        Read on the caller's thread by result(), or on a thread of its own once a done
+        callback is added, so a hedged stream can be awaited alongside its copy.
+
+        Args:
+            call: The gRPC call of a server-streaming RPC.
+        """
+
+    def __init__(self, call):
+        self._call = call
+        self._lock = threading.Lock()
+        self._reader = None
+
+    def _read(self):
+        try:
+            self._reader.set_result(list(self._call))
+        except Exception as e:
+            self._reader.set_exception(e)
+
+    def result(self):
+        with self._lock:
+            reader = self._reader
+        return list(self._call) if reader is None else reader.result()
+
+    def add_done_callback(self, callback):
+        with self._lock:
+            if self._reader is None:
+                self._reader = futures.Future()
+                threading.Thread(target=self._read, name="stream-read", daemon=True).start()
+        self._reader.add_done_callback(lambda _: callback(self))
+
+    def cancel(self):
+        self._call.cancel()
+
+
+class Attempt:
+    """
+        One in-flight copy of a call, which can be cancelled.
+
+        Args:
+            start (callable): Starts the attempt; see call().
+            timeout (float): Seconds the attempt may take, or None.
+            copy (int): 0 for the first copy of a call, 1 for its hedge.
+        """
+
+    def __init__(self, start, timeout, copy=0):
+        self._call, self._result = start(timeout, copy)
+
+    def result(self):
+        return self._result()
+
+    def on_done(self, callback):
+        # Calls callback(self) once the reply is in; results that aren't futures already are
+        add_done_callback = getattr(self._call, "add_done_callback", None)
+        if add_done_callback is None:
+            callback(self)
+        else:
+            add_done_callback(lambda _: callback(self))
+
+    def cancel(self):
+        if hasattr(self._call, "cancel"):
+            self._call.cancel()
+
+
+def call(start, options, tracker=None, span=None):
+    """
+        Runs a call under its deadline, retry policy and hedging policy.
+
+        Args:
+            start (callable): Starts one attempt; takes (timeout, copy index) and returns
+                (grpc call, result function). The call is a future (a unary call's, or a
+                StreamCall), or the reply itself when it is already complete. The result
+                function blocks until the reply is available. Copy index 1 is the hedged
+                copy, so callers can send it to a different server.
+            options (CallOptions): The deadline and policies.
+            tracker (LatencyTracker): Latencies of this method, used and updated for hedging.
+            span: Tracing span to annotate with attempts and hedges.
+
+        Returns:
+            The result of the first successful attempt.
+
+        Raises:
+            grpc.RpcError: The error of the last attempt, if none succeeded.
+        """
+    deadline = None if options.timeout is None else time.monotonic() + options.timeout
+    attempt = 1
+    while True:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        started = time.perf_counter()
+        try:
+            if options.hedge is not None and tracker is not None:
+                result = _hedged(start, remaining, tracker.hedge_delay(options.hedge), span)
+            else:
+                result = Attempt(start, remaining).result()
+            if tracker is not None:
+                tracker.record(time.perf_counter() - started)
+            if span is not None and attempt > 1:
+                span.set_attribute("attempts", attempt)
+            return result
+        except grpc.RpcError as e:
+            if attempt >= options.retry.max_attempts or e.code() not in options.retry.codes:
+                raise
+            backoff = options.retry.backoff(attempt)
+            if deadline is not None and time.monotonic() + backoff >= deadline:
+                raise
+            time.sleep(backoff)
+            attempt += 1
+
+
+def _hedged(start, timeout, delay, span):
+    finished = queue.SimpleQueue()
+    attempts = [Attempt(start, timeout)]
+    attempts[0].on_done(finished.put)
+    try:
+        done = finished.get(timeout=delay if timeout is None else min(delay, timeout))
+    except queue.Empty:
+        done = None
+        remaining = None if timeout is None else max(timeout - delay, 0.001)
+        hedge = Attempt(start, remaining, copy=1)
+        attempts.append(hedge)
+        hedge.on_done(finished.put)
+        if span is not None:
+            span.set_attribute("hedged", True)
+
+    pending = len(attempts)
+    while True:
+        if done is None:
+            done = finished.get()
+        pending -= 1
+        try:
+            result = done.result()
+        except grpc.RpcError:
+            if not pending:
+                raise
+            done = None
+            continue
+        for attempt in attempts:
+            if attempt is not done:
+                attempt.cancel()
+        return result
+
+
+class FaultInjectionInterceptor(grpc.ServerInterceptor):
+    """
+        Server interceptor that slows down or fails a random fraction of calls, for benchmarks.
+
+        Args:
+            delay_rate (float): Fraction of calls delayed.
+            delay (float): Seconds a delayed call waits before being handled.
+            error_rate (float): Fraction of calls failed with UNAVAILABLE.
+        """
+
+    def __init__(self, delay_rate=0.05, delay=0.2, error_rate=0.01):
+        self.delay_rate = delay_rate
+        self.delay = delay
+        self.error_rate = error_rate
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler.request_streaming:
+            return handler
+        if handler.response_streaming:
+            return handler._replace(unary_stream=self._inject(handler.unary_stream))
+        return handler._replace(unary_unary=self._inject(handler.unary_unary))
+
+    def _inject(self, behavior):
+        def injected(request, context):
+            draw = random.random()
+            if draw < self.error_rate:
+                context.abort(grpc.StatusCode.UNAVAILABLE, "Injected fault")
+            if draw < self.error_rate + self.delay_rate:
+                time.sleep(self.delay)
+            return behavior(request, context)
+
+        return injected
+
+
+def benchmark(calls=3000, delay_rate=0.05, delay=0.2, error_rate=0.01):
+    """
+        Measures read tail latency against a local server that injects faults.
+
+        Runs the same GetPostContent load with no resilience, with retries, and with
+        retries plus hedging.
+
+        Returns:
+            dict: Configuration name -> (p50, p99, p99.9 seconds, failed calls).
+        """
+    import os
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "service"))
+    from data_model_pb2 import Post
+    from data_model_pb2_grpc import add_RedditServiceServicer_to_server
+    from server import RedditServicer
+    from client import RedditClient
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=64),
+                         interceptors=[FaultInjectionInterceptor(delay_rate, delay, error_rate)])
+    add_RedditServiceServicer_to_server(RedditServicer(), server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    configurations = {
+        "no retries": CallOptions(timeout=2.0),
+        "retries": CallOptions(timeout=2.0, retry=RetryPolicy()),
+        "retries + hedging": CallOptions(timeout=2.0, retry=RetryPolicy(), hedge=HedgePolicy()),
+    }
+    results = {}
+    try:
+        seed = RedditClient(port=port)
+        seed.stub.CreatePost(Post(post_id="bench", title="Benchmark"))
+        for name, options in configurations.items():
+            client = RedditClient(port=port, call_options={"GetPostContent": options})
+            latencies = []
+            failed = 0
+            for _ in range(calls):
+                start = time.perf_counter()
+                try:
+                    client._read("GetPostContent", Post(post_id="bench"))
+                except grpc.RpcError:
+                    failed += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            p50, p99, p999 = (latencies[min(int(q * len(latencies)), len(latencies) - 1)] for q in (0.5, 0.99, 0.999))
+            results[name] = (p50, p99, p999, failed)
+            print(f"{name:<20} p50 {p50 * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms  p99.9 {p999 * 1000:7.2f} ms  "
+                  f"{failed} failed")
+    finally:
+        server.stop(None)
+    return results
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
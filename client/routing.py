@@ -0,0 +1,500 @@
+# Author - Akshita Patil
+
+import bisect
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent import futures
+
+import grpc
+import data_model_pb2_grpc, data_model_pb2
+
+"""
+    Consistent-hash partitioning of posts across several RedditService nodes.
+
+    Every post, together with all of its comments, lives on the node that owns its
+    post_id on a hash ring with virtual nodes. PartitionedStub has the same call surface
+    as RedditServiceStub and sends each RPC to the owning node, so RedditClient can use
+    it in place of a single-server stub.
+    """
+
+# Virtual nodes per server; more gives a more even spread at the cost of a larger ring
+DEFAULT_VNODES = 160
+# Page size of GetUserActivity when the request doesn't set one, as on the server
+DEFAULT_ACTIVITY_LIMIT = 50
+# Posts returned by GetTrendingPosts when the request doesn't set a limit, as on the server
+DEFAULT_TRENDING_LIMIT = 25
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+        Consistent hash ring mapping keys to nodes.
+
+        Args:
+            nodes: Initial node names (e.g. 'host:port' addresses).
+            vnodes (int): Virtual nodes placed on the ring per node.
+        """
+
+    def __init__(self, nodes=(), vnodes=DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self.nodes = []
+        self._hashes = []
+        self._owners = []
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove_node(self, node):
+        self.nodes.remove(node)
+        keep = [(h, n) for h, n in zip(self._hashes, self._owners) if n != node]
+        self._hashes = [h for h, _ in keep]
+        self._owners = [n for _, n in keep]
+
+    def node_for(self, key):
+        """
+            Returns the node owning a key: the first virtual node clockwise from its hash.
+
+            Args:
+                key (str): The key to place, e.g. a post ID.
+
+            Returns:
+                str: The owning node.
+
+            Raises:
+                LookupError: If the ring has no nodes.
+            """
+        if not self._hashes:
+            raise LookupError("Hash ring has no nodes")
+        return self._owner_at(_hash(key))
+
+    def _owner_at(self, point):
+        return self._owners[bisect.bisect(self._hashes, point) % len(self._hashes)]
+
+    def ranges_taken(self, node, previous):
+        """
+            Returns the hash ranges a node owns on this ring, by their owner on a previous ring.
+
+            Args:
+                node (str): A node added since the previous ring.
+                previous (HashRing): The ring before the node was added.
+
+            Returns:
+                dict: Previous owner -> (inclusive starts, exclusive ends) of the ranges it
+                    hands over; a range whose start is not below its end wraps around.
+            """
+        taken = {}
+        if not previous.nodes:
+            return taken
+        for index, (point, owner) in enumerate(zip(self._hashes, self._owners)):
+            if owner == node:
+                # Keys from the previous point up to this one; index -1 wraps to the last point
+                start = self._hashes[index - 1]
+                starts, ends = taken.setdefault(previous._owner_at(start), ([], []))
+                starts.append(start)
+                ends.append(point)
+        return taken
+
+    def copy(self):
+        ring = HashRing(vnodes=self.vnodes)
+        ring.nodes = list(self.nodes)
+        ring._hashes = list(self._hashes)
+        ring._owners = list(self._owners)
+        return ring
+
+
+def _record_post_id(record):
+    if record.WhichOneof("entity") == "post":
+        return record.post.post_id
+    return record.comment.post_id
+
+
+def _activity_key(item):
+    # Sort key of an ActivityItem cursor, "seconds:kind:entity ID" as written by the server,
+    # ordered as the server orders it: shorter IDs first
+    seconds, kind, entity_id = item.cursor.split(":", 2)
+    return int(seconds), int(kind), len(entity_id), entity_id
+
+
+class _WriteGate:
+    # Lets writes through until closed; close() waits for writes already in flight
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._open = True
+        self._in_flight = 0
+
+    def enter(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._open)
+            self._in_flight += 1
+
+    def exit(self, *_):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._open = False
+            self._cond.wait_for(lambda: self._in_flight == 0)
+
+    def open(self):
+        with self._cond:
+            self._open = True
+            self._cond.notify_all()
+
+
+class _RoutedMethod:
+    # Mirrors a stub multi-callable: call it directly or through with_call/future
+    def __init__(self, router, name, key, write):
+        self._router = router
+        self._name = name
+        self._key = key
+        self._write = write
+
+    def _invoke(self, attribute, request, args, kwargs):
+        if not self._write:
+            method = getattr(self._router._stub_for(self._key(request)), self._name)
+            return getattr(method, attribute)(request, *args, **kwargs)
+
+        gate = self._router._write_gate
+        gate.enter()
+        try:
+            key = self._key(request)
+            if key is None:
+                # Not tied to a post: apply on every node, answering with the last node's reply
+                nodes = list(self._router.ring.nodes)
+                for node in nodes[:-1]:
+                    getattr(self._router._stubs[node], self._name)(request, *args, **kwargs)
+                method = getattr(self._router._stubs[nodes[-1]], self._name)
+            else:
+                method = getattr(self._router._stub_for(key), self._name)
+            result = getattr(method, attribute)(request, *args, **kwargs)
+        except BaseException:
+            gate.exit()
+            raise
+        if attribute == "future":
+            result.add_done_callback(gate.exit)
+        else:
+            gate.exit()
+        return result
+
+    def __call__(self, request, *args, **kwargs):
+        return self._invoke("__call__", request, args, kwargs)
+
+    def with_call(self, request, *args, **kwargs):
+        return self._invoke("with_call", request, args, kwargs)
+
+    def future(self, request, *args, **kwargs):
+        return self._invoke("future", request, args, kwargs)
+
+
+class PartitionedStub:
+    """
+        Routes RedditService RPCs to the node owning each post.
+
+        Creates without an ID get a random globally-unique one before routing, so IDs never
+        collide between nodes. VoteComment and ExpandCommentBranch are routed by the
+        request's post_id, which callers must set. SetModerationState is routed by post_id
+        too, and sent to every node when it has none (a subreddit change).
+
+        Args:
+            nodes: 'host:port' addresses of the nodes.
+            vnodes (int): Virtual nodes per node on the hash ring.
+        """
+
+    def __init__(self, nodes, vnodes=DEFAULT_VNODES):
+        self.ring = HashRing(nodes, vnodes)
+        self._stubs = {node: self._connect(node) for node in nodes}
+        self._rebalance_lock = threading.Lock()
+        # Closed while a rebalance is copying posts so no write lands on a stale owner
+        self._write_gate = _WriteGate()
+
+        self.CreatePost = _RoutedMethod(self, "CreatePost", self._post_key, write=True)
+        self.VotePost = _RoutedMethod(self, "VotePost", lambda r: r.post_id, write=True)
+        self.GetPostContent = _RoutedMethod(self, "GetPostContent", lambda r: r.post_id, write=False)
+        self.CreateComment = _RoutedMethod(self, "CreateComment", self._comment_key, write=True)
+        self.VoteComment = _RoutedMethod(self, "VoteComment", self._required_post_id, write=True)
+        self.GetTopComments = _RoutedMethod(self, "GetTopComments", lambda r: r.post_id, write=False)
+        self.ExpandCommentBranch = _RoutedMethod(self, "ExpandCommentBranch", self._required_post_id, write=False)
+        self.GetTopCommentsBatched = _RoutedMethod(self, "GetTopCommentsBatched", lambda r: r.post_id, write=False)
+        self.ExpandCommentBranchBatched = _RoutedMethod(self, "ExpandCommentBranchBatched", self._required_post_id,
+                                                        write=False)
+        self.MonitorUpdates = _RoutedMethod(self, "MonitorUpdates", lambda r: r.post_id, write=False)
+        # Subreddits span partitions, so hiding one is sent to every node
+        self.SetModerationState = _RoutedMethod(self, "SetModerationState", lambda r: r.post_id or None, write=True)
+
+    @staticmethod
+    def _connect(node):
+        return data_model_pb2_grpc.RedditServiceStub(grpc.insecure_channel(node))
+
+    def _stub_for(self, post_id):
+        return self._stubs[self.ring.node_for(post_id)]
+
+    @staticmethod
+    def _post_key(post):
+        if not post.post_id:
+            post.post_id = uuid.uuid4().hex
+        return post.post_id
+
+    @staticmethod
+    def _comment_key(comment):
+        if not comment.comment_id:
+            comment.comment_id = uuid.uuid4().hex
+        return comment.post_id
+
+    @staticmethod
+    def _required_post_id(request):
+        if not request.post_id:
+            raise ValueError("post_id is required to route this request to its partition")
+        return request.post_id
+
+    def GetUserActivity(self, request, *args, **kwargs):
+        """
+            Merges an author's activity on every node, most recent first.
+
+            Cursors are (publication time, kind, ID) keys that every node orders the same
+            way, so each node continues from the same cursor and the merged page is the
+            most recent items across the partitions.
+            """
+        streams = [self._stubs[node].GetUserActivity(request, *args, **kwargs) for node in list(self.ring.nodes)]
+        merged = heapq.merge(*streams, key=_activity_key, reverse=True)
+        return list(itertools.islice(merged, request.limit or DEFAULT_ACTIVITY_LIMIT))
+
+    def GetTrendingPosts(self, request, *args, **kwargs):
+        """
+            Merges the trending posts of every node, most votes first.
+
+            All votes on a post land on the node that owns it, so each node's counts are
+            complete and the merged top posts are the top posts overall.
+            """
+        streams = [self._stubs[node].GetTrendingPosts(request, *args, **kwargs) for node in list(self.ring.nodes)]
+        merged = heapq.merge(*streams, key=lambda item: item.votes, reverse=True)
+        return list(itertools.islice(merged, request.limit or DEFAULT_TRENDING_LIMIT))
+
+    def ExportStore(self, request, *args, **kwargs):
+        """Streams the stores of every node, one node after another."""
+        for node in list(self.ring.nodes):
+            yield from self._stubs[node].ExportStore(request, *args, **kwargs)
+
+    def ImportStore(self, request_iterator, *args, **kwargs):
+        """
+            Splits a record stream across the nodes by owning post.
+
+            Returns:
+                BulkSummary: The summed counts of every node; seconds is the wall time.
+
+            Raises:
+                grpc.RpcError: The error of a node whose import failed; the other nodes'
+                    imports are cancelled.
+            """
+        start = time.perf_counter()
+        queues = {node: queue.Queue(maxsize=1024) for node in self.ring.nodes}
+        aborted = threading.Event()
+        calls = {node: self._stubs[node].ImportStore.future(_drain(q, aborted), *args, **kwargs)
+                 for node, q in queues.items()}
+        try:
+            for record in request_iterator:
+                node = self.ring.node_for(_record_post_id(record))
+                _put(queues[node], calls[node], record)
+            for node, q in queues.items():
+                _put(q, calls[node], None)
+        except BaseException:
+            aborted.set()
+            for call in calls.values():
+                call.cancel()
+            raise
+
+        summary = data_model_pb2.BulkSummary()
+        for call in calls.values():
+            result = call.result()
+            summary.posts += result.posts
+            summary.comments += result.comments
+        summary.seconds = time.perf_counter() - start
+        if summary.seconds > 0:
+            summary.records_per_sec = (summary.posts + summary.comments) / summary.seconds
+        return summary
+
+    def add_node(self, node):
+        """
+            Adds a node and moves the posts it now owns onto it, while serving.
+
+            Each node that gives up posts first fences the hash ranges it hands over, so
+            it refuses writes to them from any client (UNAVAILABLE while the copy runs,
+            FAILED_PRECONDITION naming the new owner afterwards). Reads keep going to the
+            old owners during the copy. Writes routed through this stub wait until the copy
+            is done, the ring is switched, and the moved posts are dropped from their old
+            nodes. Clients routing by the old ring need a stub built with the new node list.
+
+            Only the stores move, plus the hidden subreddits: they live in each node's
+            moderation index rather than in the posts, so the new node is told to hide every
+            subreddit its sources hide before the ring is switched. Vote velocity starts
+            over on the new owner, so moved posts trend again once they get new votes there,
+            and top-comment views are rebuilt from the imported comments on first read.
+
+            Args:
+                node (str): 'host:port' of the new node.
+
+            Returns:
+                int: The number of posts moved.
+            """
+        with self._rebalance_lock:
+            new_ring = self.ring.copy()
+            new_ring.add_node(node)
+            new_stub = self._connect(node)
+            handed_over = new_ring.ranges_taken(node, self.ring)
+            moved = {}
+            fenced = []
+            hidden_subreddits = set()
+            switched = False
+
+            self._write_gate.close()
+            try:
+                for source, (starts, ends) in handed_over.items():
+                    status = self._stubs[source].HandOffPosts(data_model_pb2.HandoffRequest(owner=node, starts=starts,
+                                                                                            ends=ends))
+                    fenced.append(source)
+                    hidden_subreddits.update(status.hidden_subreddits)
+
+                for source in handed_over:
+                    moved[source] = set()
+
+                    def owned_by_new_node(records, moved_ids=moved[source]):
+                        for record in records:
+                            post_id = _record_post_id(record)
+                            if new_ring.node_for(post_id) == node:
+                                moved_ids.add(post_id)
+                                yield record
+
+                    records = self._stubs[source].ExportStore(data_model_pb2.ExportRequest())
+                    new_stub.ImportStore(owned_by_new_node(records))
+
+                # Posts don't carry the hidden flag of their subreddit; the moderation index does
+                for subreddit_id in sorted(hidden_subreddits):
+                    new_stub.SetModerationState(data_model_pb2.ModerationRequest(subreddit_id=subreddit_id,
+                                                                                 hidden=True))
+                self._stubs[node] = new_stub
+                self.ring = new_ring
+                switched = True
+                for source, (starts, ends) in handed_over.items():
+                    if moved[source]:
+                        self._stubs[source].DropPosts(data_model_pb2.PostIds(post_ids=sorted(moved[source])))
+                    self._stubs[source].HandOffPosts(data_model_pb2.HandoffRequest(owner=node, starts=starts,
+                                                                                   ends=ends, moved=True))
+            except BaseException:
+                if not switched:
+                    # The old owners keep their posts; let writes to them through again
+                    for source in fenced:
+                        self._stubs[source].HandOffPosts(data_model_pb2.HandoffRequest(owner=node, lift=True))
+                raise
+            finally:
+                self._write_gate.open()
+            return sum(len(post_ids) for post_ids in moved.values())
+
+
+def _drain(records, aborted):
+    # Request stream of one node's import: records until the None sentinel, or the import is aborted
+    while True:
+        try:
+            record = records.get(timeout=0.1)
+        except queue.Empty:
+            if aborted.is_set():
+                return
+            continue
+        if record is None:
+            return
+        yield record
+
+
+def _put(records, call, record):
+    # Queues a record for a node's import, failing instead of blocking if the import has ended
+    while True:
+        try:
+            records.put(record, timeout=0.1)
+            return
+        except queue.Full:
+            if call.done():
+                call.result()
+                raise RuntimeError("Import ended before reading the whole stream")
+
+
+def _start_node(port):
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "service", "server.py")
+    process = subprocess.Popen([sys.executable, server, "--port", str(port)], cwd=os.path.dirname(server),
+                               stdout=subprocess.DEVNULL)
+    grpc.channel_ready_future(grpc.insecure_channel(f"localhost:{port}")).result(timeout=15)
+    return process
+
+
+def _load_worker(nodes, post_ids, seconds):
+    # One load generator process: a mix of reads and votes against random posts
+    import random
+    stub = PartitionedStub(nodes)
+    operations = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        post_id = random.choice(post_ids)
+        if random.random() < 0.9:
+            stub.GetPostContent(data_model_pb2.Post(post_id=post_id))
+        else:
+            stub.VotePost(data_model_pb2.VoteRequest(post_id=post_id, action=data_model_pb2.UPVOTE))
+        operations += 1
+    return operations
+
+
+def benchmark(max_nodes=4, posts_count=2000, seconds=5.0, workers=8, base_port=50100):
+    """
+        Measures aggregate throughput as nodes are added one at a time.
+
+        Starts max_nodes server processes on localhost, seeds posts through a one-node
+        router, then repeatedly adds a node online (moving its share of the posts) and
+        drives load from several worker processes.
+
+        Returns:
+            list: (node count, posts moved, operations/sec) per step.
+        """
+    processes = [_start_node(base_port + i) for i in range(max_nodes)]
+    addresses = [f"localhost:{base_port + i}" for i in range(max_nodes)]
+    results = []
+    try:
+        router = PartitionedStub(addresses[:1])
+        post_ids = []
+        for i in range(posts_count):
+            post_ids.append(router.CreatePost(data_model_pb2.Post(title=f"Post {i}")).post_id)
+
+        # gRPC channels don't survive fork, so load generators are spawned fresh
+        with futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for count in range(1, max_nodes + 1):
+                moved = router.add_node(addresses[count - 1]) if count > 1 else 0
+                runs = [pool.submit(_load_worker, router.ring.nodes, post_ids, seconds) for _ in range(workers)]
+                operations = sum(run.result() for run in runs)
+                results.append((count, moved, operations / seconds))
+                print(f"{count} node(s): moved {moved} posts, {operations / seconds:,.0f} ops/sec")
+    finally:
+        for process in processes:
+            process.kill()
+    return results
+
+
+if __name__ == '__main__':
+    benchmark(max_nodes=int(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,331 @@
+# Author - Akshita Patil
+
+import bisect
+import functools
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+
+"""
+    Per-author index of posts and comments, for user activity pages.
+
+    Every author with content has one Activity: the IDs of their posts and comments in
+    time order, with a parallel array of sort keys. A page of recent activity is a binary
+    search for the cursor followed by a walk backwards, O(log n + k) for k items, instead
+    of a scan of the whole store.
+
+    Author names are interned, so each name is held once however many entities carry it;
+    entries hold only the publication time, an entity-kind byte and a reference to the ID
+    string already used as the store key.
+
+    Entries are ordered by (publication seconds, kind, entity ID), with shorter IDs first
+    so that numeric IDs keep their creation order. The sort key is built only from
+    replicated data, so every leader, follower and partition orders an author's entries
+    the same way. A cursor taken from one node therefore continues correctly on
+    any other. Keys double as pagination cursors. Entities without a valid publication
+    date sort as the oldest.
+    """
+
+POST = 0
+COMMENT = 1
+
+# Fixed per-author cost: the Activity, its three containers and a dict slot for the name
+_AUTHOR_OVERHEAD = (sys.getsizeof(object()) + 3 * 8 + sys.getsizeof(array("q")) + sys.getsizeof([])
+                    + sys.getsizeof(bytearray()) + 3 * 8)
+# Per entry: the publication time, the list slot of the ID and the kind byte
+_ENTRY_BYTES = 8 + 8 + 1
+
+_HEADER = struct.Struct("<I")
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date(publication_date):
+    try:
+        return int(datetime.fromisoformat(publication_date.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return None
+
+
+def timestamp(publication_date):
+    """Seconds since the epoch of an ISO 8601 publication date; 0 if it is missing or invalid."""
+    seconds = _parse_date(publication_date) if publication_date else None
+    return 0 if seconds is None else max(seconds, 0)
+
+
+class Activity:
+    """One author's posts and comments, oldest first."""
+
+    __slots__ = ("keys", "ids", "kinds")
+
+    def __init__(self, keys=(), ids=(), kinds=b""):
+        # Publication seconds of each entry; ties are ordered by kind, then ID
+        self.keys = array("q", keys)
+        self.ids = list(ids)
+        self.kinds = bytearray(kinds)
+
+    def position(self, key):
+        # Index of the first entry not below key = (seconds, kind, entity ID)
+        seconds, kind, entity_id = key
+        low = bisect.bisect_left(self.keys, seconds)
+        high = bisect.bisect_right(self.keys, seconds, low)
+        # Within a second, by kind and ID: binary search, as undated entries all share second 0
+        tie = (kind, len(entity_id), entity_id)
+        while low < high:
+            middle = (low + high) // 2
+            if (self.kinds[middle], len(self.ids[middle]), self.ids[middle]) < tie:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def add(self, seconds, kind, entity_id):
+        if not self.keys or seconds > self.keys[-1] or (
+                seconds == self.keys[-1]
+                and (kind, len(entity_id), entity_id) > (self.kinds[-1], len(self.ids[-1]), self.ids[-1])):
+            self.keys.append(seconds)
+            self.ids.append(entity_id)
+            self.kinds.append(kind)
+        else:
+            position = self.position((seconds, kind, entity_id))
+            self.keys.insert(position, seconds)
+            self.ids.insert(position, entity_id)
+            self.kinds.insert(position, kind)
+
+    def remove(self, doomed):
+        # Keeps the entries whose (kind, ID) is not in doomed; returns how many went
+        kept = [i for i, entry in enumerate(zip(self.kinds, self.ids)) if entry not in doomed]
+        removed = len(self.ids) - len(kept)
+        if removed:
+            self.keys = array("q", (self.keys[i] for i in kept))
+            self.ids = [self.ids[i] for i in kept]
+            self.kinds = bytearray(self.kinds[i] for i in kept)
+        return removed
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def encode(activity):
+    """Serializes an Activity, for snapshots."""
+    ids = b"\x00".join(entity_id.encode("utf-8") for entity_id in activity.ids)
+    return _HEADER.pack(len(activity.ids)) + activity.keys.tobytes() + bytes(activity.kinds) + ids
+
+
+def decode(data):
+    """Rebuilds an Activity serialized by encode()."""
+    (count,) = _HEADER.unpack_from(data)
+    keys = array("q")
+    keys.frombytes(data[_HEADER.size:_HEADER.size + 8 * count])
+    kinds_start = _HEADER.size + 8 * count
+    kinds = data[kinds_start:kinds_start + count]
+    ids = bytes(data[kinds_start + count:]).decode("utf-8").split("\x00") if count else []
+    return Activity(keys, ids, kinds)
+
+
+class AuthorIndex:
+    """
+        Posts and comments of every author, by time.
+
+        Args:
+            authors: Mapping to keep the per-author Activity in; a dict unless it is backed
+                by a snapshot.
+        """
+
+    def __init__(self, authors=None):
+        self._lock = threading.Lock()
+        self._authors = {} if authors is None else authors
+        self.entries = 0
+
+    def clear(self):
+        with self._lock:
+            self._authors = {}
+            self.entries = 0
+
+    def load(self, authors, entries):
+        """
+            Replaces the index with a mapping of author -> Activity, such as a snapshot section.
+
+            Args:
+                authors: The mapping; entries are decoded on first access if it is lazy.
+                entries (int): Total entries in the mapping, for memory accounting.
+            """
+        with self._lock:
+            self._authors = authors
+            self.entries = entries
+
+    def post_added(self, post_id, post):
+        self._add(post.author, POST, post_id, post.publication_date)
+
+    def comment_added(self, comment_id, comment):
+        self._add(comment.author, COMMENT, comment_id, comment.publication_date)
+
+    def _add(self, author, kind, entity_id, publication_date):
+        if not author:
+            return
+        seconds = timestamp(publication_date)
+        with self._lock:
+            activity = self._authors.get(author)
+            if activity is None:
+                activity = self._authors[sys.intern(author)] = Activity()
+            activity.add(seconds, kind, entity_id)
+            self.entries += 1
+
+    def remove(self, entities):
+        """
+            Removes entities from their authors' activity.
+
+            Args:
+                entities: (author, kind, entity ID) of each removed post or comment.
+            """
+        by_author = {}
+        for author, kind, entity_id in entities:
+            if author:
+                by_author.setdefault(author, set()).add((kind, entity_id))
+        with self._lock:
+            for author, doomed in by_author.items():
+                activity = self._authors.get(author)
+                if activity is not None:
+                    self.entries -= activity.remove(doomed)
+                    if not activity:
+                        del self._authors[author]
+
+    def recent(self, author, before=None, count=50):
+        """
+            Returns an author's most recent entries older than a cursor.
+
+            Args:
+                author (str): The author.
+                before (tuple): Cursor (sort key) to continue from; None for the most recent.
+                count (int): Maximum entries.
+
+            Returns:
+                list: (cursor, kind, entity ID) tuples, most recent first; the cursor is the
+                    sort key (seconds, kind, entity ID).
+            """
+        with self._lock:
+            activity = self._authors.get(author)
+            if activity is None:
+                return []
+            end = len(activity.keys) if before is None else activity.position(before)
+            start = max(0, end - count)
+            entries = zip(activity.keys[start:end], activity.kinds[start:end], activity.ids[start:end])
+            return [((seconds, kind, entity_id), kind, entity_id) for seconds, kind, entity_id in entries][::-1]
+
+    def items(self):
+        """Yields (author, Activity) pairs, for snapshots."""
+        with self._lock:
+            authors = list(self._authors.items())
+        return authors
+
+    def size(self):
+        """Returns (entries, estimated bytes), for memory accounting."""
+        with self._lock:
+            return self.entries, (sys.getsizeof(self._authors) + len(self._authors) * _AUTHOR_OVERHEAD
+                                  + self.entries * _ENTRY_BYTES)
+
+
+def parse_cursor(cursor):
+    """
+        Turns the cursor of an ActivityItem back into a sort key.
+
+        Raises:
+            ValueError: If the cursor wasn't produced by format_cursor.
+        """
+    if not cursor:
+        return None
+    seconds, kind, entity_id = cursor.split(":", 2)
+    if int(kind) not in (POST, COMMENT):
+        raise ValueError(f"Unknown entity kind {kind}")
+    return int(seconds), int(kind), entity_id
+
+
+def format_cursor(key):
+    # "seconds:kind:entity ID"; the ID goes last so it may itself contain colons
+    seconds, kind, entity_id = key
+    return f"{seconds}:{kind}:{entity_id}"
+
+
+def benchmark(post_count=100_000, comments_per_post=10, authors=10_000, skew=1.1, pages=2000, page_size=25,
+              backdated=0.01):
+    """
+        Measures the author index: cost per entry, memory per entry and page latency,
+        against finding an author's activity by scanning the stores.
+
+        Entities are created in publication order, one post a minute, except for a
+        `backdated` fraction dated up to a week earlier, which land mid-list.
+
+        Returns:
+            dict: Measurements by name.
+        """
+    import itertools
+    import random
+    import tracemalloc
+    from data_model_pb2 import Post, Comment
+
+    rng = random.Random(1)
+    weights = [1 / (rank + 1) ** skew for rank in range(authors)]
+    names = [f"user{i}" for i in range(authors)]
+    drawn = rng.choices(names, weights, k=post_count * (1 + comments_per_post))
+    posts, comments = {}, {}
+    draw = iter(drawn)
+    start_time = datetime(2023, 1, 1).timestamp()
+
+    def date(seconds):
+        if rng.random() < backdated:
+            seconds -= rng.randrange(7 * 86400)
+        return datetime.utcfromtimestamp(start_time + seconds).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    for p in range(post_count):
+        post_id = str(p)
+        posts[post_id] = Post(post_id=post_id, author=next(draw), publication_date=date(p * 60))
+        for c in range(comments_per_post):
+            comment_id = f"{p}-{c}"
+            comments[comment_id] = Comment(comment_id=comment_id, post_id=post_id, author=next(draw),
+                                           publication_date=date(p * 60 + c + 1))
+
+    def build():
+        index = AuthorIndex()
+        comment_items = iter(comments.items())
+        for post_id, post in posts.items():
+            index.post_added(post_id, post)
+            for comment_id, comment in itertools.islice(comment_items, comments_per_post):
+                index.comment_added(comment_id, comment)
+        return index
+
+    start = time.perf_counter()
+    build()
+    build_time = time.perf_counter() - start
+    tracemalloc.start()
+    index = build()
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    entries, estimated = index.size()
+
+    targets = rng.choices(names, weights, k=pages)
+    start = time.perf_counter()
+    for author in targets:
+        page = index.recent(author, None, page_size)
+        if page:
+            index.recent(author, page[-1][0], page_size)
+    page_time = (time.perf_counter() - start) / (2 * pages)
+
+    start = time.perf_counter()
+    scans = 20
+    for author in targets[:scans]:
+        found = [post_id for post_id, post in posts.items() if post.author == author]
+        found += [comment_id for comment_id, comment in comments.items() if comment.author == author]
+    scan_time = (time.perf_counter() - start) / scans
+
+    results = {"index us/entry": build_time / entries * 1e6, "traced bytes/entry": traced / entries,
+               "estimated bytes/entry": estimated / entries, "page us": page_time * 1e6, "scan ms": scan_time * 1000}
+    print(f"{entries:,} entries, {len(index._authors):,} authors: {results['index us/entry']:.2f} us/entry to index, "
+          f"{results['traced bytes/entry']:.1f} B/entry traced ({results['estimated bytes/entry']:.1f} estimated)")
+    print(f"page of {page_size}: {results['page us']:.1f} us from the index, {results['scan ms']:.0f} ms scanning the stores")
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()
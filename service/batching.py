@@ -0,0 +1,189 @@
+# Author - Akshita Patil
+
+import time
+
+from data_model_pb2 import CommentBatch
+
+"""
+    Packing of comment streams into CommentBatch messages.
+
+    Streaming one Comment per message costs a frame, a serializer call and a trip through
+    the gRPC stream writer per comment, which dominates large responses. The batched RPCs
+    send a repeated field of comments per message instead.
+
+    The batch size is chosen by AdaptiveBatcher while streaming. The first batch is small
+    so the client gets its first comments quickly. Later batches double in size until they
+    reach a byte budget (large messages stop paying off and hold more memory). A batch is
+    also sent early once it has been filling for longer than the latency budget. The budget
+    is checked as each comment arrives, not on a timer: a producer that stalls between two
+    comments holds back the partly filled batch until the next comment (or the end of the
+    stream), so a stall can delay comments by the stall plus at most the budget. Lists that
+    are already in memory (pack, pack_encoded) have nothing to wait for and ignore the budget.
+    """
+
+# Comments in the first batch of a stream
+FIRST_BATCH = 16
+# Serialized size at which a batch is sent
+MAX_BATCH_BYTES = 64 * 1024
+# Time after which a partly filled batch is sent with the next comment, in seconds
+LATENCY_BUDGET = 0.005
+
+
+class AdaptiveBatcher:
+    """
+        Groups a stream of comments into CommentBatch messages.
+
+        Args:
+            first_batch (int): Comments in the first batch.
+            max_bytes (int): Serialized size at which a batch is sent.
+            latency_budget (float): Seconds after which a partly filled batch is sent, checked
+                as each comment arrives.
+        """
+
+    def __init__(self, first_batch=FIRST_BATCH, max_bytes=MAX_BATCH_BYTES, latency_budget=LATENCY_BUDGET):
+        self.first_batch = first_batch
+        self.max_bytes = max_bytes
+        self.latency_budget = latency_budget
+
+    def batches(self, comments):
+        """
+            Packs comments into batches.
+
+            The latency budget is checked between comments: once a batch has been filling
+            for longer than the budget it is sent with the next comment, and a producer
+            that stalls holds the batch until it yields again.
+
+            Args:
+                comments: An iterable of Comment messages.
+
+            Yields:
+                CommentBatch: The comments, in order.
+            """
+        target = self.first_batch
+        batch = CommentBatch()
+        size = 0
+        started = time.perf_counter()
+        for comment in comments:
+            batch.comments.append(comment)
+            # Each element costs its length, plus a tag and length prefix of 2-4 bytes
+            size += comment.ByteSize() + 3
+            if (len(batch.comments) >= target or size >= self.max_bytes
+                    or time.perf_counter() - started >= self.latency_budget):
+                yield batch
+                if size < self.max_bytes:
+                    target *= 2
+                else:
+                    # Aim the next batch at the byte budget given the comments seen so far
+                    target = max(1, len(batch.comments) * self.max_bytes // size)
+                batch = CommentBatch()
+                size = 0
+                started = time.perf_counter()
+        if batch.comments:
+            yield batch
+
+    def pack(self, comments):
+        """
+            Packs a list of comments already in memory.
+
+            Slices the list instead of appending comments one by one; the batch sizes
+            follow the same schedule as batches(). Every comment is ready already, so the
+            latency budget doesn't apply.
+
+            Args:
+                comments (list): The Comment messages.
+
+            Yields:
+                CommentBatch: The comments, in order.
+            """
+        if not comments:
+            return
+        average = max(1, sum(comment.ByteSize() for comment in comments[:64]) // min(len(comments), 64) + 3)
+        per_batch_limit = max(1, self.max_bytes // average)
+        target = self.first_batch
+        start = 0
+        while start < len(comments):
+            count = min(target, per_batch_limit)
+            yield CommentBatch(comments=comments[start:start + count])
+            start += count
+            target *= 2
+
+    def pack_encoded(self, encoded_comments):
+        """
+            Splits already serialized comments into batches, following the same schedule.
+
+            Args:
+                encoded_comments (list): Serialized Comment messages.
+
+            Yields:
+                list: The serialized comments of each batch.
+            """
+        target = self.first_batch
+        start = 0
+        while start < len(encoded_comments):
+            end = start
+            size = 0
+            while end < len(encoded_comments) and end - start < target and size < self.max_bytes:
+                size += len(encoded_comments[end]) + 3
+                end += 1
+            yield encoded_comments[start:end]
+            start = end
+            target *= 2
+
+
+def unpack(batches):
+    """Flattens a stream of CommentBatch messages back into comments."""
+    for batch in batches:
+        yield from batch.comments
+
+
+def benchmark(sizes=(10, 1000, 100_000), repeats=None):
+    """
+        Compares GetTopComments with GetTopCommentsBatched for several response sizes.
+
+        Runs an in-process server whose post holds exactly N comments, so ranking is a small
+        part of each call, and measures wall time and process CPU time (client and server
+        together) per comment.
+
+        Returns:
+            list: (N, variant, comments/sec, messages/sec, CPU microseconds per comment) rows.
+        """
+    from concurrent import futures
+    import grpc
+    from data_model_pb2 import Comment, Post, TopCommentsRequest
+    from data_model_pb2_grpc import RedditServiceStub, add_RedditServiceServicer_to_server
+    import server
+
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4),
+                              options=[("grpc.max_send_message_length", 64 << 20)])
+    add_RedditServiceServicer_to_server(server.RedditServicer(), grpc_server)
+    port = grpc_server.add_insecure_port("localhost:0")
+    grpc_server.start()
+    stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+    rows = []
+    try:
+        for size in sizes:
+            server.drop_posts(list(server.posts))
+            server.store_post("bench", Post(post_id="bench", title="Benchmark"))
+            for i in range(size):
+                server.store_comment(str(i), Comment(comment_id=str(i), post_id="bench", score=i,
+                                                     text="A comment of typical length " * 3, author=f"user{i % 100}"))
+            request = TopCommentsRequest(post_id="bench", N=size)
+            count = repeats or max(3, 20_000 // size)
+            for variant, method in (("per comment", stub.GetTopComments), ("batched", stub.GetTopCommentsBatched)):
+                list(method(request))  # warm up
+                messages = 0
+                wall, cpu = time.perf_counter(), time.process_time()
+                for _ in range(count):
+                    messages += sum(1 for _ in method(request))
+                wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+                comments_sent = size * count
+                rows.append((size, variant, comments_sent / wall, messages / wall, cpu / comments_sent * 1e6))
+                print(f"N={size:<7}{variant:<13}{comments_sent / wall:>12,.0f} comments/s{messages / wall:>12,.0f} msgs/s"
+                      f"{cpu / comments_sent * 1e6:>9.1f} us CPU/comment")
+    finally:
+        grpc_server.stop(None)
+    return rows
+
+
+if __name__ == '__main__':
+    benchmark()
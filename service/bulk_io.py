@@ -0,0 +1,342 @@
+# Author - Akshita Patil
+
+import json
+import sys
+import time
+
+from google.protobuf import json_format
+from google.protobuf.internal.decoder import _DecodeVarint32
+from google.protobuf.internal.encoder import _VarintBytes
+
+from data_model_pb2 import Post, Comment, StoreRecord, BulkSummary
+import activity
+import tiering
+
+"""
+    Bulk import/export of the post and comment stores.
+
+    Records are StoreRecord envelopes holding either a Post or a Comment. Two file
+    formats are supported:
+
+        delimited - each record is a varint length prefix followed by the serialized
+                    StoreRecord (the format used by protobuf's writeDelimitedTo).
+        jsonl     - one JSON-encoded StoreRecord per line.
+
+    Reading and writing both work one record at a time, so memory stays bounded
+    no matter how large the file is.
+    """
+
+DELIMITED = "delimited"
+JSONL = "jsonl"
+
+# Buffer size used for file I/O; large enough to amortize syscalls on multi-GB files
+_BUFFER_SIZE = 1 << 20
+# Records loaded between spills of cold posts when the stores are tiered
+_MAINTAIN_EVERY = 4096
+
+
+def next_id(store):
+    """
+        Returns the next free numeric ID in a store.
+
+        IDs start at len(store) + 1 as before, skipping any already taken (which can happen
+        once posts have been dropped or were created with explicit IDs).
+
+        Args:
+            store (dict): The posts or comments store.
+
+        Returns:
+            str: An ID not yet used in the store.
+        """
+    candidate = len(store) + 1
+    while str(candidate) in store:
+        candidate += 1
+    return str(candidate)
+
+
+def detect_format(path):
+    """
+        Picks the file format from the file extension.
+
+        Args:
+            path (str): Path of the export file.
+
+        Returns:
+            str: JSONL for '.jsonl' / '.json' files, DELIMITED otherwise.
+        """
+    if path.endswith(".jsonl") or path.endswith(".json"):
+        return JSONL
+    return DELIMITED
+
+
+def _copy(message, target):
+    target.CopyFrom(message)
+    return target
+
+
+def iter_store(posts, comments, include_comments=True):
+    """
+        Yields a StoreRecord for every post, followed by every comment.
+
+        Args:
+            posts (dict): The post store, keyed by post ID.
+            comments (dict): The comment store, keyed by comment ID.
+            include_comments (bool): Whether to yield comments as well as posts.
+
+        Yields:
+            StoreRecord: One record per stored entity.
+        """
+    for post_id, post in _stored(posts):
+        if post is not None:
+            if not post.post_id:
+                # Posts created through CreatePost are stored without their ID
+                post = _copy(post, Post())
+                post.post_id = post_id
+            yield StoreRecord(post=post)
+
+    if include_comments:
+        for comment_id, comment in _stored(comments):
+            if comment is not None:
+                if not comment.comment_id:
+                    comment = _copy(comment, Comment())
+                    comment.comment_id = str(comment_id)
+                yield StoreRecord(comment=comment)
+
+
+def _stored(store):
+    # Tiered stores read spilled entries from disk instead of faulting every post back in
+    if isinstance(store, tiering.TieredStore):
+        return store.items()
+    # Snapshot the keys so concurrent inserts don't break iteration
+    return ((key, store.get(key)) for key in list(store.keys()))
+
+
+def write_records(records, fh, fmt=DELIMITED):
+    """
+        Writes records to an open file.
+
+        Args:
+            records: An iterable of StoreRecord messages.
+            fh: A file object opened in binary mode.
+            fmt (str): DELIMITED or JSONL.
+
+        Returns:
+            int: The number of records written.
+        """
+    count = 0
+    if fmt == JSONL:
+        for record in records:
+            line = json.dumps(json_format.MessageToDict(record), separators=(",", ":"))
+            fh.write(line.encode("utf-8") + b"\n")
+            count += 1
+    else:
+        for record in records:
+            data = record.SerializeToString()
+            fh.write(_VarintBytes(len(data)))
+            fh.write(data)
+            count += 1
+    return count
+
+
+def read_records(fh, fmt=DELIMITED):
+    """
+        Reads records from an open file, one at a time.
+
+        Args:
+            fh: A file object opened in binary mode.
+            fmt (str): DELIMITED or JSONL.
+
+        Yields:
+            StoreRecord: The records in file order.
+
+        Raises:
+            ValueError: If the file ends in the middle of a record.
+        """
+    if fmt == JSONL:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json_format.Parse(line, StoreRecord())
+        return
+
+    while True:
+        header = fh.read(1)
+        if not header:
+            return
+        # Varint length prefix: keep reading while the continuation bit is set
+        while header[-1] & 0x80:
+            byte = fh.read(1)
+            if not byte:
+                raise ValueError("Truncated record length")
+            header += byte
+        size, _ = _DecodeVarint32(header, 0)
+        data = fh.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated record")
+        yield StoreRecord.FromString(data)
+
+
+def load_records(records, posts, comments, post_comments, accountant=None, moderation=None, authors=None,
+                 tier=None, on_replace=None):
+    """
+        Loads records straight into the stores.
+
+        Entities keep the IDs they were exported with; entities without an ID get the
+        next free one from next_id, the allocator CreatePost/CreateComment use. The per-post comment
+        index is built in one pass at the end instead of being updated per record.
+
+        Args:
+            records: An iterable of StoreRecord messages.
+            posts (dict): The post store to load into.
+            comments (dict): The comment store to load into.
+            post_comments (dict): The per-post comment index, post ID -> list of comment IDs.
+            accountant (introspection.StoreAccountant): Told about every stored entity, if given.
+            moderation (moderation.ModerationIndex): Indexes the state of every stored post and
+                the hidden comments, if given.
+            authors (activity.AuthorIndex): Indexes every new post and comment by author, if given.
+            tier (tiering.ColdTier): Keeps the stores under its memory budget during the import,
+                if given; the caller must hold the server's write lock.
+            on_replace (callable): Called as on_replace(comment_id, comment, replaced) for every
+                comment stored over an existing one, to re-index it the way the servicer does;
+                without it the comment keeps the index entries of the one it replaced.
+
+        Returns:
+            BulkSummary: Counts, elapsed time and throughput of the import.
+        """
+    start = time.perf_counter()
+    post_count = 0
+    comment_count = 0
+    pending_index = {}
+    # Offsets of hidden comments within each post's pending index entries
+    pending_hidden = {}
+
+    def index_pending(post_id):
+        comment_ids = pending_index.pop(post_id, None)
+        if comment_ids is None:
+            return
+        index = post_comments.setdefault(post_id, [])
+        index.extend(comment_ids)
+        if moderation is not None:
+            for offset in pending_hidden.pop(post_id, ()):
+                moderation.comment_hidden(post_id, len(index) - len(comment_ids) + offset, True)
+        if accountant is not None:
+            accountant.index_grew(post_id, len(comment_ids), len(index))
+
+    for record in records:
+        kind = record.WhichOneof("entity")
+        if kind == "post":
+            post = record.post
+            post_id = post.post_id or next_id(posts)
+            replaced = posts.get(post_id)
+            if accountant is not None:
+                accountant.post_added(post_id, post, replaced=replaced)
+            if authors is not None and (replaced is None or replaced.author != post.author):
+                if replaced is not None:
+                    authors.remove([(replaced.author, activity.POST, post_id)])
+                authors.post_added(post_id, post)
+            posts[post_id] = post
+            if moderation is not None:
+                moderation.post_stored(post_id, post)
+            post_count += 1
+        elif kind == "comment":
+            comment = record.comment
+            comment_id = comment.comment_id or next_id(comments)
+            replaced = comments.get(comment_id)
+            if replaced is None:
+                pending = pending_index.setdefault(comment.post_id, [])
+                pending.append(comment_id)
+                if comment.hidden:
+                    pending_hidden.setdefault(comment.post_id, []).append(len(pending) - 1)
+                if authors is not None:
+                    authors.comment_added(comment_id, comment)
+            if accountant is not None:
+                accountant.comment_added(comment_id, comment, replaced=replaced)
+            comments[comment_id] = comment
+            if replaced is not None and on_replace is not None:
+                # The replaced comment may itself be waiting for its index entry
+                index_pending(replaced.post_id)
+                on_replace(comment_id, comment, replaced)
+            comment_count += 1
+        if tier is not None and (post_count + comment_count) % _MAINTAIN_EVERY == 0:
+            tier.maintain()
+
+    for post_id in list(pending_index):
+        index_pending(post_id)
+
+    seconds = time.perf_counter() - start
+    total = post_count + comment_count
+    return BulkSummary(
+        posts=post_count,
+        comments=comment_count,
+        seconds=seconds,
+        records_per_sec=total / seconds if seconds > 0 else 0.0
+    )
+
+
+def export_store(path, posts, comments, fmt=None):
+    """
+        Exports the stores to a file.
+
+        Args:
+            path (str): Destination file.
+            posts (dict): The post store.
+            comments (dict): The comment store.
+            fmt (str): DELIMITED or JSONL. Detected from the extension when omitted.
+
+        Returns:
+            BulkSummary: Counts, elapsed time and throughput of the export.
+        """
+    fmt = fmt or detect_format(path)
+    start = time.perf_counter()
+    post_count = len(posts)
+    with open(path, "wb", buffering=_BUFFER_SIZE) as fh:
+        count = write_records(iter_store(posts, comments), fh, fmt)
+    seconds = time.perf_counter() - start
+    return BulkSummary(
+        posts=min(post_count, count),
+        comments=max(count - post_count, 0),
+        seconds=seconds,
+        records_per_sec=count / seconds if seconds > 0 else 0.0
+    )
+
+
+def import_store(path, posts, comments, post_comments, fmt=None, moderation=None, authors=None):
+    """
+        Imports a file produced by export_store into the stores.
+
+        Args:
+            path (str): Source file.
+            posts (dict): The post store to load into.
+            comments (dict): The comment store to load into.
+            post_comments (dict): The per-post comment index.
+            fmt (str): DELIMITED or JSONL. Detected from the extension when omitted.
+            moderation (moderation.ModerationIndex): Indexes moderated content, if given.
+            authors (activity.AuthorIndex): Indexes posts and comments by author, if given.
+
+        Returns:
+            BulkSummary: Counts, elapsed time and throughput of the import.
+        """
+    fmt = fmt or detect_format(path)
+    with open(path, "rb", buffering=_BUFFER_SIZE) as fh:
+        return load_records(read_records(fh, fmt), posts, comments, post_comments, moderation=moderation,
+                            authors=authors)
+
+
+def format_summary(action, summary):
+    return (f"{action} {summary.posts} posts and {summary.comments} comments "
+            f"in {summary.seconds:.2f}s ({summary.records_per_sec:,.0f} records/sec)")
+
+
+if __name__ == '__main__':
+    # Convert between formats: python bulk_io.py <source> <destination>
+    if len(sys.argv) != 3:
+        print("Usage: python bulk_io.py <source> <destination>")
+        sys.exit(1)
+
+    source, destination = sys.argv[1], sys.argv[2]
+    start = time.perf_counter()
+    with open(source, "rb", buffering=_BUFFER_SIZE) as src, \
+            open(destination, "wb", buffering=_BUFFER_SIZE) as dst:
+        written = write_records(read_records(src, detect_format(source)), dst, detect_format(destination))
+    elapsed = time.perf_counter() - start
+    print(f"Converted {written} records in {elapsed:.2f}s ({written / max(elapsed, 1e-9):,.0f} records/sec)")
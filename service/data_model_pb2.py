@@ -13,17 +13,19 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x64\x61ta_model.proto\"\x17\n\x04User\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"n\n\tSubreddit\x12\x14\n\x0csubreddit_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06public\x18\x03 \x01(\x08\x12\x0f\n\x07private\x18\x04 \x01(\x08\x12\x0e\n\x06hidden\x18\x05 \x01(\x08\x12\x0c\n\x04tags\x18\x06 \x03(\t\"\xce\x01\n\x04Post\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x11\n\tvideo_url\x18\x04 \x01(\t\x12\x11\n\timage_url\x18\x05 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x06 \x01(\t\x12\r\n\x05score\x18\x07 \x01(\x05\x12\x1a\n\x05state\x18\x08 \x01(\x0e\x32\x0b.POST_STATE\x12\x18\n\x10publication_date\x18\t \x01(\t\x12\x1d\n\tsubreddit\x18\n \x01(\x0b\x32\n.Subreddit\"\x9c\x01\n\x07\x43omment\x12\x12\n\ncomment_id\x18\x01 \x01(\t\x12\x0c\n\x04text\x18\x02 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x03 \x01(\t\x12\r\n\x05score\x18\x04 \x01(\x05\x12\x0e\n\x06hidden\x18\x05 \x01(\x08\x12\x18\n\x10publication_date\x18\x06 \x01(\t\x12\x0f\n\x07post_id\x18\x07 \x01(\t\x12\x15\n\rreplies_exist\x18\x08 \x01(\x08\"O\n\x0bVoteRequest\x12\x1b\n\x06\x61\x63tion\x18\x01 \x01(\x0e\x32\x0b.VoteAction\x12\x0f\n\x07post_id\x18\x02 \x01(\t\x12\x12\n\ncomment_id\x18\x03 \x01(\t\"D\n\x12TopCommentsRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\t\n\x01N\x18\x02 \x01(\x05\x12\x12\n\ncomment_id\x18\x03 \x01(\t\"2\n\x0eUpdateResponse\x12\x11\n\tentity_id\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x05*0\n\nPOST_STATE\x12\n\n\x06NORMAL\x10\x00\x12\n\n\x06LOCKED\x10\x01\x12\n\n\x06HIDDEN\x10\x02*&\n\nVoteAction\x12\n\n\x06UPVOTE\x10\x00\x12\x0c\n\x08\x44OWNVOTE\x10\x01\x32\xba\x02\n\rRedditService\x12\x1a\n\nCreatePost\x12\x05.Post\x1a\x05.Post\x12\x1f\n\x08VotePost\x12\x0c.VoteRequest\x1a\x05.Post\x12\x1e\n\x0eGetPostContent\x12\x05.Post\x1a\x05.Post\x12#\n\rCreateComment\x12\x08.Comment\x1a\x08.Comment\x12%\n\x0bVoteComment\x12\x0c.VoteRequest\x1a\x08.Comment\x12\x31\n\x0eGetTopComments\x12\x13.TopCommentsRequest\x1a\x08.Comment0\x01\x12+\n\x13\x45xpandCommentBranch\x12\x08.Comment\x1a\x08.Comment0\x01\x12 \n\x0eMonitorUpdates\x12\x05.Post\x1a\x05.Post0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x64\x61ta_model.proto\"\x17\n\x04User\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"n\n\tSubreddit\x12\x14\n\x0csubreddit_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06public\x18\x03 \x01(\x08\x12\x0f\n\x07private\x18\x04 \x01(\x08\x12\x0e\n\x06hidden\x18\x05 \x01(\x08\x12\x0c\n\x04tags\x18\x06 \x03(\t\"\xce\x01\n\x04Post\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x11\n\tvideo_url\x18\x04 \x01(\t\x12\x11\n\timage_url\x18\x05 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x06 \x01(\t\x12\r\n\x05score\x18\x07 \x01(\x05\x12\x1a\n\x05state\x18\x08 \x01(\x0e\x32\x0b.POST_STATE\x12\x18\n\x10publication_date\x18\t \x01(\t\x12\x1d\n\tsubreddit\x18\n \x01(\x0b\x32\n.Subreddit\"\x9c\x01\n\x07\x43omment\x12\x12\n\ncomment_id\x18\x01 \x01(\t\x12\x0c\n\x04text\x18\x02 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x03 \x01(\t\x12\r\n\x05score\x18\x04 \x01(\x05\x12\x0e\n\x06hidden\x18\x05 \x01(\x08\x12\x18\n\x10publication_date\x18\x06 \x01(\t\x12\x0f\n\x07post_id\x18\x07 \x01(\t\x12\x15\n\rreplies_exist\x18\x08 \x01(\x08\"O\n\x0bVoteRequest\x12\x1b\n\x06\x61\x63tion\x18\x01 \x01(\x0e\x32\x0b.VoteAction\x12\x0f\n\x07post_id\x18\x02 \x01(\t\x12\x12\n\ncomment_id\x18\x03 \x01(\t\"D\n\x12TopCommentsRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\t\n\x01N\x18\x02 \x01(\x05\x12\x12\n\ncomment_id\x18\x03 \x01(\t\"*\n\x0c\x43ommentBatch\x12\x1a\n\x08\x63omments\x18\x01 \x03(\x0b\x32\x08.Comment\"2\n\x0eUpdateResponse\x12\x11\n\tentity_id\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x05\"K\n\x0bStoreRecord\x12\x15\n\x04post\x18\x01 \x01(\x0b\x32\x05.PostH\x00\x12\x1b\n\x07\x63omment\x18\x02 \x01(\x0b\x32\x08.CommentH\x00\x42\x08\n\x06\x65ntity\"#\n\rExportRequest\x12\x12\n\nposts_only\x18\x01 \x01(\x08\"X\n\x0b\x42ulkSummary\x12\r\n\x05posts\x18\x01 \x01(\x03\x12\x10\n\x08\x63omments\x18\x02 \x01(\x03\x12\x0f\n\x07seconds\x18\x03 \x01(\x01\x12\x17\n\x0frecords_per_sec\x18\x04 \x01(\x01\"\x1b\n\x07PostIds\x12\x10\n\x08post_ids\x18\x01 \x03(\t\"Z\n\x0eHandoffRequest\x12\r\n\x05owner\x18\x01 \x01(\t\x12\x0e\n\x06starts\x18\x02 \x03(\x06\x12\x0c\n\x04\x65nds\x18\x03 \x03(\x06\x12\r\n\x05moved\x18\x04 \x01(\x08\x12\x0c\n\x04lift\x18\x05 \x01(\x08\"J\n\rHandoffStatus\x12\x0e\n\x06ranges\x18\x01 \x01(\x05\x12\x0e\n\x06owners\x18\x02 \x01(\x05\x12\x19\n\x11hidden_subreddits\x18\x03 \x03(\t\"&\n\x12ReplicationRequest\x12\x10\n\x08\x66rom_seq\x18\x01 \x01(\x03\"\xbd\x02\n\x08Mutation\x12\x0b\n\x03seq\x18\x01 \x01(\x03\x12\x13\n\x0bleader_time\x18\x02 \x01(\x01\x12\x11\n\tentity_id\x18\x03 \x01(\t\x12\r\n\x05reset\x18\x04 \x01(\x08\x12\x1c\n\x0b\x63reate_post\x18\x05 \x01(\x0b\x32\x05.PostH\x00\x12\"\n\x0e\x63reate_comment\x18\x06 \x01(\x0b\x32\x08.CommentH\x00\x12!\n\tvote_post\x18\x07 \x01(\x0b\x32\x0c.VoteRequestH\x00\x12$\n\x0cvote_comment\x18\x08 \x01(\x0b\x32\x0c.VoteRequestH\x00\x12\x1e\n\ndrop_posts\x18\t \x01(\x0b\x32\x08.PostIdsH\x00\x12&\n\x08moderate\x18\n \x01(\x0b\x32\x12.ModerationRequestH\x00\x12\x14\n\x0csnapshot_end\x18\x0b \x01(\x08\x42\x04\n\x02op\"\x1a\n\x18ReplicationStatusRequest\"\x95\x01\n\x11ReplicationStatus\x12\x0c\n\x04role\x18\x01 \x01(\t\x12\x13\n\x0b\x61pplied_seq\x18\x02 \x01(\x03\x12\x12\n\nleader_seq\x18\x03 \x01(\x03\x12\x15\n\rlag_mutations\x18\x04 \x01(\x03\x12\x13\n\x0blag_seconds\x18\x05 \x01(\x01\x12\x1d\n\x15seconds_since_contact\x18\x06 \x01(\x01\"&\n\x11StoreStatsRequest\x12\x11\n\ttop_posts\x18\x01 \x01(\x05\"S\n\x0eStructureStats\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0f\n\x07\x65ntries\x18\x02 \x01(\x03\x12\r\n\x05\x62ytes\x18\x03 \x01(\x03\x12\x13\n\x0b\x62ytes_delta\x18\x04 \x01(\x03\"-\n\x08PostSize\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\x10\n\x08\x63omments\x18\x02 \x01(\x03\"\xf4\x01\n\nStoreStats\x12\r\n\x05posts\x18\x01 \x01(\x03\x12\x10\n\x08\x63omments\x18\x02 \x01(\x03\x12#\n\nstructures\x18\x03 \x03(\x0b\x32\x0f.StructureStats\x12 \n\rlargest_posts\x18\x04 \x03(\x0b\x32\t.PostSize\x12\x13\n\x0btotal_bytes\x18\x05 \x01(\x03\x12\x19\n\x11total_bytes_delta\x18\x06 \x01(\x03\x12\x11\n\trss_bytes\x18\x07 \x01(\x03\x12\x1a\n\x12traced_bytes_delta\x18\x08 \x01(\x03\x12\x1f\n\x17seconds_since_last_call\x18\t \x01(\x01\"z\n\x11ModerationRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\x12\n\ncomment_id\x18\x02 \x01(\t\x12\x1a\n\x05state\x18\x03 \x01(\x0e\x32\x0b.POST_STATE\x12\x0e\n\x06hidden\x18\x04 \x01(\x08\x12\x14\n\x0csubreddit_id\x18\x05 \x01(\t\"s\n\x11ModerationSummary\x12\x14\n\x0chidden_posts\x18\x01 \x01(\x03\x12\x14\n\x0clocked_posts\x18\x02 \x01(\x03\x12\x17\n\x0fhidden_comments\x18\x03 \x01(\x03\x12\x19\n\x11hidden_subreddits\x18\x04 \x01(\x03\"@\n\x0f\x41\x63tivityRequest\x12\x0e\n\x06\x61uthor\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\"\\\n\x0c\x41\x63tivityItem\x12\x15\n\x04post\x18\x01 \x01(\x0b\x32\x05.PostH\x00\x12\x1b\n\x07\x63omment\x18\x02 \x01(\x0b\x32\x08.CommentH\x00\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\tB\x08\n\x06\x65ntity\"A\n\x0fTrendingRequest\x12\x1f\n\x06window\x18\x01 \x01(\x0e\x32\x0f.TrendingWindow\x12\r\n\x05limit\x18\x02 \x01(\x05\"S\n\x0cTrendingPost\x12\x13\n\x04post\x18\x01 \x01(\x0b\x32\x05.Post\x12\r\n\x05votes\x18\x02 \x01(\x05\x12\x1f\n\x06window\x18\x03 \x01(\x0e\x32\x0f.TrendingWindow*0\n\nPOST_STATE\x12\n\n\x06NORMAL\x10\x00\x12\n\n\x06LOCKED\x10\x01\x12\n\n\x06HIDDEN\x10\x02*&\n\nVoteAction\x12\n\n\x06UPVOTE\x10\x00\x12\x0c\n\x08\x44OWNVOTE\x10\x01*=\n\x0eTrendingWindow\x12\x10\n\x0c\x46IVE_MINUTES\x10\x00\x12\x0c\n\x08ONE_HOUR\x10\x01\x12\x0b\n\x07ONE_DAY\x10\x02\x32\xb7\x07\n\rRedditService\x12\x1a\n\nCreatePost\x12\x05.Post\x1a\x05.Post\x12\x1f\n\x08VotePost\x12\x0c.VoteRequest\x1a\x05.Post\x12\x1e\n\x0eGetPostContent\x12\x05.Post\x1a\x05.Post\x12#\n\rCreateComment\x12\x08.Comment\x1a\x08.Comment\x12%\n\x0bVoteComment\x12\x0c.VoteRequest\x1a\x08.Comment\x12\x31\n\x0eGetTopComments\x12\x13.TopCommentsRequest\x1a\x08.Comment0\x01\x12+\n\x13\x45xpandCommentBranch\x12\x08.Comment\x1a\x08.Comment0\x01\x12=\n\x15GetTopCommentsBatched\x12\x13.TopCommentsRequest\x1a\r.CommentBatch0\x01\x12\x37\n\x1a\x45xpandCommentBranchBatched\x12\x08.Comment\x1a\r.CommentBatch0\x01\x12 \n\x0eMonitorUpdates\x12\x05.Post\x1a\x05.Post0\x01\x12-\n\x0b\x45xportStore\x12\x0e.ExportRequest\x1a\x0c.StoreRecord0\x01\x12+\n\x0bImportStore\x12\x0c.StoreRecord\x1a\x0c.BulkSummary(\x01\x12#\n\tDropPosts\x12\x08.PostIds\x1a\x0c.BulkSummary\x12/\n\x0cHandOffPosts\x12\x0f.HandoffRequest\x1a\x0e.HandoffStatus\x12-\n\tReplicate\x12\x13.ReplicationRequest\x1a\t.Mutation0\x01\x12\x45\n\x14GetReplicationStatus\x12\x19.ReplicationStatusRequest\x1a\x12.ReplicationStatus\x12\x30\n\rGetStoreStats\x12\x12.StoreStatsRequest\x1a\x0b.StoreStats\x12<\n\x12SetModerationState\x12\x12.ModerationRequest\x1a\x12.ModerationSummary\x12\x34\n\x0fGetUserActivity\x12\x10.ActivityRequest\x1a\r.ActivityItem0\x01\x12\x35\n\x10GetTrendingPosts\x12\x10.TrendingRequest\x1a\r.TrendingPost0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'data_model_pb2', _globals)
 if _descriptor._USE_C_DESCRIPTORS == False:
   DESCRIPTOR._options = None
-  _globals['_POST_STATE']._serialized_start=728
-  _globals['_POST_STATE']._serialized_end=776
-  _globals['_VOTEACTION']._serialized_start=778
-  _globals['_VOTEACTION']._serialized_end=816
+  _globals['_POST_STATE']._serialized_start=2685
+  _globals['_POST_STATE']._serialized_end=2733
+  _globals['_VOTEACTION']._serialized_start=2735
+  _globals['_VOTEACTION']._serialized_end=2773
+  _globals['_TRENDINGWINDOW']._serialized_start=2775
+  _globals['_TRENDINGWINDOW']._serialized_end=2836
   _globals['_USER']._serialized_start=20
   _globals['_USER']._serialized_end=43
   _globals['_SUBREDDIT']._serialized_start=45
@@ -36,8 +38,50 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_VOTEREQUEST']._serialized_end=604
   _globals['_TOPCOMMENTSREQUEST']._serialized_start=606
   _globals['_TOPCOMMENTSREQUEST']._serialized_end=674
-  _globals['_UPDATERESPONSE']._serialized_start=676
-  _globals['_UPDATERESPONSE']._serialized_end=726
-  _globals['_REDDITSERVICE']._serialized_start=819
-  _globals['_REDDITSERVICE']._serialized_end=1133
+  _globals['_COMMENTBATCH']._serialized_start=676
+  _globals['_COMMENTBATCH']._serialized_end=718
+  _globals['_UPDATERESPONSE']._serialized_start=720
+  _globals['_UPDATERESPONSE']._serialized_end=770
+  _globals['_STORERECORD']._serialized_start=772
+  _globals['_STORERECORD']._serialized_end=847
+  _globals['_EXPORTREQUEST']._serialized_start=849
+  _globals['_EXPORTREQUEST']._serialized_end=884
+  _globals['_BULKSUMMARY']._serialized_start=886
+  _globals['_BULKSUMMARY']._serialized_end=974
+  _globals['_POSTIDS']._serialized_start=976
+  _globals['_POSTIDS']._serialized_end=1003
+  _globals['_HANDOFFREQUEST']._serialized_start=1005
+  _globals['_HANDOFFREQUEST']._serialized_end=1095
+  _globals['_HANDOFFSTATUS']._serialized_start=1097
+  _globals['_HANDOFFSTATUS']._serialized_end=1171
+  _globals['_REPLICATIONREQUEST']._serialized_start=1173
+  _globals['_REPLICATIONREQUEST']._serialized_end=1211
+  _globals['_MUTATION']._serialized_start=1214
+  _globals['_MUTATION']._serialized_end=1531
+  _globals['_REPLICATIONSTATUSREQUEST']._serialized_start=1533
+  _globals['_REPLICATIONSTATUSREQUEST']._serialized_end=1559
+  _globals['_REPLICATIONSTATUS']._serialized_start=1562
+  _globals['_REPLICATIONSTATUS']._serialized_end=1711
+  _globals['_STORESTATSREQUEST']._serialized_start=1713
+  _globals['_STORESTATSREQUEST']._serialized_end=1751
+  _globals['_STRUCTURESTATS']._serialized_start=1753
+  _globals['_STRUCTURESTATS']._serialized_end=1836
+  _globals['_POSTSIZE']._serialized_start=1838
+  _globals['_POSTSIZE']._serialized_end=1883
+  _globals['_STORESTATS']._serialized_start=1886
+  _globals['_STORESTATS']._serialized_end=2130
+  _globals['_MODERATIONREQUEST']._serialized_start=2132
+  _globals['_MODERATIONREQUEST']._serialized_end=2254
+  _globals['_MODERATIONSUMMARY']._serialized_start=2256
+  _globals['_MODERATIONSUMMARY']._serialized_end=2371
+  _globals['_ACTIVITYREQUEST']._serialized_start=2373
+  _globals['_ACTIVITYREQUEST']._serialized_end=2437
+  _globals['_ACTIVITYITEM']._serialized_start=2439
+  _globals['_ACTIVITYITEM']._serialized_end=2531
+  _globals['_TRENDINGREQUEST']._serialized_start=2533
+  _globals['_TRENDINGREQUEST']._serialized_end=2598
+  _globals['_TRENDINGPOST']._serialized_start=2600
+  _globals['_TRENDINGPOST']._serialized_end=2683
+  _globals['_REDDITSERVICE']._serialized_start=2839
+  _globals['_REDDITSERVICE']._serialized_end=3790
 # @@protoc_insertion_point(module_scope)
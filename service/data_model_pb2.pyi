@@ -16,11 +16,20 @@ class VoteAction(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
     __slots__ = []
     UPVOTE: _ClassVar[VoteAction]
     DOWNVOTE: _ClassVar[VoteAction]
+
+class TrendingWindow(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = []
+    FIVE_MINUTES: _ClassVar[TrendingWindow]
+    ONE_HOUR: _ClassVar[TrendingWindow]
+    ONE_DAY: _ClassVar[TrendingWindow]
 NORMAL: POST_STATE
 LOCKED: POST_STATE
 HIDDEN: POST_STATE
 UPVOTE: VoteAction
 DOWNVOTE: VoteAction
+FIVE_MINUTES: TrendingWindow
+ONE_HOUR: TrendingWindow
+ONE_DAY: TrendingWindow
 
 class User(_message.Message):
     __slots__ = ["user_id"]
@@ -108,6 +117,12 @@ class TopCommentsRequest(_message.Message):
     comment_id: str
     def __init__(self, post_id: _Optional[str] = ..., N: _Optional[int] = ..., comment_id: _Optional[str] = ...) -> None: ...
 
+class CommentBatch(_message.Message):
+    __slots__ = ["comments"]
+    COMMENTS_FIELD_NUMBER: _ClassVar[int]
+    comments: _containers.RepeatedCompositeFieldContainer[Comment]
+    def __init__(self, comments: _Optional[_Iterable[_Union[Comment, _Mapping]]] = ...) -> None: ...
+
 class UpdateResponse(_message.Message):
     __slots__ = ["entity_id", "score"]
     ENTITY_ID_FIELD_NUMBER: _ClassVar[int]
@@ -115,3 +130,223 @@ class UpdateResponse(_message.Message):
     entity_id: str
     score: int
     def __init__(self, entity_id: _Optional[str] = ..., score: _Optional[int] = ...) -> None: ...
+
+class StoreRecord(_message.Message):
+    __slots__ = ["post", "comment"]
+    POST_FIELD_NUMBER: _ClassVar[int]
+    COMMENT_FIELD_NUMBER: _ClassVar[int]
+    post: Post
+    comment: Comment
+    def __init__(self, post: _Optional[_Union[Post, _Mapping]] = ..., comment: _Optional[_Union[Comment, _Mapping]] = ...) -> None: ...
+
+class ExportRequest(_message.Message):
+    __slots__ = ["posts_only"]
+    POSTS_ONLY_FIELD_NUMBER: _ClassVar[int]
+    posts_only: bool
+    def __init__(self, posts_only: bool = ...) -> None: ...
+
+class BulkSummary(_message.Message):
+    __slots__ = ["posts", "comments", "seconds", "records_per_sec"]
+    POSTS_FIELD_NUMBER: _ClassVar[int]
+    COMMENTS_FIELD_NUMBER: _ClassVar[int]
+    SECONDS_FIELD_NUMBER: _ClassVar[int]
+    RECORDS_PER_SEC_FIELD_NUMBER: _ClassVar[int]
+    posts: int
+    comments: int
+    seconds: float
+    records_per_sec: float
+    def __init__(self, posts: _Optional[int] = ..., comments: _Optional[int] = ..., seconds: _Optional[float] = ..., records_per_sec: _Optional[float] = ...) -> None: ...
+
+class PostIds(_message.Message):
+    __slots__ = ["post_ids"]
+    POST_IDS_FIELD_NUMBER: _ClassVar[int]
+    post_ids: _containers.RepeatedScalarFieldContainer[str]
+    def __init__(self, post_ids: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class HandoffRequest(_message.Message):
+    __slots__ = ["owner", "starts", "ends", "moved", "lift"]
+    OWNER_FIELD_NUMBER: _ClassVar[int]
+    STARTS_FIELD_NUMBER: _ClassVar[int]
+    ENDS_FIELD_NUMBER: _ClassVar[int]
+    MOVED_FIELD_NUMBER: _ClassVar[int]
+    LIFT_FIELD_NUMBER: _ClassVar[int]
+    owner: str
+    starts: _containers.RepeatedScalarFieldContainer[int]
+    ends: _containers.RepeatedScalarFieldContainer[int]
+    moved: bool
+    lift: bool
+    def __init__(self, owner: _Optional[str] = ..., starts: _Optional[_Iterable[int]] = ..., ends: _Optional[_Iterable[int]] = ..., moved: bool = ..., lift: bool = ...) -> None: ...
+
+class HandoffStatus(_message.Message):
+    __slots__ = ["ranges", "owners", "hidden_subreddits"]
+    RANGES_FIELD_NUMBER: _ClassVar[int]
+    OWNERS_FIELD_NUMBER: _ClassVar[int]
+    HIDDEN_SUBREDDITS_FIELD_NUMBER: _ClassVar[int]
+    ranges: int
+    owners: int
+    hidden_subreddits: _containers.RepeatedScalarFieldContainer[str]
+    def __init__(self, ranges: _Optional[int] = ..., owners: _Optional[int] = ..., hidden_subreddits: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class ReplicationRequest(_message.Message):
+    __slots__ = ["from_seq"]
+    FROM_SEQ_FIELD_NUMBER: _ClassVar[int]
+    from_seq: int
+    def __init__(self, from_seq: _Optional[int] = ...) -> None: ...
+
+class Mutation(_message.Message):
+    __slots__ = ["seq", "leader_time", "entity_id", "reset", "create_post", "create_comment", "vote_post", "vote_comment", "drop_posts", "moderate", "snapshot_end"]
+    SEQ_FIELD_NUMBER: _ClassVar[int]
+    LEADER_TIME_FIELD_NUMBER: _ClassVar[int]
+    ENTITY_ID_FIELD_NUMBER: _ClassVar[int]
+    RESET_FIELD_NUMBER: _ClassVar[int]
+    CREATE_POST_FIELD_NUMBER: _ClassVar[int]
+    CREATE_COMMENT_FIELD_NUMBER: _ClassVar[int]
+    VOTE_POST_FIELD_NUMBER: _ClassVar[int]
+    VOTE_COMMENT_FIELD_NUMBER: _ClassVar[int]
+    DROP_POSTS_FIELD_NUMBER: _ClassVar[int]
+    MODERATE_FIELD_NUMBER: _ClassVar[int]
+    SNAPSHOT_END_FIELD_NUMBER: _ClassVar[int]
+    seq: int
+    leader_time: float
+    entity_id: str
+    reset: bool
+    create_post: Post
+    create_comment: Comment
+    vote_post: VoteRequest
+    vote_comment: VoteRequest
+    drop_posts: PostIds
+    moderate: ModerationRequest
+    snapshot_end: bool
+    def __init__(self, seq: _Optional[int] = ..., leader_time: _Optional[float] = ..., entity_id: _Optional[str] = ..., reset: bool = ..., create_post: _Optional[_Union[Post, _Mapping]] = ..., create_comment: _Optional[_Union[Comment, _Mapping]] = ..., vote_post: _Optional[_Union[VoteRequest, _Mapping]] = ..., vote_comment: _Optional[_Union[VoteRequest, _Mapping]] = ..., drop_posts: _Optional[_Union[PostIds, _Mapping]] = ..., moderate: _Optional[_Union[ModerationRequest, _Mapping]] = ..., snapshot_end: bool = ...) -> None: ...
+
+class ReplicationStatusRequest(_message.Message):
+    __slots__ = []
+    def __init__(self) -> None: ...
+
+class ReplicationStatus(_message.Message):
+    __slots__ = ["role", "applied_seq", "leader_seq", "lag_mutations", "lag_seconds", "seconds_since_contact"]
+    ROLE_FIELD_NUMBER: _ClassVar[int]
+    APPLIED_SEQ_FIELD_NUMBER: _ClassVar[int]
+    LEADER_SEQ_FIELD_NUMBER: _ClassVar[int]
+    LAG_MUTATIONS_FIELD_NUMBER: _ClassVar[int]
+    LAG_SECONDS_FIELD_NUMBER: _ClassVar[int]
+    SECONDS_SINCE_CONTACT_FIELD_NUMBER: _ClassVar[int]
+    role: str
+    applied_seq: int
+    leader_seq: int
+    lag_mutations: int
+    lag_seconds: float
+    seconds_since_contact: float
+    def __init__(self, role: _Optional[str] = ..., applied_seq: _Optional[int] = ..., leader_seq: _Optional[int] = ..., lag_mutations: _Optional[int] = ..., lag_seconds: _Optional[float] = ..., seconds_since_contact: _Optional[float] = ...) -> None: ...
+
+class StoreStatsRequest(_message.Message):
+    __slots__ = ["top_posts"]
+    TOP_POSTS_FIELD_NUMBER: _ClassVar[int]
+    top_posts: int
+    def __init__(self, top_posts: _Optional[int] = ...) -> None: ...
+
+class StructureStats(_message.Message):
+    __slots__ = ["name", "entries", "bytes", "bytes_delta"]
+    NAME_FIELD_NUMBER: _ClassVar[int]
+    ENTRIES_FIELD_NUMBER: _ClassVar[int]
+    BYTES_FIELD_NUMBER: _ClassVar[int]
+    BYTES_DELTA_FIELD_NUMBER: _ClassVar[int]
+    name: str
+    entries: int
+    bytes: int
+    bytes_delta: int
+    def __init__(self, name: _Optional[str] = ..., entries: _Optional[int] = ..., bytes: _Optional[int] = ..., bytes_delta: _Optional[int] = ...) -> None: ...
+
+class PostSize(_message.Message):
+    __slots__ = ["post_id", "comments"]
+    POST_ID_FIELD_NUMBER: _ClassVar[int]
+    COMMENTS_FIELD_NUMBER: _ClassVar[int]
+    post_id: str
+    comments: int
+    def __init__(self, post_id: _Optional[str] = ..., comments: _Optional[int] = ...) -> None: ...
+
+class StoreStats(_message.Message):
+    __slots__ = ["posts", "comments", "structures", "largest_posts", "total_bytes", "total_bytes_delta", "rss_bytes", "traced_bytes_delta", "seconds_since_last_call"]
+    POSTS_FIELD_NUMBER: _ClassVar[int]
+    COMMENTS_FIELD_NUMBER: _ClassVar[int]
+    STRUCTURES_FIELD_NUMBER: _ClassVar[int]
+    LARGEST_POSTS_FIELD_NUMBER: _ClassVar[int]
+    TOTAL_BYTES_FIELD_NUMBER: _ClassVar[int]
+    TOTAL_BYTES_DELTA_FIELD_NUMBER: _ClassVar[int]
+    RSS_BYTES_FIELD_NUMBER: _ClassVar[int]
+    TRACED_BYTES_DELTA_FIELD_NUMBER: _ClassVar[int]
+    SECONDS_SINCE_LAST_CALL_FIELD_NUMBER: _ClassVar[int]
+    posts: int
+    comments: int
+    structures: _containers.RepeatedCompositeFieldContainer[StructureStats]
+    largest_posts: _containers.RepeatedCompositeFieldContainer[PostSize]
+    total_bytes: int
+    total_bytes_delta: int
+    rss_bytes: int
+    traced_bytes_delta: int
+    seconds_since_last_call: float
+    def __init__(self, posts: _Optional[int] = ..., comments: _Optional[int] = ..., structures: _Optional[_Iterable[_Union[StructureStats, _Mapping]]] = ..., largest_posts: _Optional[_Iterable[_Union[PostSize, _Mapping]]] = ..., total_bytes: _Optional[int] = ..., total_bytes_delta: _Optional[int] = ..., rss_bytes: _Optional[int] = ..., traced_bytes_delta: _Optional[int] = ..., seconds_since_last_call: _Optional[float] = ...) -> None: ...
+
+class ModerationRequest(_message.Message):
+    __slots__ = ["post_id", "comment_id", "state", "hidden", "subreddit_id"]
+    POST_ID_FIELD_NUMBER: _ClassVar[int]
+    COMMENT_ID_FIELD_NUMBER: _ClassVar[int]
+    STATE_FIELD_NUMBER: _ClassVar[int]
+    HIDDEN_FIELD_NUMBER: _ClassVar[int]
+    SUBREDDIT_ID_FIELD_NUMBER: _ClassVar[int]
+    post_id: str
+    comment_id: str
+    state: POST_STATE
+    hidden: bool
+    subreddit_id: str
+    def __init__(self, post_id: _Optional[str] = ..., comment_id: _Optional[str] = ..., state: _Optional[_Union[POST_STATE, str]] = ..., hidden: bool = ..., subreddit_id: _Optional[str] = ...) -> None: ...
+
+class ModerationSummary(_message.Message):
+    __slots__ = ["hidden_posts", "locked_posts", "hidden_comments", "hidden_subreddits"]
+    HIDDEN_POSTS_FIELD_NUMBER: _ClassVar[int]
+    LOCKED_POSTS_FIELD_NUMBER: _ClassVar[int]
+    HIDDEN_COMMENTS_FIELD_NUMBER: _ClassVar[int]
+    HIDDEN_SUBREDDITS_FIELD_NUMBER: _ClassVar[int]
+    hidden_posts: int
+    locked_posts: int
+    hidden_comments: int
+    hidden_subreddits: int
+    def __init__(self, hidden_posts: _Optional[int] = ..., locked_posts: _Optional[int] = ..., hidden_comments: _Optional[int] = ..., hidden_subreddits: _Optional[int] = ...) -> None: ...
+
+class ActivityRequest(_message.Message):
+    __slots__ = ["author", "limit", "cursor"]
+    AUTHOR_FIELD_NUMBER: _ClassVar[int]
+    LIMIT_FIELD_NUMBER: _ClassVar[int]
+    CURSOR_FIELD_NUMBER: _ClassVar[int]
+    author: str
+    limit: int
+    cursor: str
+    def __init__(self, author: _Optional[str] = ..., limit: _Optional[int] = ..., cursor: _Optional[str] = ...) -> None: ...
+
+class ActivityItem(_message.Message):
+    __slots__ = ["post", "comment", "cursor"]
+    POST_FIELD_NUMBER: _ClassVar[int]
+    COMMENT_FIELD_NUMBER: _ClassVar[int]
+    CURSOR_FIELD_NUMBER: _ClassVar[int]
+    post: Post
+    comment: Comment
+    cursor: str
+    def __init__(self, post: _Optional[_Union[Post, _Mapping]] = ..., comment: _Optional[_Union[Comment, _Mapping]] = ..., cursor: _Optional[str] = ...) -> None: ...
+
+class TrendingRequest(_message.Message):
+    __slots__ = ["window", "limit"]
+    WINDOW_FIELD_NUMBER: _ClassVar[int]
+    LIMIT_FIELD_NUMBER: _ClassVar[int]
+    window: TrendingWindow
+    limit: int
+    def __init__(self, window: _Optional[_Union[TrendingWindow, str]] = ..., limit: _Optional[int] = ...) -> None: ...
+
+class TrendingPost(_message.Message):
+    __slots__ = ["post", "votes", "window"]
+    POST_FIELD_NUMBER: _ClassVar[int]
+    VOTES_FIELD_NUMBER: _ClassVar[int]
+    WINDOW_FIELD_NUMBER: _ClassVar[int]
+    post: Post
+    votes: int
+    window: TrendingWindow
+    def __init__(self, post: _Optional[_Union[Post, _Mapping]] = ..., votes: _Optional[int] = ..., window: _Optional[_Union[TrendingWindow, str]] = ...) -> None: ...
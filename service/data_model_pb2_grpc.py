@@ -50,11 +50,71 @@ class RedditServiceStub(object):
                 request_serializer=data__model__pb2.Comment.SerializeToString,
                 response_deserializer=data__model__pb2.Comment.FromString,
                 )
+        self.GetTopCommentsBatched = channel.unary_stream(
+                '/RedditService/GetTopCommentsBatched',
+                request_serializer=data__model__pb2.TopCommentsRequest.SerializeToString,
+                response_deserializer=data__model__pb2.CommentBatch.FromString,
+                )
+        self.ExpandCommentBranchBatched = channel.unary_stream(
+                '/RedditService/ExpandCommentBranchBatched',
+                request_serializer=data__model__pb2.Comment.SerializeToString,
+                response_deserializer=data__model__pb2.CommentBatch.FromString,
+                )
         self.MonitorUpdates = channel.unary_stream(
                 '/RedditService/MonitorUpdates',
                 request_serializer=data__model__pb2.Post.SerializeToString,
                 response_deserializer=data__model__pb2.Post.FromString,
                 )
+        self.ExportStore = channel.unary_stream(
+                '/RedditService/ExportStore',
+                request_serializer=data__model__pb2.ExportRequest.SerializeToString,
+                response_deserializer=data__model__pb2.StoreRecord.FromString,
+                )
+        self.ImportStore = channel.stream_unary(
+                '/RedditService/ImportStore',
+                request_serializer=data__model__pb2.StoreRecord.SerializeToString,
+                response_deserializer=data__model__pb2.BulkSummary.FromString,
+                )
+        self.DropPosts = channel.unary_unary(
+                '/RedditService/DropPosts',
+                request_serializer=data__model__pb2.PostIds.SerializeToString,
+                response_deserializer=data__model__pb2.BulkSummary.FromString,
+                )
+        self.HandOffPosts = channel.unary_unary(
+                '/RedditService/HandOffPosts',
+                request_serializer=data__model__pb2.HandoffRequest.SerializeToString,
+                response_deserializer=data__model__pb2.HandoffStatus.FromString,
+                )
+        self.Replicate = channel.unary_stream(
+                '/RedditService/Replicate',
+                request_serializer=data__model__pb2.ReplicationRequest.SerializeToString,
+                response_deserializer=data__model__pb2.Mutation.FromString,
+                )
+        self.GetReplicationStatus = channel.unary_unary(
+                '/RedditService/GetReplicationStatus',
+                request_serializer=data__model__pb2.ReplicationStatusRequest.SerializeToString,
+                response_deserializer=data__model__pb2.ReplicationStatus.FromString,
+                )
+        self.GetStoreStats = channel.unary_unary(
+                '/RedditService/GetStoreStats',
+                request_serializer=data__model__pb2.StoreStatsRequest.SerializeToString,
+                response_deserializer=data__model__pb2.StoreStats.FromString,
+                )
+        self.SetModerationState = channel.unary_unary(
+                '/RedditService/SetModerationState',
+                request_serializer=data__model__pb2.ModerationRequest.SerializeToString,
+                response_deserializer=data__model__pb2.ModerationSummary.FromString,
+                )
+        self.GetUserActivity = channel.unary_stream(
+                '/RedditService/GetUserActivity',
+                request_serializer=data__model__pb2.ActivityRequest.SerializeToString,
+                response_deserializer=data__model__pb2.ActivityItem.FromString,
+                )
+        self.GetTrendingPosts = channel.unary_stream(
+                '/RedditService/GetTrendingPosts',
+                request_serializer=data__model__pb2.TrendingRequest.SerializeToString,
+                response_deserializer=data__model__pb2.TrendingPost.FromString,
+                )
 
 
 class RedditServiceServicer(object):
@@ -110,6 +170,20 @@ class RedditServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetTopCommentsBatched(self, request, context):
+        """GetTopComments, streamed in batches of comments sized by the server
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ExpandCommentBranchBatched(self, request, context):
+        """ExpandCommentBranch, streamed in batches of comments sized by the server
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def MonitorUpdates(self, request, context):
         """Extra credit: Monitor updates - client initiates the call with a post
         """
@@ -117,6 +191,76 @@ class RedditServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ExportStore(self, request, context):
+        """Stream every post and comment in the store
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ImportStore(self, request_iterator, context):
+        """Load a stream of posts and comments straight into the store
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DropPosts(self, request, context):
+        """Remove posts and their comments from this node (used when rebalancing partitions)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def HandOffPosts(self, request, context):
+        """Refuse writes to posts in ranges handed over to another node (used when rebalancing partitions)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Replicate(self, request, context):
+        """Stream the leader's mutations to a follower
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetReplicationStatus(self, request, context):
+        """Report the replication position and lag of this node
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetStoreStats(self, request, context):
+        """Report entity counts, estimated memory per structure and the largest posts
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SetModerationState(self, request, context):
+        """Lock, hide or restore a post, hide or show a comment, or hide or show a subreddit
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetUserActivity(self, request, context):
+        """Stream a page of an author's posts and comments, most recent first
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetTrendingPosts(self, request, context):
+        """Stream the posts that gained the most votes over a recent window, fastest first
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RedditServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -155,11 +299,71 @@ def add_RedditServiceServicer_to_server(servicer, server):
                     request_deserializer=data__model__pb2.Comment.FromString,
                     response_serializer=data__model__pb2.Comment.SerializeToString,
             ),
+            'GetTopCommentsBatched': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetTopCommentsBatched,
+                    request_deserializer=data__model__pb2.TopCommentsRequest.FromString,
+                    response_serializer=data__model__pb2.CommentBatch.SerializeToString,
+            ),
+            'ExpandCommentBranchBatched': grpc.unary_stream_rpc_method_handler(
+                    servicer.ExpandCommentBranchBatched,
+                    request_deserializer=data__model__pb2.Comment.FromString,
+                    response_serializer=data__model__pb2.CommentBatch.SerializeToString,
+            ),
             'MonitorUpdates': grpc.unary_stream_rpc_method_handler(
                     servicer.MonitorUpdates,
                     request_deserializer=data__model__pb2.Post.FromString,
                     response_serializer=data__model__pb2.Post.SerializeToString,
             ),
+            'ExportStore': grpc.unary_stream_rpc_method_handler(
+                    servicer.ExportStore,
+                    request_deserializer=data__model__pb2.ExportRequest.FromString,
+                    response_serializer=data__model__pb2.StoreRecord.SerializeToString,
+            ),
+            'ImportStore': grpc.stream_unary_rpc_method_handler(
+                    servicer.ImportStore,
+                    request_deserializer=data__model__pb2.StoreRecord.FromString,
+                    response_serializer=data__model__pb2.BulkSummary.SerializeToString,
+            ),
+            'DropPosts': grpc.unary_unary_rpc_method_handler(
+                    servicer.DropPosts,
+                    request_deserializer=data__model__pb2.PostIds.FromString,
+                    response_serializer=data__model__pb2.BulkSummary.SerializeToString,
+            ),
+            'HandOffPosts': grpc.unary_unary_rpc_method_handler(
+                    servicer.HandOffPosts,
+                    request_deserializer=data__model__pb2.HandoffRequest.FromString,
+                    response_serializer=data__model__pb2.HandoffStatus.SerializeToString,
+            ),
+            'Replicate': grpc.unary_stream_rpc_method_handler(
+                    servicer.Replicate,
+                    request_deserializer=data__model__pb2.ReplicationRequest.FromString,
+                    response_serializer=data__model__pb2.Mutation.SerializeToString,
+            ),
+            'GetReplicationStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetReplicationStatus,
+                    request_deserializer=data__model__pb2.ReplicationStatusRequest.FromString,
+                    response_serializer=data__model__pb2.ReplicationStatus.SerializeToString,
+            ),
+            'GetStoreStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetStoreStats,
+                    request_deserializer=data__model__pb2.StoreStatsRequest.FromString,
+                    response_serializer=data__model__pb2.StoreStats.SerializeToString,
+            ),
+            'SetModerationState': grpc.unary_unary_rpc_method_handler(
+                    servicer.SetModerationState,
+                    request_deserializer=data__model__pb2.ModerationRequest.FromString,
+                    response_serializer=data__model__pb2.ModerationSummary.SerializeToString,
+            ),
+            'GetUserActivity': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetUserActivity,
+                    request_deserializer=data__model__pb2.ActivityRequest.FromString,
+                    response_serializer=data__model__pb2.ActivityItem.SerializeToString,
+            ),
+            'GetTrendingPosts': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetTrendingPosts,
+                    request_deserializer=data__model__pb2.TrendingRequest.FromString,
+                    response_serializer=data__model__pb2.TrendingPost.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'RedditService', rpc_method_handlers)
@@ -290,6 +494,40 @@ class RedditService(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def GetTopCommentsBatched(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/RedditService/GetTopCommentsBatched',
+            data__model__pb2.TopCommentsRequest.SerializeToString,
+            data__model__pb2.CommentBatch.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ExpandCommentBranchBatched(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/RedditService/ExpandCommentBranchBatched',
+            data__model__pb2.Comment.SerializeToString,
+            data__model__pb2.CommentBatch.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def MonitorUpdates(request,
             target,
@@ -306,3 +544,173 @@ class RedditService(object):
             data__model__pb2.Post.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ExportStore(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/RedditService/ExportStore',
+            data__model__pb2.ExportRequest.SerializeToString,
+            data__model__pb2.StoreRecord.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ImportStore(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/RedditService/ImportStore',
+            data__model__pb2.StoreRecord.SerializeToString,
+            data__model__pb2.BulkSummary.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def DropPosts(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/RedditService/DropPosts',
+            data__model__pb2.PostIds.SerializeToString,
+            data__model__pb2.BulkSummary.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def HandOffPosts(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/RedditService/HandOffPosts',
+            data__model__pb2.HandoffRequest.SerializeToString,
+            data__model__pb2.HandoffStatus.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Replicate(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/RedditService/Replicate',
+            data__model__pb2.ReplicationRequest.SerializeToString,
+            data__model__pb2.Mutation.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetReplicationStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/RedditService/GetReplicationStatus',
+            data__model__pb2.ReplicationStatusRequest.SerializeToString,
+            data__model__pb2.ReplicationStatus.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetStoreStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/RedditService/GetStoreStats',
+            data__model__pb2.StoreStatsRequest.SerializeToString,
+            data__model__pb2.StoreStats.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def SetModerationState(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/RedditService/SetModerationState',
+            data__model__pb2.ModerationRequest.SerializeToString,
+            data__model__pb2.ModerationSummary.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetUserActivity(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/RedditService/GetUserActivity',
+            data__model__pb2.ActivityRequest.SerializeToString,
+            data__model__pb2.ActivityItem.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetTrendingPosts(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/RedditService/GetTrendingPosts',
+            data__model__pb2.TrendingRequest.SerializeToString,
+            data__model__pb2.TrendingPost.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -0,0 +1,88 @@
+# Author - Akshita Patil
+
+import bisect
+import hashlib
+import threading
+
+"""
+    Write fences for posts handed over to another partition.
+
+    When a node joins the hash ring, each existing node gives up the ranges of post ID
+    hashes the new node now owns. The router fences those ranges on the old owner before
+    copying: writes to posts in them are refused while the copy runs, so no write lands
+    on a post that is about to be dropped, whichever client sent it. Once the new owner
+    serves the posts the fence stays, and writes from clients that still route by the old
+    ring are refused and name the new owner instead of being silently lost.
+
+    Post IDs are placed with the same hash as the router's ring (routing._hash): the first
+    8 bytes of the MD5 of the ID, big-endian.
+    """
+
+_MAX_HASH = (1 << 64) - 1
+
+
+def key_hash(post_id):
+    return int.from_bytes(hashlib.md5(post_id.encode("utf-8")).digest()[:8], "big")
+
+
+class HandoffFences:
+    """Hash ranges of post IDs handed over to other nodes, by new owner."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Owner -> (sorted exclusive range ends, matching inclusive starts, moved)
+        self._fences = {}
+
+    def fence(self, owner, starts, ends, moved):
+        """
+            Fences ranges of post ID hashes handed over to a node, replacing its earlier fence.
+
+            Args:
+                owner (str): The node taking over the posts.
+                starts: Inclusive start of each range.
+                ends: Exclusive end of each range; a range whose start is not below its end
+                    wraps around the ring.
+                moved (bool): False while the posts are copied, True once the owner serves them.
+
+            Returns:
+                int: The number of ranges fenced for the owner.
+            """
+        ranges = []
+        for start, end in zip(starts, ends):
+            if start < end:
+                ranges.append((end, start))
+            else:
+                ranges.append((_MAX_HASH + 1, start))
+                if end:
+                    ranges.append((end, 0))
+        ranges.sort()
+        with self._lock:
+            self._fences[owner] = ([end for end, _ in ranges], [start for _, start in ranges], moved)
+        return len(starts)
+
+    def lift(self, owner):
+        """Removes the fence of a handover, e.g. one that was aborted."""
+        with self._lock:
+            self._fences.pop(owner, None)
+
+    def owner_of(self, post_id):
+        """
+            Returns (new owner, moved) if a post was handed over, or None.
+
+            Args:
+                post_id (str): The post being written to.
+            """
+        with self._lock:
+            if not self._fences:
+                return None
+            fences = list(self._fences.items())
+        point = key_hash(post_id)
+        for owner, (ends, starts, moved) in fences:
+            index = bisect.bisect_right(ends, point)
+            if index < len(ends) and starts[index] <= point:
+                return owner, moved
+        return None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._fences)
@@ -0,0 +1,152 @@
+# Author - Akshita Patil
+
+import sys
+import threading
+import time
+import uuid
+
+"""
+    Idempotency keys for the create RPCs.
+
+    A client that may retry a CreatePost or CreateComment sends the same key in the
+    'idempotency-key' metadata entry of every attempt. The server remembers which entity
+    each key created and answers a repeated key with the entity it already created.
+
+    The cache holds two generations of plain dicts, key -> entity ID. New keys go into
+    the current generation; every TTL (or when it fills up) the current generation
+    becomes the previous one and the old previous one is dropped whole. A key is thus
+    remembered for between one and two TTLs, eviction is O(1), and an entry costs a dict
+    slot and the key string (entity IDs are shared with the stores).
+    """
+
+METADATA_KEY = "idempotency-key"
+
+
+def key_from_metadata(context):
+    """Returns the idempotency key sent with a call, or None."""
+    for key, value in context.invocation_metadata() or ():
+        if key == METADATA_KEY:
+            return value
+    return None
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+class IdempotencyCache:
+    """
+        Bounded cache of idempotency key -> ID of the entity created under it.
+
+        Args:
+            capacity (int): Maximum number of keys remembered.
+            ttl (float): Seconds a key is remembered for: at least this (unless the cache
+                fills up first) and at most twice this.
+            clock (callable): Monotonic time source, replaceable in tests.
+        """
+
+    def __init__(self, capacity=1_000_000, ttl=600.0, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.evicted = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._current = {}
+        self._previous = {}
+        self._current_key_bytes = 0
+        self._previous_key_bytes = 0
+        self._rotated_at = clock()
+
+    def get(self, key):
+        """
+            Looks up the entity created under a key.
+
+            Args:
+                key (str): The client's idempotency key.
+
+            Returns:
+                str: The ID of the entity, or None if the key is unknown or has expired.
+            """
+        with self._lock:
+            self._expire()
+            entity_id = self._current.get(key)
+            if entity_id is None:
+                entity_id = self._previous.get(key)
+            if entity_id is not None:
+                self.hits += 1
+            return entity_id
+
+    def put(self, key, entity_id):
+        """Remembers the entity created under a key."""
+        with self._lock:
+            self._expire()
+            if key not in self._current:
+                self._current_key_bytes += sys.getsizeof(key)
+            self._current[key] = entity_id
+            if len(self._current) >= self.capacity // 2:
+                self._rotate()
+                self._rotated_at = self._clock()
+
+    def _expire(self):
+        # Generations start on TTL boundaries, so nothing outlives two TTLs however rarely
+        # the cache is used
+        periods = int((self._clock() - self._rotated_at) // self.ttl)
+        if periods:
+            self._rotate()
+            if periods > 1:
+                self._rotate()
+            self._rotated_at += periods * self.ttl
+
+    def _rotate(self):
+        self.evicted += len(self._previous)
+        self._previous, self._previous_key_bytes = self._current, self._current_key_bytes
+        self._current, self._current_key_bytes = {}, 0
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+    def size(self):
+        """Returns (keys, estimated bytes), for memory accounting."""
+        with self._lock:
+            return (len(self._current) + len(self._previous),
+                    sys.getsizeof(self._current) + sys.getsizeof(self._previous)
+                    + self._current_key_bytes + self._previous_key_bytes)
+
+
+def benchmark(key_count=1_000_000, lookups=200_000):
+    """
+        Fills a cache with key_count keys and measures its memory and lookup cost.
+
+        Returns:
+            tuple: (estimated bytes, traced bytes, seconds per hit, seconds per miss).
+        """
+    import tracemalloc
+    # Entity IDs already exist in the stores, so only the keys and the cache are traced
+    entity_ids = [str(i + 1) for i in range(key_count)]
+    tracemalloc.start()
+    keys = [new_key() for _ in range(key_count)]
+    cache = IdempotencyCache(capacity=2 * key_count)
+    for key, entity_id in zip(keys, entity_ids):
+        cache.put(key, entity_id)
+    traced = tracemalloc.get_traced_memory()[0] - sys.getsizeof(keys)
+    tracemalloc.stop()
+    entries, estimated = cache.size()
+
+    start = time.perf_counter()
+    for key in keys[:lookups]:
+        cache.get(key)
+    hit = (time.perf_counter() - start) / lookups
+    misses = [new_key() for _ in range(lookups)]
+    start = time.perf_counter()
+    for key in misses:
+        cache.get(key)
+    miss = (time.perf_counter() - start) / lookups
+
+    print(f"{entries:,} keys: ~{estimated / 2**20:.0f} MiB estimated, {traced / 2**20:.0f} MiB traced, "
+          f"hit {hit * 1e9:.0f} ns, miss {miss * 1e9:.0f} ns")
+    return estimated, traced, hit, miss
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,301 @@
+# Author - Akshita Patil
+
+import heapq
+import itertools
+import operator
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from data_model_pb2 import Post, Comment, StoreStats, StructureStats, PostSize
+
+"""
+    Incremental memory accounting for the post and comment stores.
+
+    StoreAccountant is told about every entity added to or removed from the stores and
+    keeps running totals, so a stats request costs O(number of structures + top posts)
+    rather than a walk over every stored object.
+
+    Sizes are estimates: an entity is counted as its Python wrapper, its serialized size
+    and its ID string, measured once when it is stored. Other structures (caches, logs,
+    queues) register a sizer that reports their own running totals.
+    """
+
+# Size of a message's Python wrapper object, excluding its field data
+MESSAGE_OVERHEAD = sys.getsizeof(Post())
+# An empty list plus the dict slot pointing at it, per post in the comment index
+_INDEX_LIST_OVERHEAD = sys.getsizeof([]) + 3 * 8
+# One list slot per comment in the comment index (the ID string is shared with the store)
+_INDEX_SLOT = 8
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def entity_bytes(entity_id, message):
+    """Estimated bytes held by one stored post or comment, including its ID."""
+    return MESSAGE_OVERHEAD + message.ByteSize() + sys.getsizeof(entity_id)
+
+
+def rss_bytes():
+    """Resident set size of this process, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class StoreAccountant:
+    """
+        Running counts and byte estimates for the stores and registered structures.
+
+        Args:
+            top_posts (int): How many of the largest posts (by comment count) to track.
+        """
+
+    def __init__(self, top_posts=20):
+        self._lock = threading.Lock()
+        self._top_capacity = top_posts
+        self._sizers = {}
+        self._previous = {}
+        self._previous_traced = None
+        self._last_call = None
+        self.reset()
+
+    def reset(self):
+        """Forgets all entity totals, e.g. after the stores are cleared or replaced."""
+        with self._lock:
+            self.posts = 0
+            self.comments = 0
+            self.post_bytes = 0
+            self.comment_bytes = 0
+            self.indexed_posts = 0
+            self.indexed_comments = 0
+            self._top = {}
+            self._top_floor = 0
+
+    def seed(self, posts, comments, post_comments, sample=64, index_sizes=None):
+        """
+            Starts the totals from stores that were filled without going through the
+            accountant, such as a snapshot.
+
+            Counts are exact; bytes are extrapolated from the first `sample` entries of each
+            store, so seeding never walks (or faults in) the whole store. The largest posts
+            are found from the length of every index entry, in O(posts).
+
+            Args:
+                posts: The post store.
+                comments: The comment store.
+                post_comments: The per-post comment index.
+                sample (int): Entries measured per store.
+                index_sizes: (post ID, comment count) of every index entry, for indexes that
+                    can count an entry without loading it; by default each entry is read.
+            """
+        post_bytes = _extrapolate(posts, sample)
+        comment_bytes = _extrapolate(comments, sample)
+        if index_sizes is None:
+            index_sizes = ((post_id, len(comment_ids)) for post_id, comment_ids in post_comments.items())
+        largest = heapq.nlargest(self._top_capacity, index_sizes, key=operator.itemgetter(1))
+        with self._lock:
+            self.posts = len(posts)
+            self.comments = len(comments)
+            self.post_bytes = post_bytes
+            self.comment_bytes = comment_bytes
+            self.indexed_posts = len(post_comments)
+            self.indexed_comments = len(comments)
+            self._top = dict(largest)
+            self._top_floor = min(self._top.values(), default=0) if len(self._top) >= self._top_capacity else 0
+
+    def register(self, name, sizer):
+        """
+            Adds a structure to the report.
+
+            Args:
+                name (str): Name shown in the report.
+                sizer (callable): Returns (entries, estimated bytes); must be cheap.
+            """
+        self._sizers[name] = sizer
+
+    def unregister(self, name):
+        self._sizers.pop(name, None)
+
+    def post_added(self, post_id, post, replaced=None):
+        """
+            Counts a stored post.
+
+            Args:
+                post_id: ID of the post.
+                post: The stored Post.
+                replaced: The Post previously stored under the same ID, if any.
+            """
+        with self._lock:
+            if replaced is None:
+                self.posts += 1
+            else:
+                self.post_bytes -= entity_bytes(post_id, replaced)
+            self.post_bytes += entity_bytes(post_id, post)
+
+    def post_removed(self, post_id, post):
+        with self._lock:
+            self.posts -= 1
+            self.post_bytes -= entity_bytes(post_id, post)
+
+    def comment_added(self, comment_id, comment, replaced=None):
+        """Counts a stored comment; see post_added."""
+        with self._lock:
+            if replaced is None:
+                self.comments += 1
+            else:
+                self.comment_bytes -= entity_bytes(comment_id, replaced)
+            self.comment_bytes += entity_bytes(comment_id, comment)
+
+    def comment_removed(self, comment_id, comment):
+        with self._lock:
+            self.comments -= 1
+            self.comment_bytes -= entity_bytes(comment_id, comment)
+
+    def index_grew(self, post_id, added, size):
+        """
+            Counts comment IDs appended to a post's entry in the comment index.
+
+            Args:
+                post_id: The post whose index entry grew.
+                added (int): How many comment IDs were appended.
+                size (int): Length of the post's index entry afterwards.
+            """
+        with self._lock:
+            if size == added:
+                self.indexed_posts += 1
+            self.indexed_comments += added
+            self._track_largest(post_id, size)
+
+    def index_removed(self, post_id, size):
+        with self._lock:
+            self.indexed_posts -= 1
+            self.indexed_comments -= size
+            if self._top.pop(post_id, None) is not None:
+                self._top_floor = min(self._top.values(), default=0)
+
+    def _track_largest(self, post_id, count):
+        # Keep the posts with the most comments. Index entries only grow, so a post outside
+        # the set can only join it by overtaking the smallest member; after a drop frees a
+        # slot, it's filled by the next post to gain a comment, which makes the set
+        # approximate until the next seed (see StoreStats.largest_posts).
+        top = self._top
+        if post_id in top or len(top) < self._top_capacity:
+            top[post_id] = count
+        elif count > self._top_floor:
+            del top[min(top, key=top.get)]
+            top[post_id] = count
+        else:
+            return
+        if len(top) >= self._top_capacity:
+            self._top_floor = min(top.values())
+
+    def structures(self, posts, comments):
+        """Returns (name, entries, bytes) for every tracked structure."""
+        with self._lock:
+            rows = [
+                ("posts", self.posts, self.post_bytes + _table_bytes(posts)),
+                ("comments", self.comments, self.comment_bytes + _table_bytes(comments)),
+                ("post_comments", self.indexed_posts,
+                 self.indexed_posts * _INDEX_LIST_OVERHEAD + self.indexed_comments * _INDEX_SLOT),
+            ]
+        for name, sizer in self._sizers.items():
+            entries, size = sizer()
+            rows.append((name, entries, size))
+        return rows
+
+    def stats(self, posts, comments, top_posts=10):
+        """
+            Builds a StoreStats report, with growth since the previous report.
+
+            Args:
+                posts: The post store.
+                comments: The comment store.
+                top_posts (int): How many of the largest posts to include.
+
+            Returns:
+                StoreStats: The report.
+            """
+        result = StoreStats(posts=len(posts), comments=len(comments), rss_bytes=rss_bytes())
+        rows = self.structures(posts, comments)
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+        # Deltas against the previous report, which concurrent callers share
+        with self._lock:
+            now = time.monotonic()
+            for name, entries, size in rows:
+                result.structures.append(StructureStats(name=name, entries=entries, bytes=size,
+                                                        bytes_delta=size - self._previous.get(name, 0)))
+                self._previous[name] = size
+                result.total_bytes += size
+                result.total_bytes_delta += result.structures[-1].bytes_delta
+            if traced is not None:
+                if self._previous_traced is not None:
+                    result.traced_bytes_delta = traced - self._previous_traced
+                self._previous_traced = traced
+            if self._last_call is not None:
+                result.seconds_since_last_call = now - self._last_call
+            self._last_call = now
+            largest = sorted(self._top.items(), key=lambda item: item[1], reverse=True)[:top_posts]
+        result.largest_posts.extend(PostSize(post_id=post_id, comments=count) for post_id, count in largest)
+        return result
+
+
+def _extrapolate(store, sample):
+    measured = [entity_bytes(key, value) for key, value in itertools.islice(store.items(), sample)]
+    if not measured:
+        return 0
+    return sum(measured) * len(store) // len(measured)
+
+
+def _table_bytes(store):
+    # sys.getsizeof of a dict is its hash table only, which is O(1) to measure
+    return sys.getsizeof(store) if isinstance(store, dict) else 0
+
+
+def benchmark(comment_count=1_000_000, post_count=10_000, calls=100):
+    """
+        Compares a GetStoreStats-style report against walking the stores to size them.
+
+        Returns:
+            tuple: (seconds per report, seconds per full walk).
+        """
+    accountant = StoreAccountant()
+    posts = {}
+    comments = {}
+    index = {}
+    for i in range(post_count):
+        post_id = str(i)
+        posts[post_id] = Post(post_id=post_id, title=f"Post {i}")
+        accountant.post_added(post_id, posts[post_id])
+    for i in range(comment_count):
+        comment_id = str(i)
+        comment = Comment(comment_id=comment_id, post_id=str(i % post_count), text="Comment text")
+        comments[comment_id] = comment
+        entry = index.setdefault(comment.post_id, [])
+        entry.append(comment_id)
+        accountant.comment_added(comment_id, comment)
+        accountant.index_grew(comment.post_id, 1, len(entry))
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        accountant.stats(posts, comments)
+    report = (time.perf_counter() - start) / calls
+
+    start = time.perf_counter()
+    walked = sum(entity_bytes(key, value) for key, value in comments.items())
+    walked += sum(entity_bytes(key, value) for key, value in posts.items())
+    walk = time.perf_counter() - start
+
+    tracked = accountant.post_bytes + accountant.comment_bytes
+    print(f"{comment_count:,} comments: report {report * 1e6:.1f} us, full walk {walk * 1000:.0f} ms "
+          f"(tracked {tracked:,} bytes, walked {walked:,})")
+    return report, walk
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,563 @@
+# Author - Akshita Patil
+
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+
+import grpc
+from google.protobuf import __version__ as protobuf_version
+from google.protobuf.internal import api_implementation
+
+from data_model_pb2 import Post, Comment, CommentBatch, StoreRecord, VoteRequest, VoteAction, TopCommentsRequest
+from data_model_pb2 import ActivityRequest, StoreStatsRequest, TrendingRequest, ONE_HOUR
+
+"""
+    Micro-benchmark suite for the servicer, message serialization and the stores, with
+    regression gates.
+
+    Servicer cases call RedditServicer methods in-process with a StubContext, so they time
+    the handler alone, without the network and gRPC's serializers. Serialization cases time
+    encoding and decoding of the messages under each protobuf backend that is installed;
+    the backend is fixed when protobuf is imported, so each one runs in a child process.
+    Store cases time the module-level store operations against stores filled to `scale`
+    comments.
+
+    Every case reports the median and the fastest time per operation over several rounds,
+    each round long enough to swamp timer overhead. Results are written as JSON with sorted
+    keys and no timestamps, so two runs diff cleanly. They can be compared against a stored
+    baseline: a case regresses when its fastest round grows by more than the threshold for
+    that case. The fastest round is the one least disturbed by other work on the machine,
+    which only ever adds time. A baseline case missing from the run, or a serialization
+    worker that crashes, fails the comparison as well.
+
+        python microbench.py --output results.json
+        python microbench.py --baseline results.json --threshold 0.1 --case-threshold 'store.*=0.25'
+    """
+
+# Protobuf backends tried for the serialization cases
+BACKENDS = ("upb", "cpp", "python")
+# Allowed growth of a case's fastest round before it counts as a regression
+DEFAULT_THRESHOLD = 0.10
+
+_cases = {}
+
+
+def case(name, group="servicer"):
+    """
+        Registers a benchmark case.
+
+        The decorated function sets the case up and returns the operation to time. It takes
+        the suite's scale, plus the servicer for servicer and store cases.
+        """
+    def register(setup):
+        _cases[f"{group}.{name}"] = setup
+        return setup
+    return register
+
+
+class StubContext:
+    """
+        Minimal stand-in for grpc.ServicerContext, for calling servicer methods in-process.
+
+        Args:
+            metadata: Invocation metadata, as (key, value) pairs.
+        """
+
+    def __init__(self, metadata=()):
+        self._metadata = tuple(metadata)
+        self.code = None
+        self.details = None
+        self.trailing_metadata = ()
+
+    def invocation_metadata(self):
+        return self._metadata
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    def set_trailing_metadata(self, metadata):
+        self.trailing_metadata = metadata
+
+    def abort(self, code, details):
+        self.code, self.details = code, details
+        raise grpc.RpcError(details)
+
+    def time_remaining(self):
+        return None
+
+    def is_active(self):
+        return True
+
+    def peer(self):
+        return "in-process"
+
+    def add_callback(self, callback):
+        return False
+
+
+def measure(operation, rounds=5, min_round_time=0.05):
+    """
+        Times an operation.
+
+        The number of calls per round doubles until a round takes at least min_round_time;
+        then `rounds` rounds are timed. The garbage collector is off while timing, as in
+        timeit, so a collection triggered by one case isn't charged to another.
+
+        Returns:
+            dict: Median and fastest nanoseconds per call, calls per round and rounds.
+        """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                operation()
+            if time.perf_counter() - start >= min_round_time or number >= 1 << 24:
+                break
+            number *= 2
+        per_call = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(number):
+                operation()
+            per_call.append((time.perf_counter() - start) / number)
+    finally:
+        if collecting:
+            gc.enable()
+    return {"median_ns": round(statistics.median(per_call) * 1e9, 1), "min_ns": round(min(per_call) * 1e9, 1),
+            "number": number, "rounds": rounds}
+
+
+def _comment(i, post_id="bench"):
+    return Comment(comment_id=f"{post_id}-{i}", post_id=post_id, text="A comment of typical length " * 3,
+                   author=f"user{i % 100}", score=i % 1000, publication_date="2023-12-12T12:00:00Z")
+
+
+def _post(post_id="bench"):
+    return Post(post_id=post_id, title="Benchmark post", text="Body of the post " * 10, author="poster",
+                publication_date="2023-12-12T12:00:00Z")
+
+
+def _fill(comments_per_post):
+    # The post read by the cases, with comments_per_post comments, and a post the write
+    # cases add comments to and vote on, so they don't change what the read cases measure
+    import server
+    server.store_post("bench", _post())
+    for i in range(comments_per_post):
+        server.store_comment(f"bench-{i}", _comment(i))
+    server.store_post("bench-writes", _post("bench-writes"))
+    voted = _comment(0, "bench-writes")
+    voted.comment_id = "bench-writes-voted"
+    server.store_comment(voted.comment_id, voted)
+
+
+# Servicer methods, called in-process; `scale` is the number of comments on the post read
+
+@case("GetPostContent")
+def _get_post_content(scale, servicer):
+    request, context = Post(post_id="bench"), StubContext()
+    return lambda: servicer.GetPostContent(request, context)
+
+
+@case("GetTopComments.view")
+def _get_top_comments(scale, servicer):
+    request, context = TopCommentsRequest(post_id="bench", N=25), StubContext()
+    return lambda: deque(servicer.GetTopComments(request, context), 0)
+
+
+@case("GetTopComments.ranked")
+def _get_top_comments_ranked(scale, servicer):
+    # A post not read before: ranks every comment (the materialized view is dropped each call)
+    import server
+    request, context = TopCommentsRequest(post_id="bench", N=25), StubContext()
+
+    def operation():
+        server.top_views.discard("bench")
+        deque(servicer.GetTopComments(request, context), 0)
+    return operation
+
+
+@case("GetTopCommentsBatched")
+def _get_top_comments_batched(scale, servicer):
+    request, context = TopCommentsRequest(post_id="bench", N=500), StubContext()
+    return lambda: deque(servicer.GetTopCommentsBatched(request, context), 0)
+
+
+@case("VotePost")
+def _vote_post(scale, servicer):
+    request, context = VoteRequest(post_id="bench-writes", action=VoteAction.UPVOTE), StubContext()
+    return lambda: servicer.VotePost(request, context)
+
+
+@case("VoteComment")
+def _vote_comment(scale, servicer):
+    request, context = VoteRequest(comment_id="bench-writes-voted", action=VoteAction.UPVOTE), StubContext()
+    return lambda: servicer.VoteComment(request, context)
+
+
+@case("CreateComment")
+def _create_comment(scale, servicer):
+    context = StubContext()
+    # Without an ID, so the server assigns one as it would for a client
+    request = Comment(post_id="bench-writes", text="A new comment", author="writer",
+                      publication_date="2023-12-13T00:00:00Z")
+    return lambda: servicer.CreateComment(request, context)
+
+
+@case("GetUserActivity")
+def _get_user_activity(scale, servicer):
+    request, context = ActivityRequest(author="user7", limit=25), StubContext()
+    return lambda: deque(servicer.GetUserActivity(request, context), 0)
+
+
+@case("GetTrendingPosts")
+def _get_trending_posts(scale, servicer):
+    request, context = TrendingRequest(window=ONE_HOUR, limit=25), StubContext()
+    vote = VoteRequest(post_id="bench", action=VoteAction.UPVOTE)
+    for _ in range(10):
+        servicer.VotePost(vote, context)
+    return lambda: deque(servicer.GetTrendingPosts(request, context), 0)
+
+
+@case("GetStoreStats")
+def _get_store_stats(scale, servicer):
+    request, context = StoreStatsRequest(), StubContext()
+    return lambda: servicer.GetStoreStats(request, context)
+
+
+# Message serialization, run once per protobuf backend
+
+@case("post.encode", "serialization")
+def _post_encode(scale):
+    post = _post()
+    return post.SerializeToString
+
+
+@case("post.decode", "serialization")
+def _post_decode(scale):
+    data = _post().SerializeToString()
+    return lambda: Post.FromString(data)
+
+
+@case("comment.encode", "serialization")
+def _comment_encode(scale):
+    comment = _comment(1)
+    return comment.SerializeToString
+
+
+@case("comment.decode", "serialization")
+def _comment_decode(scale):
+    data = _comment(1).SerializeToString()
+    return lambda: Comment.FromString(data)
+
+
+@case("comment.byte_size", "serialization")
+def _comment_byte_size(scale):
+    comment = _comment(1)
+    return comment.ByteSize
+
+
+@case("batch100.encode", "serialization")
+def _batch_encode(scale):
+    batch = CommentBatch(comments=[_comment(i) for i in range(100)])
+    return batch.SerializeToString
+
+
+@case("batch100.decode", "serialization")
+def _batch_decode(scale):
+    data = CommentBatch(comments=[_comment(i) for i in range(100)]).SerializeToString()
+    return lambda: CommentBatch.FromString(data)
+
+
+@case("store_record.encode", "serialization")
+def _store_record_encode(scale):
+    comment = _comment(1)
+    return lambda: StoreRecord(comment=comment).SerializeToString()
+
+
+# Store operations, against stores filled to `scale` comments
+
+@case("store_comment", "store")
+def _store_comment(scale, servicer):
+    import server
+    counter = iter(range(10 ** 9))
+    comment = _comment(0, "bench-writes")
+    return lambda: server.store_comment(f"bench-writes-{next(counter)}", comment)
+
+
+@case("next_id", "store")
+def _next_id(scale, servicer):
+    import bulk_io
+    import server
+    return lambda: bulk_io.next_id(server.comments)
+
+
+@case("rank_comments", "store")
+def _rank_comments(scale, servicer):
+    import server
+    import topn_cache
+    index = server.post_comments["bench"]
+    return lambda: topn_cache.rank_comments(index, server.comments, 25)
+
+
+@case("create_and_drop_post.100", "store")
+def _create_and_drop(scale, servicer):
+    import server
+    comments = [_comment(i, "bench-drop") for i in range(100)]
+
+    def operation():
+        server.store_post("bench-drop", _post("bench-drop"))
+        for comment in comments:
+            server.store_comment(comment.comment_id, comment)
+        server.drop_posts(["bench-drop"])
+    return operation
+
+
+@case("author_recent", "store")
+def _author_recent(scale, servicer):
+    import server
+    return lambda: server.authors.recent("user7", None, 25)
+
+
+def select(pattern=None, group=None):
+    """Names of the registered cases matching a glob pattern and group."""
+    return sorted(name for name in _cases
+                  if (pattern is None or fnmatch.fnmatch(name, pattern))
+                  and (group is None or name.startswith(group + ".")))
+
+
+def run_in_process(names, scale, rounds=5, min_round_time=0.05):
+    """
+        Runs servicer and store cases against the module-level stores of this process.
+
+        The stores are filled with one post of `scale` comments first and emptied afterwards.
+
+        Returns:
+            dict: Case name -> measurement.
+        """
+    import server
+    names = [name for name in names if not name.startswith("serialization.")]
+    if not names:
+        return {}
+    servicer = server.RedditServicer()
+    before = set(server.posts)
+    results = {}
+    try:
+        _fill(scale)
+        for name in names:
+            operation = _cases[name](scale, servicer)
+            results[name] = measure(operation, rounds, min_round_time)
+    finally:
+        server.drop_posts([post_id for post_id in list(server.posts) if post_id not in before])
+    return results
+
+
+def backend_installed(backend):
+    """True if protobuf can be imported with the given backend, without falling back to another."""
+    env = dict(os.environ, PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=backend)
+    probe = subprocess.run([sys.executable, "-c", "import google.protobuf.descriptor\n"
+                            "from google.protobuf.internal import api_implementation\n"
+                            "print(api_implementation.Type())"], env=env, capture_output=True, text=True)
+    return probe.returncode == 0 and probe.stdout.strip() == backend
+
+
+def run_serialization(names, backend, rounds=5, min_round_time=0.05):
+    """
+        Runs serialization cases under one protobuf backend, in a child process.
+
+        Returns:
+            dict: Case name, tagged with the backend -> measurement; empty if the backend
+            isn't installed.
+
+        Raises:
+            RuntimeError: If the child process fails, with its stderr.
+        """
+    names = [name for name in names if name.startswith("serialization.")]
+    if not names or not backend_installed(backend):
+        return {}
+    env = dict(os.environ, PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=backend)
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--rounds", str(rounds),
+               "--min-round-time", str(min_round_time)] + [arg for name in names for arg in ("--case", name)]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Serialization worker for the {backend} backend exited with status "
+                           f"{completed.returncode}:\n{completed.stderr.rstrip()}")
+    worker = json.loads(completed.stdout)
+    if worker["backend"] != backend:
+        # protobuf fell back to another backend; that one is measured under its own name
+        return {}
+    return {name.replace("serialization.", f"serialization[{backend}].", 1): result
+            for name, result in worker["cases"].items()}
+
+
+def run(pattern=None, scale=10_000, backends=BACKENDS, rounds=5, min_round_time=0.05):
+    """
+        Runs the suite.
+
+        Args:
+            pattern (str): Glob of case names to run, e.g. 'servicer.*'; None for all.
+            scale (int): Comments on the benchmarked post.
+            backends: Protobuf backends to run serialization cases under; those not
+                installed are skipped.
+            rounds (int): Timed rounds per case.
+            min_round_time (float): Shortest round, in seconds.
+
+        Returns:
+            dict: {"meta": environment, "cases": case name -> measurement}.
+        """
+    names = select(pattern)
+    cases = run_in_process(names, scale, rounds, min_round_time)
+    measured = []
+    for backend in backends:
+        results = run_serialization(names, backend, rounds, min_round_time)
+        if results:
+            measured.append(backend)
+        cases.update(results)
+    meta = {"python": platform.python_version(), "protobuf": protobuf_version, "machine": platform.machine(),
+            "backends": measured, "scale": scale, "rounds": rounds}
+    return {"meta": meta, "cases": cases}
+
+
+def write_results(results, path):
+    with open(path, "w") as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, case_thresholds=None):
+    """
+        Compares results against a baseline.
+
+        Args:
+            results (dict): Results of run().
+            baseline (dict): Earlier results of run().
+            threshold (float): Allowed growth of the fastest round, as a fraction (0.1 is 10%).
+            case_thresholds (dict): Glob pattern -> threshold for the cases it matches,
+                overriding `threshold`; the first matching pattern wins.
+
+        Returns:
+            list: (case name, baseline ns, current ns, change, threshold, regressed) for every
+            case present in both, the largest slowdown first.
+        """
+    rows = []
+    for name, current in results["cases"].items():
+        previous = baseline["cases"].get(name)
+        if previous is None:
+            continue
+        allowed = next((limit for pattern, limit in (case_thresholds or {}).items() if fnmatch.fnmatch(name, pattern)),
+                       threshold)
+        change = current["min_ns"] / previous["min_ns"] - 1
+        rows.append((name, previous["min_ns"], current["min_ns"], change, allowed, change > allowed))
+    return sorted(rows, key=lambda row: -row[3])
+
+
+def missing_cases(results, baseline, pattern=None, backends=BACKENDS):
+    """
+        Baseline cases this run was asked to measure but didn't, e.g. because a case was
+        removed or its backend is no longer installed.
+
+        Args:
+            results (dict): Results of run().
+            baseline (dict): Earlier results of run().
+            pattern (str): The glob the run was filtered by; None for all.
+            backends: The backends serialization cases were requested under.
+
+        Returns:
+            list: The names of the missing cases, sorted.
+        """
+    missing = []
+    for name in sorted(set(baseline["cases"]) - set(results["cases"])):
+        untagged, backend = name, None
+        if name.startswith("serialization["):
+            backend, _, rest = name[len("serialization["):].partition("].")
+            untagged = "serialization." + rest
+        if (pattern is None or fnmatch.fnmatch(untagged, pattern)) and (backend is None or backend in backends):
+            missing.append(name)
+    return missing
+
+
+def _print_results(results):
+    for name, result in sorted(results["cases"].items()):
+        print(f"{name:<45}{result['min_ns']:>14,.0f} ns/op  (median {result['median_ns']:,.0f}, "
+              f"{result['number']:,} x {result['rounds']})")
+
+
+def _print_comparison(rows, missing):
+    for name, previous, current, change, allowed, regressed in rows:
+        print(f"{name:<45}{previous:>12,.0f} ->{current:>12,.0f} ns/op  {change:+7.1%}"
+              f"{'  REGRESSED (limit ' + format(allowed, '+.0%') + ')' if regressed else ''}")
+    for name in missing:
+        print(f"{name:<45}MISSING from this run")
+
+
+def _threshold_pair(text):
+    pattern, _, limit = text.rpartition("=")
+    if not pattern:
+        raise argparse.ArgumentTypeError("expected PATTERN=FRACTION")
+    return pattern, float(limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the servicer, serialization and stores")
+    parser.add_argument("--filter", metavar="GLOB", help="run only the cases matching this pattern")
+    parser.add_argument("--scale", type=int, default=10_000, help="comments on the benchmarked post")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="protobuf backends for serialization cases")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-round-time", type=float, default=0.05, help="shortest timed round, in seconds")
+    parser.add_argument("--output", metavar="PATH", help="write the results to this JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against results stored in this file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of a case against the baseline, as a fraction")
+    parser.add_argument("--case-threshold", type=_threshold_pair, action="append", default=[],
+                        metavar="GLOB=FRACTION", help="allowed slowdown of the matching cases")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--case", action="append", default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(select(args.filter)))
+        return 0
+    if args.worker:
+        # Serialization cases under the backend this process was started with
+        cases = {name: measure(_cases[name](args.scale), args.rounds, args.min_round_time) for name in args.case}
+        json.dump({"backend": api_implementation.Type(), "cases": cases}, sys.stdout)
+        return 0
+
+    backends = [b for b in args.backends.split(",") if b]
+    try:
+        results = run(args.filter, args.scale, backends, args.rounds, args.min_round_time)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.output:
+        write_results(results, args.output)
+    if not args.baseline:
+        _print_results(results)
+        return 0
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    rows = compare(results, baseline, args.threshold, dict(args.case_threshold))
+    missing = missing_cases(results, baseline, args.filter, backends)
+    _print_comparison(rows, missing)
+    regressions = [row for row in rows if row[5]]
+    print(f"{len(regressions)} of {len(rows)} cases regressed, {len(missing)} missing")
+    return 1 if regressions or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,379 @@
+# Author - Akshita Patil
+
+import sys
+import threading
+
+from data_model_pb2 import LOCKED, HIDDEN, ModerationSummary
+
+"""
+    Moderation state of posts, comments and subreddits, kept as indexes.
+
+    Locked and hidden posts are two sets of post IDs, so the lock check on a write and
+    the visibility check on a read are a set lookup each. Hidden comments are a bitmap
+    per post over positions in the post's comment index (post_comments): a listing skips
+    them by position without looking the comments up, and posts with no hidden comments
+    have no bitmap at all. Hidden subreddits are a set of subreddit IDs, checked against
+    the subreddit of the post being read.
+
+    The indexes follow the stored entities (Post.state, Post.subreddit.hidden and
+    Comment.hidden) as they are written. A moderation change flips one entry in place;
+    nothing is rebuilt.
+    """
+
+# Per-post flags in snapshot entries
+_HIDDEN_FLAG = 1
+_LOCKED_FLAG = 2
+
+# Byte value -> its 8 bits as one byte per position, 1 where the position is visible
+_VISIBLE_MASKS = [bytes(1 - (value >> bit & 1) for bit in range(8)) for value in range(256)]
+# Estimated bytes of a post's position map, and of each comment in it (dict slot and int)
+_POSITIONS_OVERHEAD = 64
+_POSITION_BYTES = 64
+
+
+class HiddenComments:
+    """
+        Bitmap of the hidden positions in one post's comment index.
+
+        Bit i of the bitmap is set when the i-th comment of the post is hidden; the
+        bitmap only grows as far as the last hidden position.
+        """
+
+    __slots__ = ("bits", "count")
+
+    def __init__(self, bits=b""):
+        self.bits = bytearray(bits)
+        self.count = sum(bin(byte).count("1") for byte in self.bits)
+
+    def __contains__(self, position):
+        byte = position >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] >> (position & 7) & 1)
+
+    def set(self, position, hidden):
+        """Sets or clears one position; returns True if it changed."""
+        byte = position >> 3
+        if byte >= len(self.bits):
+            if not hidden:
+                return False
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        mask = 1 << (position & 7)
+        if bool(self.bits[byte] & mask) == hidden:
+            return False
+        self.bits[byte] ^= mask
+        self.count += 1 if hidden else -1
+        return True
+
+    def visible_mask(self):
+        """
+            Returns one byte per position up to the last hidden one: 1 if the comment there
+            is visible, 0 if hidden. Suited to itertools.compress, which skips the hidden
+            positions without a Python-level check per comment.
+            """
+        return b"".join(_VISIBLE_MASKS[value] for value in self.bits)
+
+
+class ModerationIndex:
+    """Hidden and locked posts, hidden comments per post, and hidden subreddits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.hidden_posts = set()
+            self.locked_posts = set()
+            self.hidden_subreddits = set()
+            self.hidden_comments = 0
+            self._comments = {}
+            self._bitmap_bytes = 0
+
+    def post_stored(self, post_id, post):
+        """
+            Indexes the state of a post after it is stored or its state changes.
+
+            A post is hidden when its state is HIDDEN or its subreddit is marked hidden on
+            the post itself.
+
+            Args:
+                post_id (str): ID of the post.
+                post: The stored Post.
+            """
+        with self._lock:
+            _toggle(self.hidden_posts, post_id, post.state == HIDDEN or post.subreddit.hidden)
+            _toggle(self.locked_posts, post_id, post.state == LOCKED)
+
+    def post_removed(self, post_id):
+        """Forgets a removed post and the hidden comments under it."""
+        with self._lock:
+            self.hidden_posts.discard(post_id)
+            self.locked_posts.discard(post_id)
+            bitmap = self._comments.pop(post_id, None)
+            if bitmap is not None:
+                self.hidden_comments -= bitmap.count
+                self._bitmap_bytes -= len(bitmap.bits)
+
+    def comment_hidden(self, post_id, position, hidden):
+        """
+            Hides or shows the comment at a position of a post's comment index.
+
+            Args:
+                post_id (str): The post of the comment.
+                position (int): Index of the comment in the post's comment list.
+                hidden (bool): Whether the comment is hidden.
+
+            Returns:
+                bool: True if the comment's visibility changed.
+            """
+        with self._lock:
+            bitmap = self._comments.get(post_id)
+            if bitmap is None:
+                if not hidden:
+                    return False
+                bitmap = self._comments[post_id] = HiddenComments()
+            size = len(bitmap.bits)
+            changed = bitmap.set(position, hidden)
+            if changed:
+                self.hidden_comments += 1 if hidden else -1
+            self._bitmap_bytes += len(bitmap.bits) - size
+            if not bitmap.count:
+                del self._comments[post_id]
+                self._bitmap_bytes -= len(bitmap.bits)
+            return changed
+
+    def subreddit_hidden(self, subreddit_id, hidden):
+        with self._lock:
+            _toggle(self.hidden_subreddits, subreddit_id, hidden)
+
+    def is_locked(self, post_id):
+        return post_id in self.locked_posts
+
+    def is_visible(self, post_id, post):
+        """True if a stored post may be shown to readers."""
+        if post_id in self.hidden_posts:
+            return False
+        return not self.hidden_subreddits or post.subreddit.subreddit_id not in self.hidden_subreddits
+
+    def hidden_in(self, post_id):
+        """Returns the HiddenComments of a post, or None if none of its comments are hidden."""
+        return self._comments.get(post_id)
+
+    def summary(self):
+        return ModerationSummary(hidden_posts=len(self.hidden_posts), locked_posts=len(self.locked_posts),
+                                 hidden_comments=self.hidden_comments,
+                                 hidden_subreddits=len(self.hidden_subreddits))
+
+    def size(self):
+        """Returns (entries, estimated bytes), for memory accounting."""
+        with self._lock:
+            entries = len(self.hidden_posts) + len(self.locked_posts) + len(self.hidden_subreddits) + len(self._comments)
+            return entries, (sys.getsizeof(self.hidden_posts) + sys.getsizeof(self.locked_posts)
+                             + sys.getsizeof(self.hidden_subreddits) + sys.getsizeof(self._comments)
+                             + len(self._comments) * sys.getsizeof(HiddenComments()) + self._bitmap_bytes)
+
+    def rebuild(self, posts, comments, post_comments):
+        """
+            Indexes stores that were filled without going through the index, by walking
+            them. Only used offline, e.g. when building a snapshot from an export.
+            """
+        self.clear()
+        for post_id, post in posts.items():
+            self.post_stored(post_id, post)
+        for post_id, comment_ids in post_comments.items():
+            for position, comment_id in enumerate(comment_ids):
+                comment = comments.get(comment_id)
+                if comment is not None and comment.hidden:
+                    self.comment_hidden(post_id, position, True)
+
+    def entries(self):
+        """
+            Serializes the index as (key, bytes) pairs, for snapshots.
+
+            Returns:
+                dict: One entry per moderated post, post with hidden comments and hidden
+                subreddit.
+            """
+        with self._lock:
+            result = {}
+            for post_id in self.hidden_posts | self.locked_posts:
+                flags = (_HIDDEN_FLAG if post_id in self.hidden_posts else 0) | \
+                        (_LOCKED_FLAG if post_id in self.locked_posts else 0)
+                result["post:" + post_id] = bytes((flags,))
+            for post_id, bitmap in self._comments.items():
+                result["comments:" + post_id] = bytes(bitmap.bits)
+            for subreddit_id in self.hidden_subreddits:
+                result["subreddit:" + subreddit_id] = b""
+            return result
+
+    def restore(self, entries):
+        """Replaces the index with one serialized by entries()."""
+        self.clear()
+        with self._lock:
+            for key, value in entries:
+                kind, _, entity_id = key.partition(":")
+                if kind == "post":
+                    _toggle(self.hidden_posts, entity_id, bool(value[0] & _HIDDEN_FLAG))
+                    _toggle(self.locked_posts, entity_id, bool(value[0] & _LOCKED_FLAG))
+                elif kind == "comments":
+                    bitmap = HiddenComments(value)
+                    if bitmap.count:
+                        self._comments[entity_id] = bitmap
+                        self.hidden_comments += bitmap.count
+                        self._bitmap_bytes += len(bitmap.bits)
+                elif kind == "subreddit":
+                    self.hidden_subreddits.add(entity_id)
+
+
+class CommentPositions:
+    """
+        Position of each comment in its post's comment index, the position hidden comments
+        and top-comment views are keyed by.
+
+        A post's map is built the first time one of its comments is looked up. Comment
+        indexes only grow at the end, so a comment missing from the map was appended
+        since, and the map is extended from where it stopped instead of rebuilt.
+        """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._posts = {}
+        self._entries = 0
+
+    def position(self, post_id, comment_id, post_comments):
+        """
+            Returns the index of a comment in its post's comment list.
+
+            Args:
+                post_id (str): The post of the comment.
+                comment_id (str): The comment.
+                post_comments (dict): The per-post comment index; only read when the post's
+                    map is missing the comment.
+
+            Raises:
+                ValueError: If the comment is not in the post's comment list.
+            """
+        with self._lock:
+            positions = self._posts.get(post_id)
+            if positions is not None and comment_id in positions:
+                return positions[comment_id]
+        comment_ids = post_comments[post_id]
+        with self._lock:
+            positions = self._posts.setdefault(post_id, {})
+            size = len(positions)
+            for position in range(size, len(comment_ids)):
+                positions.setdefault(comment_ids[position], position)
+            self._entries += len(positions) - size
+            if comment_id not in positions:
+                raise ValueError(f"Comment {comment_id} is not indexed under post {post_id}")
+            return positions[comment_id]
+
+    def discard(self, post_id):
+        """Forgets the positions of a post whose comment index was removed or spilled."""
+        with self._lock:
+            positions = self._posts.pop(post_id, None)
+            if positions is not None:
+                self._entries -= len(positions)
+
+    def clear(self):
+        with self._lock:
+            self._posts = {}
+            self._entries = 0
+
+    def size(self):
+        """Returns (entries, estimated bytes), for memory accounting."""
+        with self._lock:
+            return self._entries, (sys.getsizeof(self._posts) + len(self._posts) * _POSITIONS_OVERHEAD
+                                   + self._entries * _POSITION_BYTES)
+
+
+def _toggle(members, key, present):
+    if present:
+        members.add(key)
+    else:
+        members.discard(key)
+
+
+def benchmark(comments_per_post=10_000, hidden_fraction=0.1, n=25, repeats=200):
+    """
+        Compares ways of ranking a post's top comments while skipping hidden ones.
+
+        Ranks the same post without any filtering (as before moderation was enforced),
+        checking Comment.hidden row by row, and skipping hidden positions through the
+        post's bitmap: once with the comments in memory, and once right after a warm start
+        from a snapshot, where every comment looked up is decoded from the file.
+
+        Returns:
+            dict: (variant, store) -> seconds per listing.
+        """
+    import heapq
+    import os
+    import random
+    import tempfile
+    import time
+    import snapshot
+    from data_model_pb2 import Comment
+    import topn_cache
+
+    rng = random.Random(1)
+    comments = {}
+    comment_ids = []
+    index = ModerationIndex()
+    for position in range(comments_per_post):
+        comment_id = str(position)
+        hidden = rng.random() < hidden_fraction
+        comments[comment_id] = Comment(comment_id=comment_id, post_id="p", score=rng.randint(0, 1000), hidden=hidden)
+        comment_ids.append(comment_id)
+        if hidden:
+            index.comment_hidden("p", position, True)
+
+    def row_by_row(comment_ids, comments, n):
+        candidates = []
+        for position, comment_id in enumerate(comment_ids):
+            comment = comments.get(comment_id)
+            if comment is not None and not comment.hidden:
+                candidates.append(((-comment.score, position), comment_id, comment))
+        return heapq.nsmallest(n, candidates, key=lambda candidate: candidate[0])
+
+    variants = {
+        "unfiltered": lambda: topn_cache.rank_comments(comment_ids, comments, n),
+        "row by row": lambda: row_by_row(comment_ids, comments, n),
+        "bitmap": lambda: topn_cache.rank_comments(comment_ids, comments, n, index.hidden_in("p")),
+    }
+    assert [c for _, c, _ in variants["row by row"]()] == [c for _, c, _ in variants["bitmap"]()]
+    results = {}
+    for name, rank in variants.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            rank()
+        results[name, "memory"] = (time.perf_counter() - start) / repeats
+        print(f"{name:<12}{results[name, 'memory'] * 1000:8.2f} ms per listing of {comments_per_post:,} comments "
+              f"({hidden_fraction:.0%} hidden), in memory")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "moderation.bin")
+        snapshot.write_snapshot(path, {}, comments, {"p": comment_ids}, index)
+        for name, rank in (("row by row", row_by_row), ("bitmap", None)):
+            elapsed = 0.0
+            for _ in range(max(1, repeats // 20)):
+                _, lazy_comments, _ = snapshot.load_snapshot(path)
+                start = time.perf_counter()
+                if rank is None:
+                    topn_cache.rank_comments(comment_ids, lazy_comments, n, index.hidden_in("p"))
+                else:
+                    rank(comment_ids, lazy_comments, n)
+                elapsed += time.perf_counter() - start
+            results[name, "snapshot"] = elapsed / max(1, repeats // 20)
+            print(f"{name:<12}{results[name, 'snapshot'] * 1000:8.2f} ms per first listing after a warm start, "
+                  f"{lazy_comments.resident:,} comments decoded")
+
+    index.locked_posts.update(str(i) for i in range(100_000))
+    start = time.perf_counter()
+    for _ in range(1_000_000):
+        index.is_locked("12345")
+    print(f"lock check  {(time.perf_counter() - start) * 1000:8.2f} ns per call")
+    print(f"bitmap      {len(index.hidden_in('p').bits):,} bytes for the post")
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,272 @@
+# Author - Akshita Patil
+
+import collections
+import threading
+import time
+
+import grpc
+
+from data_model_pb2 import Mutation, ReplicationRequest, ReplicationStatus
+from data_model_pb2_grpc import RedditServiceStub
+
+"""
+    Leader/follower replication of the post and comment stores.
+
+    The leader appends every CreatePost, CreateComment, VotePost and VoteComment to a
+    ReplicationLog under a sequence number. Followers open a Replicate stream to the
+    leader, apply the mutations in order and serve the read RPCs.
+
+    A follower that starts empty (or has fallen out of the retained log) gets a full
+    snapshot first: a reset marker, one create mutation per stored entity, then a
+    snapshot_end marker carrying the sequence number the snapshot was taken at.
+
+    An idle stream sends heartbeats carrying the last sequence number sent on it. A
+    follower only advances its applied sequence on mutations and on snapshot_end markers.
+    """
+
+LEADER = "leader"
+FOLLOWER = "follower"
+
+# Metadata keys used for read-your-writes
+SEQ_METADATA_KEY = "x-replication-seq"
+MIN_SEQ_METADATA_KEY = "x-min-seq"
+
+# How long an idle Replicate stream waits before sending a heartbeat
+HEARTBEAT_INTERVAL = 1.0
+
+
+class ReplicationLog:
+    """
+        Bounded, in-order log of the mutations applied on the leader.
+
+        Appends must happen in the same order as the mutations are applied to the stores;
+        the servicer guarantees this by appending under its write lock.
+        """
+
+    def __init__(self, capacity=1_000_000):
+        self._entries = collections.deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._floor = 1
+        self.last_seq = 0
+        # Serialized size of the retained mutations, kept up to date for memory reporting
+        self.retained_bytes = 0
+
+    @property
+    def first_seq(self):
+        """The oldest sequence number that can still be streamed."""
+        with self._cond:
+            return self._first_seq()
+
+    def _first_seq(self):
+        return self._entries[0].seq if self._entries else self._floor
+
+    def append(self, mutation):
+        """
+            Stamps the mutation with the next sequence number and the leader time.
+
+            Args:
+                mutation: A Mutation message with its op set.
+
+            Returns:
+                int: The sequence number assigned to the mutation.
+            """
+        with self._cond:
+            self.last_seq += 1
+            mutation.seq = self.last_seq
+            mutation.leader_time = time.time()
+            if len(self._entries) == self._entries.maxlen:
+                self.retained_bytes -= self._entries[0].ByteSize()
+            self._entries.append(mutation)
+            self.retained_bytes += mutation.ByteSize()
+            self._cond.notify_all()
+            return self.last_seq
+
+    def invalidate(self):
+        """
+            Drops the retained mutations so every follower resynchronizes from a snapshot.
+
+            Used after changes that bypass the log, such as a bulk import.
+            """
+        with self._cond:
+            self._entries.clear()
+            self.retained_bytes = 0
+            self.last_seq += 1
+            self._floor = self.last_seq + 1
+            self._cond.notify_all()
+
+    def read(self, from_seq, timeout):
+        """
+            Returns the retained mutations with seq >= from_seq, waiting for new ones.
+
+            Args:
+                from_seq (int): First sequence number wanted.
+                timeout (float): Seconds to wait when nothing new is available.
+
+            Returns:
+                list: The mutations in order; empty if none arrived before the timeout.
+
+            Raises:
+                LookupError: If from_seq has already been dropped from the log.
+            """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.last_seq >= from_seq, timeout):
+                return []
+            first = self._first_seq()
+            if from_seq < first:
+                raise LookupError(f"Sequence {from_seq} is no longer retained (oldest is {first})")
+            start = from_seq - first
+            return [self._entries[i] for i in range(start, len(self._entries))]
+
+    def size(self):
+        with self._cond:
+            return len(self._entries)
+
+
+def stream_mutations(log, from_seq, snapshot, context):
+    """
+        Generates the Replicate response stream for one follower.
+
+        Args:
+            log (ReplicationLog): The leader's log.
+            from_seq (int): First sequence number the follower wants; 0 asks for a snapshot.
+            snapshot: Callable returning (seq, mutations) for a consistent full snapshot.
+            context: The gRPC context of the Replicate call.
+
+        Yields:
+            Mutation: Snapshot entries, then live mutations and idle heartbeats.
+        """
+    if from_seq <= 0 or from_seq < log.first_seq:
+        seq, entries = snapshot()
+        yield Mutation(reset=True)
+        for entry in entries:
+            yield entry
+        yield Mutation(seq=seq, leader_time=time.time(), snapshot_end=True)
+        from_seq = seq + 1
+
+    while context.is_active():
+        try:
+            batch = log.read(from_seq, HEARTBEAT_INTERVAL)
+        except LookupError as e:
+            context.abort(grpc.StatusCode.OUT_OF_RANGE, str(e))
+            return
+        if not batch:
+            # Heartbeat so the follower knows the stream is alive. It carries the last seq sent
+            # here, not log.last_seq: a mutation appended since the read timed out isn't sent yet.
+            yield Mutation(seq=from_seq - 1, leader_time=time.time())
+            continue
+        for mutation in batch:
+            yield mutation
+        from_seq = batch[-1].seq + 1
+
+
+class Follower:
+    """
+        Follows a leader and applies its mutation stream to the local stores.
+
+        Args:
+            leader_address (str): host:port of the leader.
+            apply (callable): Applies one Mutation to the local stores.
+        """
+
+    def __init__(self, leader_address, apply):
+        self.leader_address = leader_address
+        self._apply = apply
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._call = None
+        self.applied_seq = 0
+        self.leader_seq = 0
+        self.synced = False
+        self.last_delay = 0.0
+        self.last_contact = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="replication-follower", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._call is not None:
+            self._call.cancel()
+
+    def wait_for(self, seq, timeout):
+        """
+            Blocks until the follower has applied the given sequence number.
+
+            Args:
+                seq (int): Sequence number to wait for.
+                timeout (float): Maximum seconds to wait.
+
+            Returns:
+                bool: True if the follower has caught up to seq.
+            """
+        with self._cond:
+            return self._cond.wait_for(lambda: self.applied_seq >= seq, timeout)
+
+    def status(self):
+        """Returns the follower's ReplicationStatus."""
+        with self._cond:
+            return ReplicationStatus(
+                role=FOLLOWER,
+                applied_seq=self.applied_seq,
+                leader_seq=self.leader_seq,
+                lag_mutations=max(self.leader_seq - self.applied_seq, 0),
+                lag_seconds=self.last_delay,
+                seconds_since_contact=time.time() - self.last_contact if self.last_contact else 0.0
+            )
+
+    def _run(self):
+        backoff = 0.1
+        channel = grpc.insecure_channel(self.leader_address)
+        stub = RedditServiceStub(channel)
+        while not self._stopped.is_set():
+            from_seq = self.applied_seq + 1 if self.synced else 0
+            try:
+                self._call = stub.Replicate(ReplicationRequest(from_seq=from_seq))
+                for mutation in self._call:
+                    self._handle(mutation)
+                    backoff = 0.1
+            except grpc.RpcError as e:
+                if self._stopped.is_set():
+                    break
+                if e.code() == grpc.StatusCode.OUT_OF_RANGE:
+                    # Fell out of the leader's log; start over from a snapshot
+                    self.synced = False
+                else:
+                    print(f"Replication stream from {self.leader_address} failed: {e.code()}")
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, 5.0)
+        channel.close()
+
+    def _handle(self, mutation):
+        now = time.time()
+        if mutation.reset:
+            with self._cond:
+                self.applied_seq = 0
+                self.synced = False
+        has_op = mutation.WhichOneof("op") is not None
+        if mutation.reset or has_op:
+            self._apply(mutation)
+        with self._cond:
+            self.last_contact = now
+            self.leader_seq = max(self.leader_seq, mutation.seq)
+            if (has_op or mutation.snapshot_end) and mutation.seq > self.applied_seq:
+                # A live mutation, or the marker that ends a snapshot
+                self.applied_seq = mutation.seq
+                self.synced = True
+                self.last_delay = max(now - mutation.leader_time, 0.0)
+            elif self.applied_seq >= self.leader_seq:
+                self.last_delay = 0.0
+            self._cond.notify_all()
+
+
+def min_seq_from_metadata(context):
+    """Returns the x-min-seq read-your-writes requirement of a call, or 0; aborts the call if it is malformed."""
+    for key, value in context.invocation_metadata():
+        if key == MIN_SEQ_METADATA_KEY:
+            try:
+                return int(value)
+            except ValueError:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Invalid {MIN_SEQ_METADATA_KEY}: {value!r}")
+    return 0
@@ -1,14 +1,68 @@
 # Author - Akshita Patil
 
+import argparse
+import tempfile
+import threading
+import time
+
 import grpc
 from concurrent import futures
-from data_model_pb2 import User, Post, Comment, Subreddit, VoteRequest, VoteAction, UpdateResponse
+from data_model_pb2 import User, Post, Comment, Subreddit, VoteRequest, VoteAction, UpdateResponse, Mutation
+from data_model_pb2 import ReplicationStatus, BulkSummary, ModerationRequest, ActivityItem, TrendingPost, HandoffStatus
 from data_model_pb2_grpc import RedditServiceServicer, add_RedditServiceServicer_to_server
+import activity
+import batching
+import bulk_io
+import handoff
+import idempotency
+import introspection
+import moderation
+import replication
+import snapshot
+import tiering
+import topn_cache
+import traffic_capture
+import tracing
+import trending
+
+# Page size of GetUserActivity when the request doesn't set one
+DEFAULT_ACTIVITY_LIMIT = 50
+# Posts returned by GetTrendingPosts when the request doesn't set a limit
+DEFAULT_TRENDING_LIMIT = 25
 
 # Dummy storage in memory
 posts = {}
 comments = {}
 
+# Index of comment IDs under each post, post_id -> [comment_id, ...]
+post_comments = {}
+
+# Running counts and memory estimates of the stores above, kept up to date on every write
+accountant = introspection.StoreAccountant()
+
+# Materialized top-comment lists of recently read posts, kept up to date on every write
+top_views = topn_cache.TopCommentsViews()
+accountant.register("top_comment_views", top_views.size)
+
+# Locked and hidden posts, hidden comments and hidden subreddits, kept up to date on every write
+visibility = moderation.ModerationIndex()
+accountant.register("moderation", visibility.size)
+
+# Position of each comment in its post's comment index, built per post on first lookup
+positions = moderation.CommentPositions()
+accountant.register("comment_positions", positions.size)
+
+# Posts and comments of each author in time order, kept up to date on every write
+authors = activity.AuthorIndex()
+accountant.register("author_index", authors.size)
+
+# Votes on each post over recent time buckets, and the posts trending in each window
+trends = trending.TrendingIndex()
+accountant.register("trending", trends.size)
+
+# Hot/cold tiering of the stores when a memory budget is set; None keeps every post in memory
+tier = None
+
 """
     Implementation of the Reddit gRPC service.
 
@@ -19,12 +73,52 @@ comments = {}
     """
 
 class RedditServicer(RedditServiceServicer):
+    def __init__(self):
+        # Writes are applied and appended to the replication log under one lock so the
+        # log order matches the order the stores changed in
+        self._write_lock = threading.Lock()
+        self.replication_log = replication.ReplicationLog()
+        self.follower = None
+        # Entities created under each client idempotency key, so retried creates aren't duplicated
+        self.post_keys = idempotency.IdempotencyCache()
+        self.comment_keys = idempotency.IdempotencyCache()
+        self.batcher = batching.AdaptiveBatcher()
+        # Ranges of posts handed over to other partitions, whose writes are refused
+        self.handoffs = handoff.HandoffFences()
+        log = self.replication_log
+        accountant.register("replication_log",
+                            lambda: (log.size(), log.retained_bytes + log.size() * introspection.MESSAGE_OVERHEAD))
+        accountant.register("idempotency_keys", self._idempotency_size)
+
+    def sweep_tier(self):
+        """
+            Spills posts that went cold or over the memory budget since the last write.
+
+            Reads fault posts in without taking the write lock, so the server runs this
+            periodically to bring residency back under the budget when there are no writes.
+            """
+        if tier is not None:
+            with self._write_lock:
+                tier.maintain()
+
+    def follow(self, leader_address):
+        """
+            Turns this servicer into a read-only follower of a leader.
+
+            Args:
+                leader_address (str): host:port of the leader to replicate from.
+            """
+        self.follower = replication.Follower(leader_address, self.apply_mutation)
+        self.follower.start()
+
     def CreatePost(self, request, context):
         """
            Creates a new post.
 
-           This method generates a new post ID, stores the post in the 'posts' dictionary,
-           and returns the created post.
+           This method generates a new post ID (unless the request carries one, as posts
+           routed to a partition do), stores the post in the 'posts' dictionary, and returns
+           the created post. A retry carrying the idempotency key of an earlier call returns
+           the post that call created instead of storing a duplicate.
 
            Args:
                request: An instance of the Post message containing post details.
@@ -36,8 +130,19 @@ class RedditServicer(RedditServiceServicer):
            Note:
                This implementation is a dummy version and stores posts in memory.
            """
-        post_id = str(len(posts) + 1)
-        posts[post_id] = request
+        self._check_writable(context)
+        key = idempotency.key_from_metadata(context)
+        with tracing.span("store.write"), self._write_lock:
+            post_id = self.post_keys.get(key) if key else None
+            if post_id is not None and post_id in posts:
+                self._replicate_repeat(context)
+                return posts[post_id]
+            post_id = request.post_id or bulk_io.next_id(posts)
+            self._check_owned(context, post_id)
+            store_post(post_id, request)
+            self._replicate(context, Mutation(entity_id=post_id, create_post=request))
+            if key:
+                self.post_keys.put(key, post_id)
         return posts[post_id]
 
     def VotePost(self, request, context):
@@ -46,7 +151,7 @@ class RedditServicer(RedditServiceServicer):
 
             This method retrieves the post with the specified post ID from the 'posts' dictionary,
             increments or decrements the post score based on the vote action, and returns the
-            updated post.
+            updated post. Votes on a locked post are rejected with FAILED_PRECONDITION.
 
             Args:
                 request: An instance of the VoteRequest message containing vote details.
@@ -58,15 +163,18 @@ class RedditServicer(RedditServiceServicer):
             Note:
                 This implementation is a dummy version and stores posts in memory.
             """
+        self._check_writable(context)
         post_id = request.post_id  # Convert post_id to int
-        post = posts.get(post_id)
+        with tracing.span("store.update"), self._write_lock:
+            self._check_owned(context, post_id)
+            self._check_unlocked(context, post_id)
+            post = posts.get(post_id)
 
-        if post:
-            if request.action == VoteAction.UPVOTE:
-                post.score += 1
-            elif request.action == VoteAction.DOWNVOTE:
-                post.score -= 1
-            return post
+            if post:
+                apply_vote(post, request.action)
+                post_voted(post_id, request.action)
+                self._replicate(context, Mutation(entity_id=post_id, vote_post=request))
+                return post
 
     # Implement other service methods similarly
     def GetPostContent(self, request, context):
@@ -74,7 +182,8 @@ class RedditServicer(RedditServiceServicer):
             Retrieves the content of a post.
 
             This method retrieves the post with the specified post ID from the 'posts' dictionary
-            and returns the post content.
+            and returns the post content. Hidden posts, and posts in hidden subreddits, are
+            reported as not found.
 
             Args:
                 request: An instance of the Post message containing the post ID.
@@ -86,16 +195,22 @@ class RedditServicer(RedditServiceServicer):
             Note:
                 This implementation is a dummy version and retrieves posts from memory.
             """
+        self._await_replication(context)
         post_id = request.post_id  # Convert post_id to int
-        post = posts.get(post_id)
+        with tracing.span("store.lookup"):
+            post = posts.get(post_id)
+        if post is not None and not visibility.is_visible(post_id, post):
+            context.abort(grpc.StatusCode.NOT_FOUND, "Post not found")
         return post
 
     def CreateComment(self, request, context):
         """
            Creates a new comment.
 
-           This method generates a new comment ID, stores the comment in the 'comments' dictionary,
-           and returns the created comment.
+           This method generates a new comment ID (unless the request carries one), stores the
+           comment in the 'comments' dictionary, and returns the created comment. Retries with
+           an idempotency key are handled as in CreatePost. Comments on a locked post are
+           rejected with FAILED_PRECONDITION.
 
            Args:
                request: An instance of the Comment message containing comment details.
@@ -108,8 +223,20 @@ class RedditServicer(RedditServiceServicer):
                This implementation is a dummy version and stores comments in memory.
            """
         # Dummy implementation - just store in memory
-        comment_id = str(len(comments) + 1)
-        comments[comment_id] = request
+        self._check_writable(context)
+        key = idempotency.key_from_metadata(context)
+        with tracing.span("store.write"), self._write_lock:
+            comment_id = self.comment_keys.get(key) if key else None
+            if comment_id is not None and comment_id in comments:
+                self._replicate_repeat(context)
+                return comments[comment_id]
+            self._check_owned(context, request.post_id)
+            self._check_unlocked(context, request.post_id)
+            comment_id = request.comment_id or bulk_io.next_id(comments)
+            store_comment(comment_id, request)
+            self._replicate(context, Mutation(entity_id=comment_id, create_comment=request))
+            if key:
+                self.comment_keys.put(key, comment_id)
         return comments[comment_id]
 
     def VoteComment(self, request, context):
@@ -129,15 +256,17 @@ class RedditServicer(RedditServiceServicer):
             Note:
                 This implementation is a dummy version and updates comment scores in memory.
             """
+        self._check_writable(context)
         comment_id = request.comment_id  # Convert post_id to int
-        comment = comments.get(comment_id)
+        with tracing.span("store.update"), self._write_lock:
+            comment = comments.get(comment_id)
 
-        if comment:
-            if request.action == VoteAction.UPVOTE:
-                comment.score += 1
-            elif request.action == VoteAction.DOWNVOTE:
-                comment.score -= 1
-            return comment
+            if comment:
+                self._check_owned(context, comment.post_id)
+                apply_vote(comment, request.action)
+                comment_voted(comment_id, comment)
+                self._replicate(context, Mutation(entity_id=comment_id, vote_comment=request))
+                return comment
 
     def GetTopComments(self, request, context):
         """
@@ -145,6 +274,7 @@ class RedditServicer(RedditServiceServicer):
 
             This method retrieves the post with the specified post ID from the 'posts' dictionary,
             sorts the comments by score in descending order, and returns the top N comments.
+            Hidden comments are skipped, and hidden posts are reported as not found.
 
             Args:
                 request: An instance of the TopCommentsRequest message containing post ID and the number of top comments.
@@ -156,45 +286,69 @@ class RedditServicer(RedditServiceServicer):
             Note:
                 This implementation is a dummy version and retrieves top comments from memory.
             """
-        post_id = request.post_id  # Convert post_id to int
-        post = posts.get(post_id)
-
-        if post:
-            # Sort comments by score in descending order
-            sorted_comments = sorted(comments.values(), key=lambda c: c.score, reverse=True)
+        self._await_replication(context)
+        top_comments = self._top_comments(request)
 
-            # Get the top N comments
-            N = request.N
-            top_comments = sorted_comments[:N]
-
-            # Add the replies_exist field to the comments and return the result
-            result_comments = []
+        if top_comments is not None:
+            # Send responses to the client
             for comment in top_comments:
-                comment_with_replies = Comment(
-                    comment_id="1",
-                    text=comment.text,
-                    author=comment.author,
-                    score=comment.score,
-                    hidden=comment.hidden,
-                    publication_date=comment.publication_date,
-                    replies_exist=False
-                )
-                result_comments.append(comment_with_replies)
-
-                # Send responses to the client
-            for comment in result_comments:
                 yield comment
         else:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details("Post not found")
             return Comment()
 
+    def GetTopCommentsBatched(self, request, context):
+        """
+            Retrieves the top comments under a post, several comments per stream message.
+
+            Returns the same comments as GetTopComments, packed into CommentBatch messages
+            whose size the server picks (see batching.AdaptiveBatcher).
+
+            Args:
+                request: An instance of the TopCommentsRequest message containing post ID and the number of top comments.
+                context: The gRPC context.
+
+            Yields:
+                CommentBatch: The top comments under the post, in order.
+            """
+        self._await_replication(context)
+        top_comments = self._top_comments(request)
+
+        if top_comments is not None:
+            if top_comments and isinstance(top_comments[0], bytes):
+                for chunk in self.batcher.pack_encoded(top_comments):
+                    yield topn_cache.encode_batch(chunk)
+            else:
+                yield from self.batcher.pack(top_comments)
+        else:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Post not found")
+
+    def _top_comments(self, request):
+        # The ranked comments of GetTopComments, or None if the post doesn't exist. Hot posts
+        # are served from their materialized view, as pre-encoded bytes when the server allows.
+        post_id = request.post_id  # Convert post_id to int
+        with tracing.span("store.lookup"):
+            post = posts.get(post_id)
+
+        if post and visibility.is_visible(post_id, post):
+            with tracing.span("ranking") as ranking:
+                view, top_comments = top_views.ranked(post_id, request.N, post_comments.get(post_id, []), comments,
+                                                      visibility.hidden_in(post_id))
+                ranking.set_attribute("view", view is not None)
+
+            with tracing.span("message.build"):
+                return top_views.responses(view, top_comments, topn_cache.raw_responses_allowed())
+        return None
+
     def ExpandCommentBranch(self, request, context):
         """
             Expands a comment branch to show child comments.
 
             This method retrieves the comment with the specified comment ID from the 'comments' dictionary,
             adds some dummy child comments for testing purposes, and sends the expanded comment branch to the client.
+            Comments under hidden posts, and posts in hidden subreddits, are reported as not found.
 
             Args:
                 request: An instance of the TopCommentsRequest message containing comment ID and the number of child comments.
@@ -206,12 +360,16 @@ class RedditServicer(RedditServiceServicer):
             Note:
                 This implementation is a dummy version and adds child comments to the expanded branch in memory.
             """
+        self._await_replication(context)
         comment_id = "1"  # Convert comment_id to int
-        comment = comments.get(comment_id)
+        with tracing.span("store.lookup"):
+            comment = comments.get(comment_id)
+        if comment is not None:
+            parent = posts.get(comment.post_id)
+            if parent is not None and not visibility.is_visible(comment.post_id, parent):
+                context.abort(grpc.StatusCode.NOT_FOUND, "Post not found")
 
-        print(comment)
-
-        if comment:
+        if comment and not comment.hidden:
             # Add some dummy child comments for testing when expanding a comment branch
             child_comment_id_1 = len(comments) + 1
             child_comment_1 = Comment(
@@ -246,6 +404,21 @@ class RedditServicer(RedditServiceServicer):
             context.set_details("Comment not found")
             return Comment()
 
+    def ExpandCommentBranchBatched(self, request, context):
+        """
+            Expands a comment branch, several comments per stream message.
+
+            Returns the same comments as ExpandCommentBranch, packed into CommentBatch messages.
+
+            Args:
+                request: An instance of the Comment message containing the comment ID.
+                context: The gRPC context.
+
+            Yields:
+                CommentBatch: The expanded comment branch, in order.
+            """
+        return self.batcher.batches(self.ExpandCommentBranch(request, context))
+
     # Extra Credit
     def MonitorUpdates(self, request, context):
         """
@@ -284,7 +457,7 @@ class RedditServicer(RedditServiceServicer):
     
             # Process additional comment IDs from the client stream
             try:
-                async for comment_id in context.stream:
+                for comment_id in context.stream:
                     comment = comments.get(comment_id)
                     if comment:
                         self.current_scores[comment_id] = comment.score
@@ -302,22 +475,702 @@ class RedditServicer(RedditServiceServicer):
     def create_update_response(self, entity_id, score):
         return UpdateResponse(entity_id=entity_id, score=score)
 
+    def ExportStore(self, request, context):
+        """
+            Streams the contents of the post and comment stores.
+
+            Posts are streamed first, then comments, so an import of the stream sees every
+            post before the comments that reference it.
+
+            Args:
+                request: An instance of the ExportRequest message.
+                context: The gRPC context.
+
+            Yields:
+                StoreRecord: One record per post or comment.
+            """
+        return bulk_io.iter_store(posts, comments, include_comments=not request.posts_only)
+
+    def ImportStore(self, request_iterator, context):
+        """
+            Loads a stream of posts and comments straight into the stores.
+
+            The per-post comment index is built in one pass once the stream ends, rather
+            than being updated for each comment.
+
+            Args:
+                request_iterator: An iterator of StoreRecord messages.
+                context: The gRPC context.
+
+            Returns:
+                BulkSummary: Counts, elapsed time and throughput of the import.
+            """
+        self._check_writable(context)
+        with self._write_lock:
+            summary = bulk_io.load_records(request_iterator, posts, comments, post_comments, accountant, visibility,
+                                           authors, tier, comment_replaced)
+            top_views.clear()
+            if tier is not None:
+                tier.maintain()
+            # Bulk loads bypass the log, so followers pick them up through a fresh snapshot
+            self.replication_log.invalidate()
+        return summary
+
+    def DropPosts(self, request, context):
+        """
+            Removes posts and all of their comments from this node.
+
+            Used when rebalancing partitions, after the posts have been copied to their new
+            owner.
+
+            Args:
+                request: An instance of the PostIds message.
+                context: The gRPC context.
+
+            Returns:
+                BulkSummary: The number of posts and comments removed.
+            """
+        self._check_writable(context)
+        with self._write_lock:
+            dropped_posts, dropped_comments = drop_posts(request.post_ids)
+            self._replicate(context, Mutation(drop_posts=request))
+        return BulkSummary(posts=dropped_posts, comments=dropped_comments)
+
+    def HandOffPosts(self, request, context):
+        """
+            Refuses writes to posts in ranges handed over to another node.
+
+            Used when rebalancing partitions: the ranges are fenced before the posts are
+            copied to their new owner, so no write lands on a post about to be dropped.
+            While the copy runs writes fail with UNAVAILABLE, which callers may retry;
+            once the posts have moved they fail with FAILED_PRECONDITION naming the owner.
+
+            Args:
+                request: An instance of the HandoffRequest message.
+                context: The gRPC context.
+
+            Returns:
+                HandoffStatus: The ranges fenced, the nodes handed over to, and the subreddits
+                    hidden here, which the new owner must hide as well.
+            """
+        self._check_writable(context)
+        # Under the write lock, so writes already past their check are applied before the copy
+        with self._write_lock:
+            if request.lift:
+                self.handoffs.lift(request.owner)
+                ranges = 0
+            else:
+                ranges = self.handoffs.fence(request.owner, request.starts, request.ends, request.moved)
+        return HandoffStatus(ranges=ranges, owners=len(self.handoffs),
+                             hidden_subreddits=sorted(visibility.hidden_subreddits))
+
+    def Replicate(self, request, context):
+        """
+            Streams this leader's mutations to a follower.
+
+            A follower asking from sequence 0, or from a sequence no longer held in the
+            replication log, first receives a full snapshot of the stores.
+
+            Args:
+                request: An instance of the ReplicationRequest message.
+                context: The gRPC context.
+
+            Yields:
+                Mutation: The mutations in the order they were applied.
+            """
+        if self.follower is not None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Cannot replicate from a follower")
+        return replication.stream_mutations(self.replication_log, request.from_seq, self._snapshot, context)
+
+    def GetReplicationStatus(self, request, context):
+        """
+            Reports the replication position of this node.
+
+            Args:
+                request: An instance of the ReplicationStatusRequest message.
+                context: The gRPC context.
+
+            Returns:
+                ReplicationStatus: The role, applied sequence number and lag of this node.
+            """
+        if self.follower is not None:
+            return self.follower.status()
+        last_seq = self.replication_log.last_seq
+        return ReplicationStatus(role=replication.LEADER, applied_seq=last_seq, leader_seq=last_seq)
+
+    def GetStoreStats(self, request, context):
+        """
+            Reports entity counts, estimated memory per structure and the largest posts.
+
+            The figures come from running totals kept by the accountant, so this is cheap
+            however large the stores are. Growth is measured against the previous call.
+
+            Args:
+                request: An instance of the StoreStatsRequest message.
+                context: The gRPC context.
+
+            Returns:
+                StoreStats: The counts and memory estimates of this node.
+            """
+        return accountant.stats(posts, comments, request.top_posts or 10)
+
+    def SetModerationState(self, request, context):
+        """
+            Changes the moderation state of a post, a comment or a subreddit.
+
+            With a comment_id, the comment is hidden or shown; otherwise, with a post_id, the
+            post's state becomes the requested one (NORMAL, LOCKED or HIDDEN); otherwise the
+            subreddit is hidden or shown. The stored entity and the moderation index are
+            updated in place.
+
+            Args:
+                request: An instance of the ModerationRequest message.
+                context: The gRPC context.
+
+            Returns:
+                ModerationSummary: The moderated content counts of this node afterwards.
+            """
+        self._check_writable(context)
+        with tracing.span("store.update"), self._write_lock:
+            self._check_owned(context, request.post_id)
+            if not moderate(request):
+                context.abort(grpc.StatusCode.NOT_FOUND, "Nothing to moderate")
+            self._replicate(context, Mutation(moderate=request))
+        return visibility.summary()
+
+    def GetUserActivity(self, request, context):
+        """
+            Streams a page of an author's posts and comments, most recent first.
+
+            Pages come from the author index, so a page of k items costs O(log n + k)
+            whatever the size of the stores. Hidden posts and comments, and comments under
+            hidden posts, are left out.
+
+            Args:
+                request: An instance of the ActivityRequest message.
+                context: The gRPC context.
+
+            Yields:
+                ActivityItem: The author's posts and comments, each with the cursor to
+                continue after it.
+            """
+        self._await_replication(context)
+        try:
+            cursor = activity.parse_cursor(request.cursor)
+        except ValueError:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Invalid cursor {request.cursor!r}")
+        remaining = request.limit or DEFAULT_ACTIVITY_LIMIT
+        while remaining > 0:
+            with tracing.span("store.lookup"):
+                entries = authors.recent(request.author, cursor, remaining)
+            if not entries:
+                return
+            for cursor, kind, entity_id in entries:
+                item = activity_item(kind, entity_id)
+                if item is not None:
+                    item.cursor = activity.format_cursor(cursor)
+                    remaining -= 1
+                    yield item
+
+    def GetTrendingPosts(self, request, context):
+        """
+            Streams the posts that gained the most votes over a recent window.
+
+            Posts are ranked by upvotes minus downvotes within the last five minutes, hour
+            or day, from the vote counters kept as votes arrive, so a call reads only the
+            top of the ranking. Hidden posts are left out.
+
+            Args:
+                request: An instance of the TrendingRequest message.
+                context: The gRPC context.
+
+            Yields:
+                TrendingPost: The posts, most votes first.
+            """
+        self._await_replication(context)
+        if request.window not in trending.WINDOWS:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Unknown trending window {request.window}")
+
+        def shown(post_id):
+            post = posts.get(post_id)
+            return post is not None and visibility.is_visible(post_id, post)
+
+        with tracing.span("store.lookup"):
+            ranked = trends.top(request.window, request.limit or DEFAULT_TRENDING_LIMIT, shown)
+        for post_id, votes in ranked:
+            post = posts.get(post_id)
+            if post is not None:
+                yield TrendingPost(post=post, votes=votes, window=request.window)
+
+    def apply_mutation(self, mutation):
+        """
+            Applies one replicated mutation to the local stores (follower side).
 
-def serve():
+            Args:
+                mutation: A Mutation message received from the leader.
+            """
+        with self._write_lock:
+            if mutation.reset:
+                posts.clear()
+                comments.clear()
+                post_comments.clear()
+                accountant.reset()
+                top_views.clear()
+                visibility.clear()
+                positions.clear()
+                authors.clear()
+                trends.clear()
+
+            op = mutation.WhichOneof("op")
+            if op == "create_post":
+                store_post(mutation.entity_id, mutation.create_post)
+            elif op == "create_comment":
+                store_comment(mutation.entity_id, mutation.create_comment)
+            elif op == "vote_post":
+                post = posts.get(mutation.entity_id)
+                if post:
+                    apply_vote(post, mutation.vote_post.action)
+                    post_voted(mutation.entity_id, mutation.vote_post.action)
+            elif op == "vote_comment":
+                comment = comments.get(mutation.entity_id)
+                if comment:
+                    apply_vote(comment, mutation.vote_comment.action)
+                    comment_voted(mutation.entity_id, comment)
+            elif op == "drop_posts":
+                drop_posts(mutation.drop_posts.post_ids)
+            elif op == "moderate":
+                moderate(mutation.moderate)
+
+    def _snapshot(self):
+        # Copy the stores under the write lock so the snapshot matches last_seq exactly
+        with self._write_lock:
+            entries = [Mutation(entity_id=post_id, create_post=post) for post_id, post in posts.items()]
+            entries.extend(Mutation(entity_id=str(comment_id), create_comment=comment)
+                           for comment_id, comment in comments.items())
+            # Post states and hidden comments travel in the entities; hidden subreddits don't
+            entries.extend(Mutation(moderate=ModerationRequest(subreddit_id=subreddit_id, hidden=True))
+                           for subreddit_id in visibility.hidden_subreddits)
+            return self.replication_log.last_seq, entries
+
+    def _replicate(self, context, mutation):
+        seq = self.replication_log.append(mutation)
+        context.set_trailing_metadata(((replication.SEQ_METADATA_KEY, str(seq)),))
+
+    def _idempotency_size(self):
+        post_keys, post_bytes = self.post_keys.size()
+        comment_keys, comment_bytes = self.comment_keys.size()
+        return post_keys + comment_keys, post_bytes + comment_bytes
+
+    def _replicate_repeat(self, context):
+        # A repeated create changes nothing, but the caller may never have seen the sequence
+        # number of the original; the latest one is at least as new
+        context.set_trailing_metadata(((replication.SEQ_METADATA_KEY, str(self.replication_log.last_seq)),))
+
+    def _check_unlocked(self, context, post_id):
+        if visibility.is_locked(post_id):
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"Post {post_id} is locked")
+
+    def _check_owned(self, context, post_id):
+        handed_over = self.handoffs.owner_of(post_id) if post_id else None
+        if handed_over is None:
+            return
+        owner, moved = handed_over
+        if moved:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"Post {post_id} moved to {owner}")
+        context.abort(grpc.StatusCode.UNAVAILABLE, f"Post {post_id} is moving to {owner}")
+
+    def _check_writable(self, context):
+        if self.follower is not None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION,
+                          f"Read-only follower; send writes to the leader at {self.follower.leader_address}")
+
+    def _await_replication(self, context):
+        # Read-your-writes: wait (bounded by the deadline) until the caller's write is applied
+        if self.follower is None:
+            return
+        min_seq = replication.min_seq_from_metadata(context)
+        if min_seq and not self.follower.wait_for(min_seq, min(context.time_remaining() or 1.0, 1.0)):
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION,
+                          f"Replica at sequence {self.follower.applied_seq}, caller needs {min_seq}")
+
+
+def store_post(post_id, post):
+    """
+        Stores a post, replacing any post with the same ID.
+
+        Args:
+            post_id (str): ID to store the post under.
+            post: The Post message.
+        """
+    replaced = posts.get(post_id)
+    accountant.post_added(post_id, post, replaced=replaced)
+    posts[post_id] = post
+    visibility.post_stored(post_id, post)
+    if replaced is None:
+        authors.post_added(post_id, post)
+    elif replaced.author != post.author:
+        authors.remove([(replaced.author, activity.POST, post_id)])
+        authors.post_added(post_id, post)
+    if tier is not None:
+        tier.maintain()
+
+
+def store_comment(comment_id, comment):
+    """
+        Stores a comment and indexes it under its post.
+
+        A comment replacing one with the same ID keeps its existing index entry (and
+        position, which its hidden flag is indexed by).
+
+        Args:
+            comment_id (str): ID to store the comment under.
+            comment: The Comment message.
+        """
+    replaced = comments.get(comment_id)
+    accountant.comment_added(comment_id, comment, replaced=replaced)
+    comments[comment_id] = comment
+    if replaced is None:
+        index = post_comments.setdefault(comment.post_id, [])
+        index.append(comment_id)
+        accountant.index_grew(comment.post_id, 1, len(index))
+        if comment.hidden:
+            visibility.comment_hidden(comment.post_id, len(index) - 1, True)
+        else:
+            top_views.comment_added(comment.post_id, comment_id, comment, len(index) - 1)
+        authors.comment_added(comment_id, comment)
+    else:
+        comment_replaced(comment_id, comment, replaced)
+    if tier is not None:
+        tier.maintain()
+
+
+def comment_replaced(comment_id, comment, replaced):
+    """
+        Re-indexes a comment stored over one with the same ID.
+
+        The comment keeps the index entry (and position) of the one it replaced; its author
+        and hidden flag are indexed again if they changed.
+
+        Args:
+            comment_id (str): ID of the comment.
+            comment: The new Comment, already stored.
+            replaced: The Comment it replaced.
+        """
+    if replaced.author != comment.author:
+        authors.remove([(replaced.author, activity.COMMENT, comment_id)])
+        authors.comment_added(comment_id, comment)
+    top_views.discard(replaced.post_id)
+    top_views.discard(comment.post_id)
+    if comment.hidden != replaced.hidden:
+        visibility.comment_hidden(replaced.post_id, positions.position(replaced.post_id, comment_id, post_comments),
+                                  comment.hidden)
+
+
+def comment_voted(comment_id, comment):
+    """
+        Updates the top-comment view of a comment's post after its score changed.
+
+        Args:
+            comment_id (str): The voted comment.
+            comment: The stored Comment, already updated.
+        """
+    if comment.hidden:
+        return
+    top_views.comment_changed(comment.post_id, comment_id, comment,
+                              lambda: positions.position(comment.post_id, comment_id, post_comments))
+
+
+def drop_posts(post_ids):
+    """
+        Removes posts and their comments from the stores.
+
+        Args:
+            post_ids: The IDs of the posts to remove.
+
+        Returns:
+            tuple: The number of posts and comments removed.
+        """
+    dropped_posts = dropped_comments = 0
+    # (author, kind, ID) of everything dropped, removed from the author index in one pass
+    dropped = []
+    for post_id in post_ids:
+        post = posts.pop(post_id, None)
+        if post is not None:
+            accountant.post_removed(post_id, post)
+            dropped.append((post.author, activity.POST, post_id))
+            dropped_posts += 1
+        top_views.discard(post_id)
+        visibility.post_removed(post_id)
+        positions.discard(post_id)
+        trends.remove(post_id)
+        index = post_comments.pop(post_id, None)
+        if index is None:
+            continue
+        accountant.index_removed(post_id, len(index))
+        for comment_id in index:
+            comment = comments.pop(comment_id, None)
+            if comment is not None:
+                accountant.comment_removed(comment_id, comment)
+                dropped.append((comment.author, activity.COMMENT, comment_id))
+                dropped_comments += 1
+    authors.remove(dropped)
+    return dropped_posts, dropped_comments
+
+
+def moderate(request):
+    """
+        Applies a moderation change to the stored entities and the moderation index.
+
+        Args:
+            request: The ModerationRequest; see SetModerationState.
+
+        Returns:
+            bool: False if the post or comment to change doesn't exist.
+        """
+    if request.comment_id:
+        comment = comments.get(request.comment_id)
+        if comment is None:
+            return False
+        if comment.hidden != request.hidden:
+            comment.hidden = request.hidden
+            position = positions.position(comment.post_id, request.comment_id, post_comments)
+            visibility.comment_hidden(comment.post_id, position, request.hidden)
+            if request.hidden:
+                top_views.comment_removed(comment.post_id, request.comment_id)
+            else:
+                top_views.comment_added(comment.post_id, request.comment_id, comment, position)
+    elif request.post_id:
+        post = posts.get(request.post_id)
+        if post is None:
+            return False
+        post.state = request.state
+        visibility.post_stored(request.post_id, post)
+        if not visibility.is_visible(request.post_id, post):
+            top_views.discard(request.post_id)
+    else:
+        visibility.subreddit_hidden(request.subreddit_id, request.hidden)
+    return True
+
+
+def post_voted(post_id, action):
+    """
+        Counts a vote on a post towards its trending windows.
+
+        Args:
+            post_id (str): The voted post.
+            action: The VoteAction of the vote.
+        """
+    trends.vote(post_id, 1 if action == VoteAction.UPVOTE else -1)
+
+
+def activity_item(kind, entity_id):
+    """
+        Builds the ActivityItem of an entry of the author index.
+
+        Args:
+            kind: activity.POST or activity.COMMENT.
+            entity_id (str): The post or comment.
+
+        Returns:
+            ActivityItem: The item, or None if the entity is gone or hidden.
+        """
+    if kind == activity.POST:
+        post = posts.get(entity_id)
+        if post is None or not visibility.is_visible(entity_id, post):
+            return None
+        return ActivityItem(post=post)
+    comment = comments.get(entity_id)
+    if comment is None or comment.hidden:
+        return None
+    parent = posts.get(comment.post_id)
+    if parent is not None and not visibility.is_visible(comment.post_id, parent):
+        return None
+    return ActivityItem(comment=comment)
+
+
+def apply_vote(entity, action):
+    """
+        Applies an upvote or downvote to a post or comment.
+
+        Args:
+            entity: The Post or Comment being voted on.
+            action: The VoteAction of the vote.
+        """
+    if action == VoteAction.UPVOTE:
+        entity.score += 1
+    elif action == VoteAction.DOWNVOTE:
+        entity.score -= 1
+
+
+def load_snapshot(path):
+    """
+        Replaces the stores with lazily loaded views of a snapshot file.
+
+        Only the snapshot header is read here; posts, comments and index entries are
+        decoded the first time they are accessed.
+
+        Args:
+            path (str): A snapshot written by snapshot.write_snapshot.
+
+        Returns:
+            tuple: The new (posts, comments, post_comments) stores.
+        """
+    global posts, comments, post_comments
+    posts, comments, post_comments = snapshot.load_snapshot(path)
+    # Counted on the snapshot's own index, so finding the largest posts decodes no entry
+    index_sizes = snapshot.index_sizes(post_comments)
+    if tier is not None:
+        tier.clear()
+        posts, comments, post_comments = tier.wrap(posts, comments, post_comments)
+    accountant.seed(posts, comments, post_comments, index_sizes=index_sizes)
+    top_views.clear()
+    positions.clear()
+    visibility.restore(snapshot.read_section(path, snapshot.MODERATION).items())
+    author_activity = snapshot.load_section(path, snapshot.AUTHORS, activity.decode)
+    # Entry counts of the lazily loaded index are estimated as one per entity
+    authors.load(author_activity if author_activity is not None else {}, len(posts) + len(comments))
+    return posts, comments, post_comments
+
+
+def enable_tiering(directory, budget_bytes, max_idle=None):
+    """
+        Puts the stores under hot/cold tiering: least recently used posts and their comments
+        are spilled to segment files once the resident ones exceed a memory budget, and
+        faulted back in when they are next read or written.
+
+        Args:
+            directory (str): Directory for the segment files.
+            budget_bytes (int): Estimated bytes of resident posts and comments; None for no budget.
+            max_idle (float): Seconds after which an unread post is spilled; None to spill only
+                over budget.
+
+        Returns:
+            tiering.ColdTier: The tier.
+        """
+    global posts, comments, post_comments, tier
+    if tier is not None:
+        disable_tiering()
+    tier = tiering.ColdTier(directory, budget_bytes, max_idle)
+    posts, comments, post_comments = tier.wrap(posts, comments, post_comments)
+    # A materialized view holds the comments of its post, which would stay resident
+    tier.on_spill.append(top_views.discard)
+    tier.on_spill.append(positions.discard)
+    accountant.register("cold_tier", tier.size)
+    return tier
+
+
+def disable_tiering():
+    """Faults every spilled post back in and returns the stores to plain memory."""
+    global posts, comments, post_comments, tier
+    if tier is None:
+        return
+    posts, comments, post_comments = tier.unwrap()
+    accountant.unregister("cold_tier")
+    tier = None
+
+
+def _sweep(servicer, stop, interval=1.0):
+    while not stop.wait(interval):
+        servicer.sweep_tier()
+
+
+def serve(port=50053, follow=None, capture=None, capture_sample=1.0, snapshot_path=None, trace=None,
+          trace_sample=0.01, memory_budget=None, tier_dir=None, max_idle=None):
     """
         Start the gRPC server to serve the Reddit service.
 
         This function initializes the gRPC server, adds the RedditServicer, and starts
         listening on a specified port.
+
+        Args:
+            port (int): The port to listen on. Defaults to 50053.
+            follow (str): host:port of a leader to replicate from. When set, this server is
+                a read-only follower.
+            capture (str): File to record incoming requests to, for replay with traffic_capture.
+            capture_sample (float): Fraction of requests to record when capturing.
+            snapshot_path (str): Snapshot file to warm-start the stores from.
+            trace (str): File to write request trace spans to, as JSON lines.
+            trace_sample (float): Fraction of requests to trace when the client doesn't decide.
+            memory_budget (int): Bytes of posts and comments to keep resident, spilling the
+                least recently used posts to disk beyond it; None keeps everything in memory.
+            tier_dir (str): Directory for spilled posts; a temporary one if not set.
+            max_idle (float): Seconds after which an unread post is spilled, budget or not.
         """
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    add_RedditServiceServicer_to_server(RedditServicer(), server)
-    server.add_insecure_port('[::]:50053')  # Use your desired port
+    if snapshot_path:
+        start = time.perf_counter()
+        load_snapshot(snapshot_path)
+        print(f"Loaded snapshot of {len(posts)} posts and {len(comments)} comments "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    tier_directory = None
+    if memory_budget is not None or max_idle is not None:
+        if tier_dir is None:
+            tier_directory = tempfile.TemporaryDirectory(prefix="reddit-tier-")
+            tier_dir = tier_directory.name
+        enable_tiering(tier_dir, memory_budget, max_idle)
+        print(f"Spilling cold posts to {tier_dir} (budget "
+              f"{'none' if memory_budget is None else f'{memory_budget / (1 << 20):.0f} MB'}, "
+              f"max idle {'none' if max_idle is None else f'{max_idle:g} s'})")
+
+    interceptors = []
+    capture_writer = None
+    if capture:
+        capture_writer = traffic_capture.CaptureWriter(capture)
+        interceptors.append(traffic_capture.CaptureInterceptor(capture_writer, capture_sample))
+        print(f"Capturing {capture_sample:.0%} of requests to {capture}")
+    span_exporter = None
+    if trace:
+        span_exporter = tracing.FileExporter(trace)
+        interceptors.append(tracing.TracingInterceptor(tracing.Tracer(span_exporter, trace_sample)))
+        print(f"Tracing {trace_sample:.0%} of requests to {trace}")
+
+    # Innermost, so it wraps the generated serializers: lets comment streams send pre-encoded views
+    interceptors.append(topn_cache.PreEncodedInterceptor())
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), interceptors=interceptors)
+    servicer = RedditServicer()
+    add_RedditServiceServicer_to_server(servicer, server)
+    server.add_insecure_port(f'[::]:{port}')  # Use your desired port
+
+    if follow:
+        servicer.follow(follow)
+        print(f"Following leader at {follow}")
+
+    stop_sweeping = threading.Event()
+    if tier is not None:
+        threading.Thread(target=_sweep, args=(servicer, stop_sweeping), daemon=True).start()
 
-    print("Server started. Listening on port 50053...")
+    print(f"Server started. Listening on port {port}...")
     server.start()
-    server.wait_for_termination()
+    try:
+        server.wait_for_termination()
+    finally:
+        stop_sweeping.set()
+        if tier_directory is not None:
+            tier.close()
+            tier_directory.cleanup()
+        if span_exporter is not None:
+            span_exporter.close()
+        if capture_writer is not None:
+            capture_writer.close()
+            print(f"Captured {capture_writer.recorded} requests ({capture_writer.dropped} dropped)")
 
 
 if __name__ == '__main__':
-    serve()
+    parser = argparse.ArgumentParser(description="Reddit gRPC server")
+    parser.add_argument("--port", type=int, default=50053)
+    parser.add_argument("--follow", metavar="HOST:PORT", help="run as a read-only follower of this leader")
+    parser.add_argument("--capture", metavar="PATH", help="record incoming requests to this file")
+    parser.add_argument("--capture-sample", type=float, default=1.0, help="fraction of requests to record")
+    parser.add_argument("--snapshot", metavar="PATH", help="warm-start the stores from this snapshot file")
+    parser.add_argument("--trace", metavar="PATH", help="write request trace spans to this file")
+    parser.add_argument("--trace-sample", type=float, default=0.01, help="fraction of requests to trace")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="spill least recently used posts to disk beyond this many MB of posts and comments")
+    parser.add_argument("--tier-dir", metavar="PATH", help="directory for spilled posts (default: a temporary one)")
+    parser.add_argument("--max-idle", type=float, metavar="SECONDS", help="spill posts unread for this long")
+    args = parser.parse_args()
+    serve(port=args.port, follow=args.follow, capture=args.capture, capture_sample=args.capture_sample,
+          snapshot_path=args.snapshot, trace=args.trace, trace_sample=args.trace_sample,
+          memory_budget=None if args.memory_budget is None else int(args.memory_budget * (1 << 20)),
+          tier_dir=args.tier_dir, max_idle=args.max_idle)
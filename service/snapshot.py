@@ -0,0 +1,468 @@
+# Author - Akshita Patil
+
+import argparse
+import mmap
+import random
+import struct
+import threading
+import time
+from collections.abc import MutableMapping
+
+from data_model_pb2 import Post, Comment
+
+"""
+    Warm-start snapshots of the post and comment stores.
+
+    A snapshot file holds the posts, the comments and the per-post comment index as
+    sorted, fixed-width key tables over blobs of serialized values, so it can be used
+    straight from a memory map. Loading a snapshot only maps the file and reads the
+    header; entities are decoded the first time they are accessed (faulted in) and are
+    kept in memory from then on, so the server can start serving within seconds of
+    startup whatever the size of the dataset.
+
+    File layout (little-endian):
+
+        header   b"RDSNAP2\\n", section count (uint32), then per section: name (16 bytes,
+                 NUL padded), entry count, index offset, keys offset, data offset (uint64)
+        section  index of entry-count (key offset, key length, value offset, value length)
+                 entries sorted by key, followed by the key blob and the value blob
+    """
+
+MAGIC = b"RDSNAP2\n"
+_COUNT = struct.Struct("<I")
+_SECTION = struct.Struct("<16sQQQQ")
+_ENTRY = struct.Struct("<QIQI")
+
+POSTS = "posts"
+COMMENTS = "comments"
+POST_COMMENTS = "post_comments"
+# Entries of moderation.ModerationIndex.entries(); few, so read eagerly
+MODERATION = "moderation"
+# Author -> activity.Activity, decoded per author on first access
+AUTHORS = "authors"
+
+# Comment IDs in a post_comments value are separated by NUL bytes
+_ID_SEPARATOR = b"\x00"
+
+
+def _encode_ids(comment_ids):
+    return _ID_SEPARATOR.join(str(comment_id).encode("utf-8") for comment_id in comment_ids)
+
+
+def _decode_ids(data):
+    return [comment_id.decode("utf-8") for comment_id in data.split(_ID_SEPARATOR)] if data else []
+
+
+def _count_ids(data):
+    return data.count(_ID_SEPARATOR) + 1 if data else 0
+
+
+def _write_section(fh, items, encode):
+    # Writes values, then keys, then the index; returns the section's header fields
+    entries = []
+    keys_blob = bytearray()
+    data_offset = fh.tell()
+    position = 0
+    for key, value in sorted(items, key=lambda item: item[0]):
+        data = encode(value)
+        fh.write(data)
+        entries.append((len(keys_blob), len(key), position, len(data)))
+        keys_blob += key
+        position += len(data)
+
+    keys_offset = fh.tell()
+    fh.write(keys_blob)
+    index_offset = fh.tell()
+    for entry in entries:
+        fh.write(_ENTRY.pack(*entry))
+    return len(entries), index_offset, keys_offset, data_offset
+
+
+def write_snapshot(path, posts, comments, post_comments, moderation=None, authors=None):
+    """
+        Writes the stores and the per-post comment index to a snapshot file.
+
+        Args:
+            path (str): Destination file.
+            posts (dict): The post store.
+            comments (dict): The comment store.
+            post_comments (dict): The per-post comment index.
+            moderation (moderation.ModerationIndex): Index of moderated content to include.
+            authors (activity.AuthorIndex): Per-author activity index to include.
+
+        Returns:
+            int: The size of the snapshot in bytes.
+        """
+    sections = [
+        (POSTS, posts, lambda post: post.SerializeToString()),
+        (COMMENTS, comments, lambda comment: comment.SerializeToString()),
+        (POST_COMMENTS, post_comments, _encode_ids),
+    ]
+    if moderation is not None:
+        sections.append((MODERATION, moderation.entries(), bytes))
+    if authors is not None:
+        import activity
+        sections.append((AUTHORS, dict(authors.items()), activity.encode))
+    header_size = len(MAGIC) + _COUNT.size + _SECTION.size * len(sections)
+    headers = []
+    with open(path, "wb", buffering=1 << 20) as fh:
+        fh.write(b"\0" * header_size)
+        for name, store, encode in sections:
+            items = ((str(key).encode("utf-8"), value) for key, value in list(store.items()))
+            headers.append((name.encode("ascii"),) + _write_section(fh, items, encode))
+        size = fh.tell()
+        fh.seek(0)
+        fh.write(MAGIC + _COUNT.pack(len(headers)))
+        for header in headers:
+            fh.write(_SECTION.pack(*header))
+    return size
+
+
+class SnapshotTable:
+    """
+        Read-only sorted key table over one section of a mapped snapshot.
+
+        Lookups are a binary search over the fixed-width index, decoding nothing but the
+        keys compared along the way.
+        """
+
+    def __init__(self, buffer, count, index_offset, keys_offset, data_offset):
+        self._buffer = buffer
+        self.count = count
+        self._index_offset = index_offset
+        self._keys_offset = keys_offset
+        self._data_offset = data_offset
+
+    def _entry(self, i):
+        return _ENTRY.unpack_from(self._buffer, self._index_offset + i * _ENTRY.size)
+
+    def _key(self, entry):
+        start = self._keys_offset + entry[0]
+        return self._buffer[start:start + entry[1]]
+
+    def _find(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self._entry(middle)
+            candidate = self._key(entry)
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return entry
+        return None
+
+    def __contains__(self, key):
+        return self._find(key.encode("utf-8")) is not None
+
+    def get(self, key):
+        """Returns the raw value bytes stored under key, or None."""
+        entry = self._find(key.encode("utf-8"))
+        if entry is None:
+            return None
+        start = self._data_offset + entry[2]
+        return self._buffer[start:start + entry[3]]
+
+    def keys(self):
+        for i in range(self.count):
+            yield self._key(self._entry(i)).decode("utf-8")
+
+    def items(self):
+        """Yields (key, raw value bytes) in key order."""
+        for i in range(self.count):
+            entry = self._entry(i)
+            start = self._data_offset + entry[2]
+            yield self._key(entry).decode("utf-8"), self._buffer[start:start + entry[3]]
+
+
+class LazyStore(MutableMapping):
+    """
+        Dictionary backed by a snapshot table, decoding entries on first access.
+
+        Faulted-in and newly written entries live in an ordinary dict, so they behave
+        exactly like entries of the plain in-memory stores (votes mutate them in place).
+
+        Args:
+            table (SnapshotTable): The snapshot section backing the store.
+            decode (callable): Turns stored bytes into the stored value.
+        """
+
+    def __init__(self, table, decode):
+        self._table = table
+        self._decode = decode
+        self._loaded = {}
+        self._deleted = set()
+        self._count = table.count
+        self._lock = threading.Lock()
+
+    @property
+    def resident(self):
+        """Number of entries decoded or written since the snapshot was loaded."""
+        return len(self._loaded)
+
+    def _in_table(self, key):
+        return isinstance(key, str) and key not in self._deleted and key in self._table
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            pass
+        if not isinstance(key, str) or key in self._deleted:
+            raise KeyError(key)
+        with self._lock:
+            # Another thread may have faulted the key in while we waited
+            if key in self._loaded:
+                return self._loaded[key]
+            data = self._table.get(key)
+            if data is None:
+                raise KeyError(key)
+            value = self._decode(data)
+            self._loaded[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key not in self._loaded and not self._in_table(key):
+                self._count += 1
+            self._loaded[key] = value
+            self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            in_table = self._in_table(key)
+            if key not in self._loaded and not in_table:
+                raise KeyError(key)
+            self._loaded.pop(key, None)
+            if in_table:
+                self._deleted.add(key)
+            self._count -= 1
+
+    def __contains__(self, key):
+        return key in self._loaded or self._in_table(key)
+
+    def __iter__(self):
+        for key in self._table.keys():
+            if key not in self._deleted:
+                yield key
+        for key in list(self._loaded):
+            if not isinstance(key, str) or key not in self._table:
+                yield key
+
+    def __len__(self):
+        return self._count
+
+    def sizes(self, raw_size):
+        """
+            Yields (key, size) for every entry without decoding any: len() of the entries
+            in memory, raw_size(stored bytes) of the rest.
+            """
+        with self._lock:
+            loaded = dict(self._loaded)
+            deleted = set(self._deleted)
+        for key, data in self._table.items():
+            if key not in deleted and key not in loaded:
+                yield key, raw_size(data)
+        for key, value in loaded.items():
+            yield key, len(value)
+
+    def clear(self):
+        with self._lock:
+            self._table = SnapshotTable(b"", 0, 0, 0, 0)
+            self._loaded.clear()
+            self._deleted.clear()
+            self._count = 0
+
+
+def load_snapshot(path):
+    """
+        Maps a snapshot file and returns lazily loaded stores over it.
+
+        Args:
+            path (str): The snapshot file.
+
+        Returns:
+            tuple: (posts, comments, post_comments) as LazyStore mappings.
+
+        Raises:
+            ValueError: If the file is not a snapshot.
+        """
+    tables = _map_tables(path)
+    return (
+        LazyStore(tables[POSTS], Post.FromString),
+        LazyStore(tables[COMMENTS], Comment.FromString),
+        LazyStore(tables[POST_COMMENTS], _decode_ids),
+    )
+
+
+def index_sizes(post_comments):
+    """
+        Yields (post ID, comment count) for every entry of a comment index loaded by
+        load_snapshot, counting the IDs in the stored bytes instead of decoding them.
+        """
+    return post_comments.sizes(_count_ids)
+
+
+def load_section(path, name, decode):
+    """
+        Maps one optional section of a snapshot file as a lazily loaded store.
+
+        Args:
+            path (str): The snapshot file.
+            name (str): The section.
+            decode (callable): Turns stored bytes into the stored value.
+
+        Returns:
+            LazyStore: The section, or None if the snapshot has no such section.
+        """
+    table = _map_tables(path).get(name)
+    return LazyStore(table, decode) if table is not None else None
+
+
+def _map_tables(path):
+    with open(path, "rb") as fh:
+        buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a snapshot")
+
+    (count,) = _COUNT.unpack_from(buffer, len(MAGIC))
+    tables = {}
+    for i in range(count):
+        name, *fields = _SECTION.unpack_from(buffer, len(MAGIC) + _COUNT.size + i * _SECTION.size)
+        tables[name.rstrip(b"\0").decode("ascii")] = SnapshotTable(buffer, *fields)
+    return tables
+
+
+def read_section(path, name):
+    """
+        Reads a whole section of a snapshot file.
+
+        Args:
+            path (str): The snapshot file.
+            name (str): The section.
+
+        Returns:
+            dict: Key -> raw value bytes; empty if the snapshot has no such section.
+        """
+    with open(path, "rb") as fh:
+        data = fh.read(len(MAGIC) + _COUNT.size)
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        (count,) = _COUNT.unpack_from(data, len(MAGIC))
+        headers = fh.read(count * _SECTION.size)
+        for i in range(count):
+            section, *fields = _SECTION.unpack_from(headers, i * _SECTION.size)
+            if section.rstrip(b"\0").decode("ascii") != name:
+                continue
+            entry_count, index_offset, keys_offset, data_offset = fields
+            fh.seek(data_offset)
+            blob = fh.read(index_offset + entry_count * _ENTRY.size - data_offset)
+            table = SnapshotTable(blob, entry_count, index_offset - data_offset, keys_offset - data_offset, 0)
+            return {key: bytes(table.get(key)) for key in table.keys()}
+    return {}
+
+
+def _synthetic_stores(post_count, comment_count):
+    posts = {str(i): Post(post_id=str(i), title=f"Post {i}", text="Lorem ipsum " * 8, author=f"user{i % 1000}",
+                          score=i % 100, publication_date="2023-12-10T12:00:00Z")
+             for i in range(1, post_count + 1)}
+    comments = {}
+    post_comments = {}
+    for i in range(1, comment_count + 1):
+        post_id = str(i % post_count + 1)
+        comments[str(i)] = Comment(comment_id=str(i), post_id=post_id, text="Comment text " * 4,
+                                   author=f"user{i % 5000}", score=i % 50,
+                                   publication_date="2023-12-10T12:00:00Z")
+        post_comments.setdefault(post_id, []).append(str(i))
+    return posts, comments, post_comments
+
+
+def benchmark(path, post_count, comment_count, window=2000, tolerance=0.1):
+    """
+        Reports time to first RPC and time to steady-state p99 after a warm start.
+
+        The snapshot is loaded into a RedditServicer behind a local gRPC server. Each read
+        is a GetPostContent RPC for a random post followed by the store accesses of
+        GetTopComments (its index entry and comments); steady state is reached once a
+        window's p99 is within tolerance of the previous window's.
+
+        Args:
+            path (str): Where to write the synthetic snapshot.
+            post_count (int): Posts in the synthetic dataset.
+            comment_count (int): Comments in the synthetic dataset.
+            window (int): Reads per measurement window.
+            tolerance (float): Relative p99 change that counts as steady.
+        """
+    print(f"Building {post_count:,} posts / {comment_count:,} comments...")
+    stores = _synthetic_stores(post_count, comment_count)
+    start = time.perf_counter()
+    size = write_snapshot(path, *stores)
+    print(f"Wrote {size / 1e6:,.1f} MB snapshot in {time.perf_counter() - start:.1f}s")
+    del stores
+
+    import grpc
+    from concurrent import futures
+    import server
+    from data_model_pb2_grpc import RedditServiceStub, add_RedditServiceServicer_to_server
+
+    start = time.perf_counter()
+    posts, comments, post_comments = server.load_snapshot(path)
+    loaded = time.perf_counter() - start
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    add_RedditServiceServicer_to_server(server.RedditServicer(), grpc_server)
+    port = grpc_server.add_insecure_port("localhost:0")
+    grpc_server.start()
+    stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+    stub.GetPostContent(Post(post_id=str(random.randint(1, post_count))), wait_for_ready=True)
+    first_rpc = time.perf_counter() - start
+    print(f"Mapped snapshot in {loaded * 1000:.2f} ms; first successful RPC after {first_rpc * 1000:.2f} ms")
+
+    previous = None
+    windows = 0
+    while True:
+        latencies = []
+        for _ in range(window):
+            call_start = time.perf_counter()
+            post_id = str(random.randint(1, post_count))
+            stub.GetPostContent(Post(post_id=post_id))
+            for comment_id in post_comments.get(post_id, [])[:10]:
+                comments[comment_id]
+            latencies.append(time.perf_counter() - call_start)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)]
+        windows += 1
+        if previous is not None and abs(p99 - previous) <= tolerance * previous:
+            break
+        previous = p99
+    print(f"Steady-state p99 {p99 * 1e6:.1f} us after {time.perf_counter() - start:.2f}s "
+          f"({windows} windows, {posts.resident:,} posts and {comments.resident:,} comments resident)")
+    grpc_server.stop(None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or benchmark warm-start snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a snapshot from a bulk export file")
+    build.add_argument("export")
+    build.add_argument("snapshot")
+    bench = commands.add_parser("bench", help="measure warm-start time on a synthetic dataset")
+    bench.add_argument("--posts", type=int, default=100_000)
+    bench.add_argument("--comments", type=int, default=10_000_000)
+    bench.add_argument("--path", default="snapshot-bench.bin")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        import bulk_io
+        import activity
+        import moderation
+        posts, comments, post_comments = {}, {}, {}
+        index = moderation.ModerationIndex()
+        authors = activity.AuthorIndex()
+        print(bulk_io.format_summary("Loaded", bulk_io.import_store(args.export, posts, comments, post_comments,
+                                                                    moderation=index, authors=authors)))
+        size = write_snapshot(args.snapshot, posts, comments, post_comments, index, authors)
+        print(f"Wrote {size:,} bytes to {args.snapshot}")
+    else:
+        benchmark(args.path, args.posts, args.comments)
@@ -1,10 +1,64 @@
 # Author - Akshita Patil
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+import tempfile
+import threading
 import unittest
+from concurrent import futures
 from unittest.mock import Mock
 
-from data_model_pb2 import Comment, TopCommentsRequest, VoteRequest, VoteAction
+import grpc
+
+import activity
+import batching
+import bulk_io
+import handoff
+import idempotency
+import introspection
+import microbench
+import moderation
+import replication
+import server
+import snapshot
+import tiering
+import topn_cache
+import traffic_capture
+import tracing
+import trending
+from data_model_pb2 import Comment, TopCommentsRequest, VoteRequest, VoteAction, ReplicationStatusRequest, ExportRequest
+from data_model_pb2 import PostIds, StoreStatsRequest, ModerationRequest, StoreRecord, Subreddit, LOCKED, HIDDEN, NORMAL
+from data_model_pb2 import ActivityRequest, TrendingRequest, FIVE_MINUTES, ONE_HOUR, ONE_DAY
+from data_model_pb2_grpc import RedditServiceStub, RedditServiceServicer
+from data_model_pb2_grpc import add_RedditServiceServicer_to_server
 from server import RedditServicer, Post
 
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(SERVICE_DIR, "..", "client"))
+
+import resilience
+import routing
+from client import RedditClient
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(*args):
+    # Runs server.py in its own process and waits until it accepts calls
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "server.py", "--port", str(port), *args], cwd=SERVICE_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    channel = grpc.insecure_channel(f"localhost:{port}")
+    grpc.channel_ready_future(channel).result(timeout=15)
+    return process, RedditServiceStub(channel), f"localhost:{port}"
+
 
 class TestRedditServicer(unittest.TestCase):
     def setUp(self):
@@ -174,5 +228,1141 @@ class TestRedditServicer(unittest.TestCase):
         # Asserting that the result is None for a non-existent comment
         self.assertIsNone(result)
 
+
+class TestBulkIO(unittest.TestCase):
+    def setUp(self):
+        self.posts = {"1": Post(post_id="1", title="Post 1"), "2": Post(post_id="2", title="Post 2")}
+        self.comments = {
+            "1": Comment(comment_id="1", post_id="1", text="Comment 1"),
+            "2": Comment(comment_id="2", post_id="2", text="Comment 2"),
+            "3": Comment(comment_id="3", post_id="1", text="Comment 3"),
+        }
+
+    def round_trip(self, fmt):
+        buffer = io.BytesIO()
+        written = bulk_io.write_records(bulk_io.iter_store(self.posts, self.comments), buffer, fmt)
+        buffer.seek(0)
+
+        posts, comments, post_comments = {}, {}, {}
+        summary = bulk_io.load_records(bulk_io.read_records(buffer, fmt), posts, comments, post_comments)
+
+        self.assertEqual(written, 5)
+        self.assertEqual((summary.posts, summary.comments), (2, 3))
+        self.assertEqual(posts, self.posts)
+        self.assertEqual(comments, self.comments)
+        self.assertEqual(post_comments, {"1": ["1", "3"], "2": ["2"]})
+
+    def test_round_trip_delimited(self):
+        self.round_trip(bulk_io.DELIMITED)
+
+    def test_round_trip_jsonl(self):
+        self.round_trip(bulk_io.JSONL)
+
+    def test_truncated_delimited_file(self):
+        buffer = io.BytesIO()
+        bulk_io.write_records(bulk_io.iter_store(self.posts, {}), buffer)
+        truncated = io.BytesIO(buffer.getvalue()[:-1])
+
+        with self.assertRaises(ValueError):
+            list(bulk_io.read_records(truncated))
+
+    def test_export_assigns_missing_post_ids(self):
+        records = list(bulk_io.iter_store({"7": Post(title="No ID")}, {}))
+
+        self.assertEqual(records[0].post.post_id, "7")
+
+    def test_import_without_ids_does_not_overwrite(self):
+        # Post "2" and comment "2" were dropped, so len(store) + 1 would land on "3"
+        posts = {"1": self.posts["1"], "3": Post(post_id="3", title="Post 3")}
+        comments = {"1": self.comments["1"], "3": self.comments["3"]}
+        records = [StoreRecord(post=Post(title="New")), StoreRecord(comment=Comment(post_id="1", text="New"))]
+
+        bulk_io.load_records(records, posts, comments, {})
+
+        self.assertEqual(posts["3"].title, "Post 3")
+        self.assertEqual(posts["4"].title, "New")
+        self.assertEqual(comments["3"].text, "Comment 3")
+        self.assertEqual(comments["4"].text, "New")
+
+
+class TestReplication(unittest.TestCase):
+    def setUp(self):
+        self.processes = []
+        leader, self.leader, self.leader_address = start_server()
+        self.processes.append(leader)
+
+    def tearDown(self):
+        for process in self.processes:
+            process.kill()
+            process.wait()
+
+    def start_follower(self):
+        process, stub, _ = start_server("--follow", self.leader_address)
+        self.processes.append(process)
+        return stub
+
+    def wait_caught_up(self, follower, seq):
+        deadline = time.time() + 10
+        while follower.GetReplicationStatus(ReplicationStatusRequest()).applied_seq < seq:
+            self.assertLess(time.time(), deadline, "follower did not catch up")
+            time.sleep(0.05)
+
+    def test_follower_applies_mutations_in_order(self):
+        # Written before the follower starts, so it arrives through the snapshot
+        self.leader.CreatePost(Post(title="Before follower"))
+        follower = self.start_follower()
+
+        self.leader.CreatePost(Post(title="After follower"))
+        self.leader.CreateComment(Comment(post_id="2", text="Comment"))
+        _, call = self.leader.VotePost.with_call(VoteRequest(post_id="2", action=VoteAction.UPVOTE))
+        seq = int(dict(call.trailing_metadata())[replication.SEQ_METADATA_KEY])
+        self.wait_caught_up(follower, seq)
+
+        self.assertEqual(follower.GetPostContent(Post(post_id="1")).title, "Before follower")
+        self.assertEqual(follower.GetPostContent(Post(post_id="2")).score, 1)
+        status = follower.GetReplicationStatus(ReplicationStatusRequest())
+        self.assertEqual((status.role, status.lag_mutations), (replication.FOLLOWER, 0))
+
+    def test_follower_rejects_writes(self):
+        follower = self.start_follower()
+
+        with self.assertRaises(grpc.RpcError) as error:
+            follower.CreatePost(Post(title="Not allowed"))
+
+        self.assertEqual(error.exception.code(), grpc.StatusCode.FAILED_PRECONDITION)
+
+    def test_read_your_writes(self):
+        follower = self.start_follower()
+
+        _, call = self.leader.CreatePost.with_call(Post(title="Mine"))
+        seq = dict(call.trailing_metadata())[replication.SEQ_METADATA_KEY]
+        post = follower.GetPostContent(Post(post_id="1"), metadata=((replication.MIN_SEQ_METADATA_KEY, seq),))
+
+        self.assertEqual(post.title, "Mine")
+
+    def test_malformed_min_seq_is_rejected(self):
+        follower = self.start_follower()
+
+        with self.assertRaises(grpc.RpcError) as error:
+            follower.GetPostContent(Post(post_id="1"), metadata=((replication.MIN_SEQ_METADATA_KEY, "soon"),))
+
+        self.assertEqual(error.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+
+    def test_heartbeat_does_not_advance_applied_seq(self):
+        log = replication.ReplicationLog()
+        context = Mock(is_active=Mock(side_effect=[True, False]))
+        original_read = log.read
+
+        def read_then_append(from_seq, timeout):
+            # A write lands between the read timing out and the heartbeat being built
+            batch = original_read(from_seq, 0)
+            log.append(replication.Mutation(create_post=Post(post_id="1")))
+            return batch
+
+        log.read = read_then_append
+        heartbeat, = replication.stream_mutations(log, 1, None, context)
+        self.assertEqual(heartbeat.seq, 0)
+
+        applied = []
+        follower = replication.Follower("unused", applied.append)
+        follower.synced = True
+        follower._handle(replication.Mutation(seq=3, leader_time=time.time()))
+        self.assertEqual((follower.applied_seq, applied), (0, []))
+        follower._handle(replication.Mutation(seq=3, leader_time=time.time(), snapshot_end=True))
+        self.assertEqual(follower.applied_seq, 3)
+
+
+class TestPartitioning(unittest.TestCase):
+    def test_ring_spreads_keys_and_moves_few_on_add(self):
+        ring = routing.HashRing(["a", "b", "c"])
+        keys = [str(i) for i in range(3000)]
+        before = {key: ring.node_for(key) for key in keys}
+
+        ring.add_node("d")
+        after = {key: ring.node_for(key) for key in keys}
+
+        counts = [list(before.values()).count(node) for node in "abc"]
+        self.assertGreater(min(counts), 600)
+        # Only keys now owned by the new node move
+        moved = [key for key in keys if before[key] != after[key]]
+        self.assertTrue(all(after[key] == "d" for key in moved))
+        self.assertLess(len(moved), 1200)
+
+    def test_add_node_moves_posts_online(self):
+        processes = []
+        try:
+            first, first_stub, first_address = start_server()
+            second, second_stub, second_address = start_server()
+            processes += [first, second]
+            router = routing.PartitionedStub([first_address])
+
+            post_ids = [router.CreatePost(Post(title=f"Post {i}")).post_id for i in range(40)]
+            for post_id in post_ids:
+                router.CreateComment(Comment(post_id=post_id, text="Comment"))
+            moved = router.add_node(second_address)
+
+            self.assertGreater(moved, 0)
+            for post_id in post_ids:
+                self.assertEqual(router.GetPostContent(Post(post_id=post_id)).post_id, post_id)
+            on_first = {r.post.post_id for r in first_stub.ExportStore(ExportRequest(posts_only=True))}
+            on_second = {r.post.post_id for r in second_stub.ExportStore(ExportRequest(posts_only=True))}
+            self.assertEqual(len(on_second), moved)
+            self.assertEqual(on_first | on_second, set(post_ids))
+            self.assertFalse(on_first & on_second)
+            comments_on_second = [r for r in second_stub.ExportStore(ExportRequest()) if r.HasField("comment")]
+            self.assertEqual(len(comments_on_second), moved)
+
+            # A client still routing by the old ring is refused instead of writing to a dropped post
+            with self.assertRaises(grpc.RpcError) as error:
+                first_stub.VotePost(VoteRequest(post_id=sorted(on_second)[0], action=VoteAction.UPVOTE))
+            self.assertEqual(error.exception.code(), grpc.StatusCode.FAILED_PRECONDITION)
+            self.assertIn(second_address, error.exception.details())
+            first_stub.VotePost(VoteRequest(post_id=sorted(on_first)[0], action=VoteAction.UPVOTE))
+        finally:
+            for process in processes:
+                process.kill()
+                process.wait()
+
+    def test_hidden_subreddits_stay_hidden_on_the_new_node(self):
+        processes = []
+        try:
+            first, first_stub, first_address = start_server()
+            second, second_stub, second_address = start_server()
+            processes += [first, second]
+            router = routing.PartitionedStub([first_address])
+            hidden = Subreddit(subreddit_id="hidden-r")
+            post_ids = [router.CreatePost(Post(title=f"Post {i}", subreddit=hidden)).post_id for i in range(20)]
+            router.SetModerationState(ModerationRequest(subreddit_id="hidden-r", hidden=True))
+
+            self.assertGreater(router.add_node(second_address), 0)
+
+            on_second = [r.post.post_id for r in second_stub.ExportStore(ExportRequest(posts_only=True))]
+            self.assertTrue(on_second)
+            for post_id in post_ids:
+                with self.assertRaises(grpc.RpcError) as error:
+                    router.GetPostContent(Post(post_id=post_id))
+                self.assertEqual(error.exception.code(), grpc.StatusCode.NOT_FOUND)
+        finally:
+            for process in processes:
+                process.kill()
+                process.wait()
+
+    def test_fences_cover_exactly_the_keys_handed_over(self):
+        before = routing.HashRing(["a", "b", "c"])
+        after = before.copy()
+        after.add_node("d")
+        fences = {}
+        for source, (starts, ends) in after.ranges_taken("d", before).items():
+            fences[source] = handoff.HandoffFences()
+            fences[source].fence("d", starts, ends, moved=False)
+
+        for key in (str(i) for i in range(3000)):
+            for source, fenced in fences.items():
+                moving = after.node_for(key) == "d" and before.node_for(key) == source
+                self.assertEqual(fenced.owner_of(key), ("d", False) if moving else None)
+
+    def test_import_fails_instead_of_hanging_when_a_node_fails(self):
+        class FailingImport(RedditServiceServicer):
+            def ImportStore(self, request_iterator, context):
+                context.abort(grpc.StatusCode.INTERNAL, "Disk full")
+
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(FailingImport(), server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        router = routing.PartitionedStub([f"localhost:{port}"])
+
+        records = (StoreRecord(post=Post(post_id=str(i))) for i in range(5000))
+        with self.assertRaises(grpc.RpcError) as error:
+            router.ImportStore(records, timeout=10)
+
+        self.assertEqual(error.exception.code(), grpc.StatusCode.INTERNAL)
+
+
+class TestTrafficCapture(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "capture.bin")
+
+    def test_writer_round_trip(self):
+        writer = traffic_capture.CaptureWriter(self.path)
+        writer.record(0, Post(title="First").SerializeToString())
+        time.sleep(0.01)
+        writer.record(2, Post(post_id="1").SerializeToString())
+        writer.close()
+
+        records = list(traffic_capture.read_capture(self.path))
+
+        self.assertEqual([name for name, _, _ in records], ["CreatePost", "GetPostContent"])
+        self.assertEqual(records[0][1], 0.0)
+        self.assertGreaterEqual(records[1][1], 0.01)
+        self.assertEqual(Post.FromString(records[1][2]).post_id, "1")
+
+    def test_capture_and_replay_through_server(self):
+        writer = traffic_capture.CaptureWriter(self.path)
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4),
+                             interceptors=[traffic_capture.CaptureInterceptor(writer)])
+        add_RedditServiceServicer_to_server(RedditServicer(), server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        try:
+            stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+            post_id = stub.CreatePost(Post(post_id="capture-1", title="Captured")).post_id
+            stub.GetPostContent(Post(post_id=post_id))
+            list(stub.GetTopComments(TopCommentsRequest(post_id=post_id, N=3)))
+            writer.close()
+
+            latencies = traffic_capture.replay(self.path, stub, speed=None)
+        finally:
+            server.stop(None)
+
+        self.assertEqual(sorted(latencies), ["CreatePost", "GetPostContent", "GetTopComments"])
+        rows = traffic_capture.compare(latencies, latencies)
+        self.assertTrue(all(change == 0 for *_, change in rows))
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "snapshot.bin")
+        posts = {str(i): Post(post_id=str(i), title=f"Post {i}") for i in range(1, 21)}
+        comments = {str(i): Comment(comment_id=str(i), post_id=str(i % 20 + 1), score=i) for i in range(1, 101)}
+        post_comments = {}
+        for comment_id, comment in comments.items():
+            post_comments.setdefault(comment.post_id, []).append(comment_id)
+        snapshot.write_snapshot(self.path, posts, comments, post_comments)
+        self.expected = (posts, comments, post_comments)
+
+    def test_load_faults_in_lazily(self):
+        posts, comments, post_comments = snapshot.load_snapshot(self.path)
+
+        self.assertEqual((len(posts), len(comments)), (20, 100))
+        self.assertEqual(posts.resident, 0)
+        self.assertEqual(posts["7"], self.expected[0]["7"])
+        self.assertEqual(post_comments["3"], self.expected[2]["3"])
+        self.assertEqual(posts.resident, 1)
+        self.assertIsNone(posts.get("missing"))
+        self.assertEqual(dict(comments), self.expected[1])
+
+    def test_writes_and_deletes_overlay_the_snapshot(self):
+        posts, _, post_comments = snapshot.load_snapshot(self.path)
+
+        posts["5"].score += 1
+        posts["21"] = Post(post_id="21")
+        del posts["2"]
+        post_comments.setdefault("4", []).append("101")
+
+        self.assertEqual(posts["5"].score, 1)
+        self.assertEqual(len(posts), 20)
+        self.assertNotIn("2", posts)
+        self.assertIn("21", posts)
+        self.assertEqual(sorted(posts, key=int), [str(i) for i in range(1, 22) if i != 2])
+        self.assertEqual(post_comments["4"][-1], "101")
+
+
+class TestTracing(unittest.TestCase):
+    def start(self, sample_rate):
+        self.exporter = tracing.InMemoryExporter()
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4),
+                             interceptors=[tracing.TracingInterceptor(tracing.Tracer(self.exporter, sample_rate))])
+        add_RedditServiceServicer_to_server(RedditServicer(), server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        return RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+
+    def test_spans_cover_each_stage_and_message(self):
+        stub = self.start(sample_rate=1.0)
+        stub.CreatePost(Post(post_id="trace-1", title="Traced"))
+        self.exporter.spans.clear()
+
+        client_tracer = tracing.Tracer(tracing.InMemoryExporter())
+        with client_tracer.start_trace("client/GetTopComments") as root:
+            list(stub.GetTopComments(TopCommentsRequest(post_id="trace-1", N=2), metadata=root.metadata()))
+
+        spans = self.exporter.traces()[root.trace_id]
+        by_name = {span.name: span for span in spans}
+        self.assertEqual(by_name["GetTopComments"].parent_id, root.span_id)
+        for stage in ("store.lookup", "ranking", "message.build"):
+            self.assertEqual(by_name[stage].parent_id, by_name["GetTopComments"].span_id)
+        sends = [span for span in spans if span.name == "stream.send"]
+        self.assertEqual(len(sends), by_name["GetTopComments"].attributes["messages"])
+
+    def test_unary_root_ends_after_serialization(self):
+        stub = self.start(sample_rate=1.0)
+
+        stub.CreatePost(Post(post_id="trace-2", title="Traced"))
+
+        (spans,) = self.exporter.traces().values()
+        names = [span.name for span in spans]
+        self.assertEqual(names[-1], "CreatePost")
+        self.assertIn("serialize", names)
+        self.assertIn("store.write", names)
+
+    def test_unsampled_requests_record_nothing(self):
+        stub = self.start(sample_rate=0.0)
+
+        stub.CreatePost(Post(post_id="trace-3", title="Not traced"))
+        stub.GetPostContent(Post(post_id="trace-3"))
+
+        self.assertEqual(len(self.exporter.spans), 0)
+
+    def test_unserialized_root_ends_and_does_not_leak_into_the_next_call(self):
+        exporter = tracing.InMemoryExporter()
+        seen = []
+
+        def behavior(request, context):
+            seen.append(tracing.current_span())
+            return request
+
+        interceptor = tracing.TracingInterceptor(tracing.Tracer(exporter, sample_rate=0.0))
+        handler = interceptor.intercept_service(
+            lambda details: grpc.unary_unary_rpc_method_handler(behavior, response_serializer=Post.SerializeToString),
+            Mock(method="/RedditService/GetPostContent"))
+        callbacks = []
+        sampled = Mock(invocation_metadata=lambda: ((tracing.SAMPLED_KEY, "1"),), add_callback=callbacks.append)
+        unsampled = Mock(invocation_metadata=lambda: ())
+
+        # A cancelled call: the handler returns but gRPC never serializes the response
+        handler.unary_unary(Post(post_id="cancelled"), sampled)
+        self.assertEqual(len(exporter.spans), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual([span.name for span in exporter.spans], ["GetPostContent"])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(exporter.spans), 1)
+
+        # The next call on this thread isn't sampled and must not see the earlier root
+        handler.response_serializer(handler.unary_unary(Post(post_id="next"), unsampled))
+        self.assertIs(seen[-1], tracing.NOOP_SPAN)
+        self.assertEqual(len(exporter.spans), 1)
+
+
+class TestIdempotency(unittest.TestCase):
+    def test_cache_expires_by_generation(self):
+        now = [0.0]
+        cache = idempotency.IdempotencyCache(capacity=100, ttl=10.0, clock=lambda: now[0])
+        cache.put("a", "1")
+        now[0] = 15.0
+        cache.put("b", "2")
+        self.assertEqual((cache.get("a"), cache.get("b")), ("1", "2"))
+        now[0] = 21.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), "2")
+        now[0] = 45.0
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 0)
+
+    def test_cache_stays_within_capacity(self):
+        cache = idempotency.IdempotencyCache(capacity=10)
+        for i in range(100):
+            cache.put(str(i), str(i))
+        self.assertLessEqual(len(cache), 10)
+        self.assertEqual(cache.get("99"), "99")
+        self.assertIsNone(cache.get("0"))
+
+    def test_retried_create_returns_original(self):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(RedditServicer(), server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+        key = ((idempotency.METADATA_KEY, idempotency.new_key()),)
+        before = stub.GetStoreStats(StoreStatsRequest())
+
+        stub.CreatePost(Post(title="Once"), metadata=key)
+        stub.CreatePost(Post(title="Once"), metadata=key)
+        stub.CreatePost(Post(title="Twice"), metadata=((idempotency.METADATA_KEY, idempotency.new_key()),))
+        comment = stub.CreateComment(Comment(post_id="idem-1", text="Once"), metadata=key)
+        retried, call = stub.CreateComment.with_call(Comment(post_id="idem-1", text="Once"), metadata=key)
+
+        after = stub.GetStoreStats(StoreStatsRequest())
+        self.assertEqual((after.posts - before.posts, after.comments - before.comments), (2, 1))
+        self.assertEqual(retried, comment)
+        self.assertIn(replication.SEQ_METADATA_KEY, dict(call.trailing_metadata()))
+
+
+class _StatusError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+class _FakeCall:
+    # Stands in for a gRPC call: answers after a delay, or fails with a status code
+    def __init__(self, value=None, delay=0.0, code=None):
+        self.value, self.delay, self.code, self.cancelled = value, delay, code, False
+        self.ready_at = None
+
+    def _remaining(self):
+        # The delay runs from when the call is first waited on
+        if self.ready_at is None:
+            self.ready_at = time.monotonic() + self.delay
+        return max(self.ready_at - time.monotonic(), 0.0)
+
+    def result(self):
+        time.sleep(self._remaining())
+        if self.code is not None:
+            raise _StatusError(self.code)
+        return self.value
+
+    def add_done_callback(self, callback):
+        threading.Timer(self._remaining(), callback, (self,)).start()
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TestResilience(unittest.TestCase):
+    def run_calls(self, calls, options, tracker=None):
+        started = []
+
+        def start(timeout, copy):
+            call = calls[len(started)]
+            started.append((timeout, copy))
+            return call, call.result
+
+        return resilience.call(start, options, tracker), started
+
+    def test_retries_with_backoff_until_success(self):
+        calls = [_FakeCall(code=grpc.StatusCode.UNAVAILABLE), _FakeCall(code=grpc.StatusCode.UNAVAILABLE),
+                 _FakeCall("ok")]
+        options = resilience.CallOptions(timeout=5.0, retry=resilience.RetryPolicy(initial_backoff=0.001))
+
+        result, started = self.run_calls(calls, options)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(started), 3)
+        self.assertLess(started[2][0], started[0][0])
+
+    def test_non_retryable_and_exhausted_calls_raise(self):
+        options = resilience.CallOptions(timeout=5.0, retry=resilience.RetryPolicy(max_attempts=2, initial_backoff=0.001))
+        with self.assertRaises(grpc.RpcError) as raised:
+            self.run_calls([_FakeCall(code=grpc.StatusCode.NOT_FOUND)], options)
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.NOT_FOUND)
+        with self.assertRaises(grpc.RpcError):
+            self.run_calls([_FakeCall(code=grpc.StatusCode.UNAVAILABLE)] * 2, options)
+
+    def test_hedge_takes_the_faster_copy(self):
+        slow = _FakeCall("slow", delay=1.0)
+        options = resilience.CallOptions(timeout=5.0, hedge=resilience.HedgePolicy(default_delay=0.01))
+        start = time.perf_counter()
+
+        result, started = self.run_calls([slow, _FakeCall("fast")], options, resilience.LatencyTracker())
+
+        self.assertEqual(result, "fast")
+        self.assertEqual([copy for _, copy in started], [0, 1])
+        self.assertTrue(slow.cancelled)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_hedges_are_not_queued_behind_concurrent_calls(self):
+        options = resilience.CallOptions(timeout=5.0, hedge=resilience.HedgePolicy(default_delay=0.01))
+        start = time.perf_counter()
+
+        with futures.ThreadPoolExecutor(max_workers=64) as pool:
+            runs = [pool.submit(self.run_calls, [_FakeCall("slow", delay=1.0), _FakeCall("fast")], options,
+                                resilience.LatencyTracker()) for _ in range(64)]
+            results = [run.result()[0] for run in runs]
+
+        self.assertEqual(results, ["fast"] * 64)
+        self.assertLess(time.perf_counter() - start, 0.8)
+
+    def test_hedged_call_accepts_replies_that_are_not_futures(self):
+        options = resilience.CallOptions(timeout=5.0, hedge=resilience.HedgePolicy(default_delay=0.01))
+        merged = ["already", "merged"]
+
+        result = resilience.call(lambda timeout, copy: (merged, lambda: merged), options, resilience.LatencyTracker())
+
+        self.assertEqual(result, merged)
+
+    def test_hedge_delay_follows_recent_latency(self):
+        tracker = resilience.LatencyTracker()
+        policy = resilience.HedgePolicy(min_samples=10)
+        self.assertEqual(tracker.hedge_delay(policy), policy.default_delay)
+        for i in range(100):
+            tracker.record(i / 1000)
+        self.assertAlmostEqual(tracker.hedge_delay(policy), 0.095)
+
+
+class _UnbatchedServicer(RedditServicer):
+    # A server from before the batched comment streams
+    GetTopCommentsBatched = RedditServiceServicer.GetTopCommentsBatched
+
+
+class TestBatching(unittest.TestCase):
+    def start(self, servicer):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        return port
+
+    def test_batches_start_small_and_grow_to_the_byte_budget(self):
+        comments = [Comment(comment_id=str(i), text="x" * 100) for i in range(2000)]
+        batcher = batching.AdaptiveBatcher(first_batch=4, max_bytes=4096)
+
+        for batches in (list(batcher.pack(comments)), list(batcher.batches(comments))):
+            sizes = [len(batch.comments) for batch in batches]
+            self.assertEqual(sizes[:3], [4, 8, 16])
+            self.assertTrue(all(batch.ByteSize() <= 4096 + 200 for batch in batches))
+            self.assertEqual(list(batching.unpack(batches)), comments)
+
+    def test_slow_producer_is_flushed_within_the_latency_budget(self):
+        def slow_comments():
+            for i in range(3):
+                time.sleep(0.02)
+                yield Comment(comment_id=str(i))
+
+        batches = list(batching.AdaptiveBatcher(first_batch=100, latency_budget=0.01).batches(slow_comments()))
+        self.assertEqual([len(batch.comments) for batch in batches], [1, 1, 1])
+
+    def test_client_unpacks_batches_and_falls_back_when_unimplemented(self):
+        for servicer in (RedditServicer(), _UnbatchedServicer()):
+            port = self.start(servicer)
+            stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+            stub.CreatePost(Post(post_id="batch-1", title="Batched"))
+            request = TopCommentsRequest(post_id="batch-1", N=50)
+            client = RedditClient(port=port)
+
+            self.assertEqual(list(client._read_comments("GetTopComments", request)),
+                             list(stub.GetTopComments(request)))
+            self.assertEqual(client._batched_streams, not isinstance(servicer, _UnbatchedServicer))
+
+
+class TestTopCommentsViews(unittest.TestCase):
+    def test_views_match_on_demand_ranking_under_writes(self):
+        import random
+        rng = random.Random(7)
+        post_id = "views-1"
+        server.store_post(post_id, Post(post_id=post_id))
+        self.addCleanup(server.drop_posts, [post_id])
+        comment_ids = []
+
+        for step in range(1500):
+            if step < 200 or rng.random() < 0.2:
+                comment_id = f"{post_id}-{len(comment_ids)}"
+                server.store_comment(comment_id, Comment(comment_id=comment_id, post_id=post_id,
+                                                         score=rng.randint(-3, 3)))
+                comment_ids.append(comment_id)
+            else:
+                comment_id = rng.choice(comment_ids)
+                comment = server.comments[comment_id]
+                server.apply_vote(comment, rng.choice([VoteAction.UPVOTE, VoteAction.DOWNVOTE]))
+                server.comment_voted(comment_id, comment)
+            if step % 10 == 0:
+                n = rng.choice([1, 10, 100])
+                _, ranked = server.top_views.ranked(post_id, n, server.post_comments[post_id], server.comments)
+                expected = topn_cache.rank_comments(server.post_comments[post_id], server.comments, n)
+                self.assertEqual([comment_id for comment_id, _ in ranked],
+                                 [comment_id for _, comment_id, _ in expected])
+        self.assertGreater(server.top_views.hits, 0)
+
+    def test_pre_encoded_responses_match_messages(self):
+        stubs = []
+        for interceptors in ([], [topn_cache.PreEncodedInterceptor()]):
+            grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), interceptors=interceptors)
+            add_RedditServiceServicer_to_server(RedditServicer(), grpc_server)
+            port = grpc_server.add_insecure_port("localhost:0")
+            grpc_server.start()
+            self.addCleanup(grpc_server.stop, None)
+            stubs.append(RedditServiceStub(grpc.insecure_channel(f"localhost:{port}")))
+        stubs[0].CreatePost(Post(post_id="views-2", title="Hot"))
+        self.addCleanup(server.drop_posts, ["views-2"])
+        for i in range(40):
+            stubs[0].CreateComment(Comment(comment_id=f"views-2-{i}", post_id="views-2", score=i % 7, text="text"))
+        request = TopCommentsRequest(post_id="views-2", N=30)
+
+        plain, encoded = (list(stub.GetTopComments(request)) for stub in stubs)
+        encoded_again = list(stubs[1].GetTopComments(request))
+        batched = [c for batch in stubs[1].GetTopCommentsBatched(request) for c in batch.comments]
+
+        self.assertEqual(len(plain), 30)
+        self.assertEqual([c.score for c in plain], sorted((c.score for c in plain), reverse=True))
+        self.assertEqual(encoded, plain)
+        self.assertEqual(encoded_again, plain)
+        self.assertEqual(batched, plain)
+
+
+class TestModeration(unittest.TestCase):
+    def test_hidden_content_is_skipped_and_locked_posts_reject_writes(self):
+        grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(RedditServicer(), grpc_server)
+        port = grpc_server.add_insecure_port("localhost:0")
+        grpc_server.start()
+        self.addCleanup(grpc_server.stop, None)
+        stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+        stub.CreatePost(Post(post_id="mod-1", title="Moderated", subreddit=Subreddit(subreddit_id="mod-r")))
+        self.addCleanup(server.drop_posts, ["mod-1"])
+        self.addCleanup(server.visibility.subreddit_hidden, "mod-r", False)
+        for i in range(20):
+            stub.CreateComment(Comment(comment_id=f"mod-1-{i}", post_id="mod-1", score=i, hidden=i % 5 == 0))
+        request = TopCommentsRequest(post_id="mod-1", N=10)
+
+        def top_ids():
+            return [c.comment_id for c in stub.GetTopComments(request)]
+
+        self.assertEqual(top_ids(), [f"mod-1-{i}" for i in (19, 18, 17, 16, 14, 13, 12, 11, 9, 8)])
+        stub.SetModerationState(ModerationRequest(post_id="mod-1", comment_id="mod-1-19", hidden=True))
+        self.assertEqual(top_ids()[:2], ["mod-1-18", "mod-1-17"])
+        stub.SetModerationState(ModerationRequest(post_id="mod-1", comment_id="mod-1-15", hidden=False))
+        self.assertEqual(top_ids()[:3], ["mod-1-18", "mod-1-17", "mod-1-16"])
+        self.assertIn("mod-1-15", top_ids())
+        hidden = server.visibility.hidden_in("mod-1")
+        self.assertEqual(sorted(i for i in range(20) if i in hidden), [0, 5, 10, 19])
+        self.assertEqual([c.comment_id for c in batching.unpack(stub.GetTopCommentsBatched(request))], top_ids())
+
+        summary = stub.SetModerationState(ModerationRequest(post_id="mod-1", state=LOCKED))
+        self.assertGreaterEqual(summary.locked_posts, 1)
+        for call in (lambda: stub.CreateComment(Comment(post_id="mod-1", text="Late")),
+                     lambda: stub.VotePost(VoteRequest(post_id="mod-1", action=VoteAction.UPVOTE))):
+            with self.assertRaises(grpc.RpcError) as raised:
+                call()
+            self.assertEqual(raised.exception.code(), grpc.StatusCode.FAILED_PRECONDITION)
+        self.assertEqual(len(top_ids()), 10)
+
+        stub.SetModerationState(ModerationRequest(subreddit_id="mod-r", hidden=True))
+        with self.assertRaises(grpc.RpcError) as raised:
+            stub.GetPostContent(Post(post_id="mod-1"))
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.NOT_FOUND)
+        stub.SetModerationState(ModerationRequest(subreddit_id="mod-r", hidden=False))
+        stub.SetModerationState(ModerationRequest(post_id="mod-1", state=HIDDEN))
+        with self.assertRaises(grpc.RpcError) as raised:
+            list(stub.GetTopComments(request))
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.NOT_FOUND)
+        stub.SetModerationState(ModerationRequest(post_id="mod-1", state=NORMAL))
+        self.assertEqual(stub.GetPostContent(Post(post_id="mod-1")).title, "Moderated")
+        stub.VotePost(VoteRequest(post_id="mod-1", action=VoteAction.UPVOTE))
+
+    def test_index_survives_bulk_import_and_snapshots(self):
+        records = [StoreRecord(post=Post(post_id="a", state=LOCKED)), StoreRecord(post=Post(post_id="b", state=HIDDEN))]
+        records += [StoreRecord(comment=Comment(comment_id=str(i), post_id="a", hidden=i in (3, 11)))
+                    for i in range(12)]
+        posts, comments, post_comments = {}, {}, {}
+        index = moderation.ModerationIndex()
+        bulk_io.load_records(records, posts, comments, post_comments, moderation=index)
+        index.subreddit_hidden("r", True)
+
+        rebuilt = moderation.ModerationIndex()
+        rebuilt.rebuild(posts, comments, post_comments)
+        rebuilt.subreddit_hidden("r", True)
+        self.assertEqual(rebuilt.entries(), index.entries())
+        self.assertEqual((index.summary().locked_posts, index.summary().hidden_comments), (1, 2))
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "snapshot.bin")
+        snapshot.write_snapshot(path, posts, comments, post_comments, index)
+        restored = moderation.ModerationIndex()
+        restored.restore(snapshot.read_section(path, snapshot.MODERATION).items())
+        self.assertEqual(restored.entries(), index.entries())
+        self.assertTrue(restored.is_locked("a"))
+        self.assertFalse(restored.is_visible("b", posts["b"]))
+        self.assertEqual(sorted(i for i in range(12) if i in restored.hidden_in("a")), [3, 11])
+
+    def test_reimported_comments_are_reindexed(self):
+        servicer = RedditServicer()
+        server.store_post("mod-2", Post(post_id="mod-2", title="Reimported"))
+        self.addCleanup(server.drop_posts, ["mod-2"])
+        for i in range(4):
+            server.store_comment(f"mod-2-{i}", Comment(comment_id=f"mod-2-{i}", post_id="mod-2", author="old"))
+        records = [StoreRecord(comment=Comment(comment_id="mod-2-2", post_id="mod-2", author="new", hidden=True)),
+                   StoreRecord(comment=Comment(comment_id="mod-2-4", post_id="mod-2", author="old")),
+                   StoreRecord(comment=Comment(comment_id="mod-2-4", post_id="mod-2", author="old", hidden=True))]
+
+        servicer.ImportStore(iter(records), Mock())
+
+        self.assertEqual(server.post_comments["mod-2"], [f"mod-2-{i}" for i in range(5)])
+        self.assertEqual(sorted(i for i in range(5) if i in server.visibility.hidden_in("mod-2")), [2, 4])
+        self.assertIn("mod-2-2", [entity_id for _, _, entity_id in server.authors.recent("new")])
+        self.assertNotIn("mod-2-2", [entity_id for _, _, entity_id in server.authors.recent("old")])
+        self.assertEqual(server.positions.position("mod-2", "mod-2-4", server.post_comments), 4)
+
+
+class TestUserActivity(unittest.TestCase):
+    def test_pages_are_most_recent_first_and_skip_hidden(self):
+        grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(RedditServicer(), grpc_server)
+        port = grpc_server.add_insecure_port("localhost:0")
+        grpc_server.start()
+        self.addCleanup(grpc_server.stop, None)
+        stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+        self.addCleanup(server.drop_posts, ["act-1", "act-2"])
+        stub.CreatePost(Post(post_id="act-1", author="act-u", publication_date="2023-12-01T10:00:00Z"))
+        stub.CreatePost(Post(post_id="act-2", author="act-v", publication_date="2023-12-02T10:00:00Z"))
+        # Created out of time order, two in the same second, one hidden
+        for comment_id, date, hidden in (("act-c1", "2023-12-03T10:00:00Z", False),
+                                         ("act-c2", "2023-12-01T09:00:00Z", False),
+                                         ("act-c3", "2023-12-05T10:00:00Z", True),
+                                         ("act-c4", "2023-12-04T10:00:00Z", False),
+                                         ("act-c5", "2023-12-04T10:00:00Z", False)):
+            stub.CreateComment(Comment(comment_id=comment_id, post_id="act-2", author="act-u", publication_date=date,
+                                       hidden=hidden))
+
+        pages, cursor = [], ""
+        while True:
+            page = list(stub.GetUserActivity(ActivityRequest(author="act-u", limit=2, cursor=cursor)))
+            pages.append([item.post.post_id or item.comment.comment_id for item in page])
+            if len(page) < 2:
+                break
+            cursor = page[-1].cursor
+        self.assertEqual(pages, [["act-c5", "act-c4"], ["act-c1", "act-1"], ["act-c2"]])
+
+        stub.DropPosts(PostIds(post_ids=["act-2"]))
+        remaining = list(stub.GetUserActivity(ActivityRequest(author="act-u")))
+        self.assertEqual([item.post.post_id for item in remaining], ["act-1"])
+        self.assertEqual(len(server.authors.recent("act-u")), 1)
+        with self.assertRaises(grpc.RpcError) as raised:
+            list(stub.GetUserActivity(ActivityRequest(author="act-u", cursor="not a cursor")))
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+
+    def test_cursors_continue_on_any_replica(self):
+        entities = [(str(i), f"2023-12-0{i % 3 + 1}T00:00:00Z") for i in range(12)]
+        entities.append(("undated", ""))
+        # Replicas index the same entities in different orders and at different times
+        replicas = [activity.AuthorIndex(), activity.AuthorIndex()]
+        for comment_id, date in entities:
+            replicas[0].comment_added(comment_id, Comment(author="u", publication_date=date))
+        for comment_id, date in reversed(entities):
+            replicas[1].comment_added(comment_id, Comment(author="u", publication_date=date))
+
+        seen, cursor = [], None
+        for page in range(5):
+            entries = replicas[page % 2].recent("u", cursor, 3)
+            seen += [entity_id for _, _, entity_id in entries]
+            if entries:
+                cursor = activity.parse_cursor(activity.format_cursor(entries[-1][0]))
+
+        self.assertEqual(sorted(seen), sorted(comment_id for comment_id, _ in entities))
+        self.assertEqual(seen[-1], "undated")
+
+    def test_activity_survives_snapshots(self):
+        index = activity.AuthorIndex()
+        for i in range(5):
+            index.comment_added(str(i), Comment(author="u", publication_date=f"2023-12-0{i + 1}T00:00:00Z"))
+        index.post_added("p", Post(author="w"))
+        index.remove([("u", activity.COMMENT, "2")])
+        expected = index.recent("u")
+        self.assertEqual([entity_id for _, _, entity_id in expected], ["4", "3", "1", "0"])
+        self.assertEqual(index.recent("u", expected[1][0], 10), expected[2:])
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "snapshot.bin")
+        snapshot.write_snapshot(path, {}, {}, {}, authors=index)
+        restored = activity.AuthorIndex()
+        restored.load(snapshot.load_section(path, snapshot.AUTHORS, activity.decode), 5)
+        self.assertEqual(restored.recent("u"), expected)
+        self.assertEqual(restored.recent("w"), index.recent("w"))
+        restored.comment_added("5", Comment(author="u", publication_date="2023-12-01T00:00:00Z"))
+        self.assertEqual([entity_id for _, _, entity_id in restored.recent("u")], ["4", "3", "1", "5", "0"])
+
+
+class TestTiering(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    @staticmethod
+    def spill_all(tier):
+        tier.budget_bytes = 0
+        tier.maintain()
+        tier.budget_bytes = None
+
+    def test_spilled_posts_fault_back_in_on_reads_and_writes(self):
+        grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(RedditServicer(), grpc_server)
+        port = grpc_server.add_insecure_port("localhost:0")
+        grpc_server.start()
+        self.addCleanup(grpc_server.stop, None)
+        stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+        self.addCleanup(server.drop_posts, ["tier-1", "tier-2"])
+        for post_id in ("tier-1", "tier-2"):
+            stub.CreatePost(Post(post_id=post_id, title=post_id))
+            for i in range(5):
+                stub.CreateComment(Comment(comment_id=f"{post_id}-c{i}", post_id=post_id, score=i))
+        posts_before, comments_before = len(server.posts), len(server.comments)
+
+        tier = server.enable_tiering(self.directory, None)
+        self.addCleanup(server.disable_tiering)
+        self.spill_all(tier)
+        self.assertNotIn("tier-1", server.posts._hot)
+        self.assertNotIn("tier-1-c0", server.comments._hot)
+        # Spilled entries still count and are still found
+        self.assertEqual((len(server.posts), len(server.comments)), (posts_before, comments_before))
+        self.assertIn("tier-2-c3", server.comments)
+
+        top = list(stub.GetTopComments(TopCommentsRequest(post_id="tier-1", N=2)))
+        self.assertEqual([c.comment_id for c in top], ["tier-1-c4", "tier-1-c3"])
+        self.assertEqual(tier.faults, 1)
+        # Writes to a spilled post bring it back before changing it
+        stub.VoteComment(VoteRequest(comment_id="tier-2-c0", action=VoteAction.UPVOTE))
+        stub.CreateComment(Comment(comment_id="tier-2-c5", post_id="tier-2", score=9))
+        self.assertEqual(tier.faults, 2)
+        self.assertEqual(server.post_comments["tier-2"][-2:], ["tier-2-c4", "tier-2-c5"])
+
+        self.spill_all(tier)
+        self.assertEqual(server.comments["tier-2-c0"].score, 1)
+        self.assertEqual(stub.GetPostContent(Post(post_id="tier-2")).title, "tier-2")
+        exported = {record.comment.comment_id for record in bulk_io.iter_store(server.posts, server.comments)
+                    if record.HasField("comment")}
+        self.assertTrue({"tier-1-c0", "tier-2-c5"} <= exported)
+        self.assertNotIn("tier-1", server.posts._hot)
+
+    def test_bulk_import_stays_under_the_budget(self):
+        tier = tiering.ColdTier(self.directory, 50_000)
+        posts, comments, post_comments = tier.wrap({}, {}, {})
+        peak = []
+        original_maintain = tier.maintain
+
+        def maintain():
+            spilled = original_maintain()
+            peak.append(tier.resident_bytes)
+            return spilled
+
+        tier.maintain = maintain
+        records = [StoreRecord(post=Post(post_id=str(p), title="x" * 200)) for p in range(20_000)]
+
+        bulk_io.load_records(records, posts, comments, post_comments, tier=tier)
+
+        self.assertTrue(peak)
+        self.assertLessEqual(max(peak), 50_000)
+        self.assertEqual(len(posts), 20_000)
+        self.assertEqual(posts["7"].title, "x" * 200)
+
+    def test_misses_and_faults_do_not_wait_on_the_tier_lock(self):
+        tier = tiering.ColdTier(self.directory, None)
+        posts, comments, post_comments = tier.wrap({}, {}, {})
+        posts["1"] = Post(title="cold")
+        self.spill_all(tier)
+
+        with tier._lock:
+            # Held by, say, a long spill: lookups of keys that were never stored still answer
+            self.assertIsNone(posts.get("missing"))
+            self.assertIsNone(comments.get("missing"))
+        self.assertEqual(posts.get("1").title, "cold")
+        self.assertEqual((tier.faults, len(tier._faulting)), (1, 0))
+
+    def test_budget_spills_least_recently_used_and_compacts_segments(self):
+        tier = tiering.ColdTier(self.directory, 4000, segment_bytes=2000)
+        posts, comments, post_comments = tier.wrap({}, {}, {})
+        for p in range(20):
+            posts[str(p)] = Post(title="x" * 100)
+            for c in range(3):
+                comments[f"{p}-{c}"] = Comment(post_id=str(p), text="y" * 100)
+                post_comments.setdefault(str(p), []).append(f"{p}-{c}")
+            posts.get("0")
+            tier.maintain()
+        self.assertLessEqual(tier.resident_bytes, 4000)
+        self.assertIn("0", posts._hot)
+        self.assertNotIn("1", posts._hot)
+        self.assertEqual(len(comments), 60)
+
+        # Faulting most posts back in leaves sparse segments, which are compacted away
+        for p in range(1, 15):
+            self.assertEqual(post_comments[str(p)], [f"{p}-{c}" for c in range(3)])
+        tier.budget_bytes = 100_000
+        tier.maintain()
+        tier.budget_bytes = 0
+        tier.maintain()
+        self.assertFalse(posts._hot)
+        self.assertEqual(tier.segments.sparse_segments(), [])
+        self.assertEqual(sorted(dict(posts.items())), sorted(str(p) for p in range(20)))
+        self.assertEqual(comments["7-2"].text, "y" * 100)
+        del posts["7"]
+        self.assertNotIn("7", posts)
+        self.assertEqual(len(posts), 19)
+        stores = tier.unwrap()
+        self.assertEqual(len(stores[1]), 60)
+        self.assertFalse(os.listdir(self.directory))
+
+    def test_idle_posts_are_spilled(self):
+        now = [0.0]
+        tier = tiering.ColdTier(self.directory, None, max_idle=60, clock=lambda: now[0])
+        posts, _, _ = tier.wrap({"old": Post(), "new": Post()}, {}, {})
+        now[0] = 50
+        posts.get("new")
+        now[0] = 100
+        self.assertEqual(tier.maintain(), 1)
+        self.assertEqual(list(posts._hot), ["new"])
+
+
+class TestMicrobench(unittest.TestCase):
+    def test_cases_run_in_process_and_leave_the_stores_as_they_were(self):
+        posts_before = len(server.posts)
+        results = microbench.run("servicer.Get[PT]*", scale=50, backends=(), rounds=2, min_round_time=0.001)
+        self.assertEqual(sorted(results["cases"]), ["servicer.GetPostContent", "servicer.GetTopComments.ranked",
+                                                    "servicer.GetTopComments.view", "servicer.GetTopCommentsBatched",
+                                                    "servicer.GetTrendingPosts"])
+        self.assertTrue(all(case["min_ns"] > 0 for case in results["cases"].values()))
+        self.assertEqual(len(server.posts), posts_before)
+
+        context = microbench.StubContext()
+        with self.assertRaises(grpc.RpcError):
+            context.abort(grpc.StatusCode.NOT_FOUND, "Post not found")
+        self.assertEqual(context.code, grpc.StatusCode.NOT_FOUND)
+
+    def test_compare_flags_cases_slower_than_their_threshold(self):
+        def results(**cases):
+            return {"cases": {name: {"min_ns": ns, "median_ns": ns} for name, ns in cases.items()}}
+
+        baseline = results(a=100.0, b=100.0, c=100.0, gone=5.0)
+        rows = microbench.compare(results(a=105.0, b=130.0, c=130.0, new=1.0), baseline, threshold=0.1,
+                                  case_thresholds={"c": 0.5})
+        self.assertEqual([(name, regressed) for name, *_, regressed in rows], [("b", True), ("c", False), ("a", False)])
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "baseline.json")
+        arguments = ["--filter", "servicer.GetPostContent", "--backends", "", "--rounds", "1",
+                     "--min-round-time", "0.001", "--baseline", path]
+        microbench.write_results(results(**{"servicer.GetPostContent": 1e9}), path)
+        self.assertEqual(microbench.main(arguments), 0)
+        microbench.write_results(results(**{"servicer.GetPostContent": 1.0}), path)
+        self.assertEqual(microbench.main(arguments), 1)
+        # Cases of the baseline that the filter selects but the run lacks fail it too
+        baseline["cases"]["serialization[upb].post.encode"] = baseline["cases"]["serialization[cpp].a"] = {}
+        self.assertEqual(microbench.missing_cases(results(a=1.0), baseline, None, ("upb",)),
+                         ["b", "c", "gone", "serialization[upb].post.encode"])
+        self.assertEqual(microbench.missing_cases(results(a=1.0), baseline, "serialization.*", ("upb",)),
+                         ["serialization[upb].post.encode"])
+        microbench.write_results(results(**{"servicer.GetPostContent": 1e9, "servicer.GetPostRemoved": 1e9}), path)
+        self.assertEqual(microbench.main(arguments[:1] + ["servicer.GetPost*"] + arguments[2:]), 1)
+
+        # A worker that crashes fails the run with its stderr, rather than looking like a missing backend
+        with self.assertRaisesRegex(RuntimeError, "KeyError"):
+            microbench.run_serialization(["serialization.no-such-case"], "python", rounds=1, min_round_time=0.001)
+
+
+class TestTrending(unittest.TestCase):
+    def test_votes_expire_bucket_by_bucket_from_each_window(self):
+        now = [1_000_000.0]
+        index = trending.TrendingIndex(clock=lambda: now[0])
+        for post_id, upvotes in (("a", 3), ("b", 5), ("c", 3)):
+            for _ in range(upvotes):
+                index.vote(post_id, 1)
+        index.vote("c", -1)
+        index.vote("d", -1)
+        self.assertEqual(index.top(FIVE_MINUTES, 10), [("b", 5), ("a", 3), ("c", 2)])
+        self.assertEqual(index.top(FIVE_MINUTES, 2, accept=lambda post_id: post_id != "b"), [("a", 3), ("c", 2)])
+
+        now[0] += 240
+        index.vote("a", 1)
+        now[0] += 90
+        # The first votes are over five minutes old; a's latest one isn't
+        self.assertEqual(index.top(FIVE_MINUTES, 10), [("a", 1)])
+        self.assertEqual(index.top(ONE_HOUR, 10), [("b", 5), ("a", 4), ("c", 2)])
+        now[0] += 3600
+        self.assertEqual(index.top(ONE_HOUR, 10), [])
+        self.assertEqual(index.votes("a", ONE_DAY), 4)
+        index.remove("b")
+        self.assertEqual(index.top(ONE_DAY, 10), [("a", 4), ("c", 2)])
+        now[0] += 86400
+        self.assertEqual(index.top(ONE_DAY, 10), [])
+        # Posts whose votes have all expired hold no counters
+        self.assertEqual(index.size()[0], 0)
+
+    def test_trending_posts_rpc_skips_hidden_posts(self):
+        grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(RedditServicer(), grpc_server)
+        port = grpc_server.add_insecure_port("localhost:0")
+        grpc_server.start()
+        self.addCleanup(grpc_server.stop, None)
+        stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+        self.addCleanup(server.drop_posts, ["trend-1", "trend-2", "trend-3"])
+        for post_id, votes in (("trend-1", 30), ("trend-2", 40), ("trend-3", 35)):
+            stub.CreatePost(Post(post_id=post_id, title=post_id))
+            for _ in range(votes):
+                stub.VotePost(VoteRequest(post_id=post_id, action=VoteAction.UPVOTE))
+        stub.VotePost(VoteRequest(post_id="trend-1", action=VoteAction.DOWNVOTE))
+        stub.SetModerationState(ModerationRequest(post_id="trend-2", state=HIDDEN))
+
+        top = list(stub.GetTrendingPosts(TrendingRequest(window=ONE_HOUR, limit=2)))
+        self.assertEqual([(item.post.post_id, item.votes) for item in top], [("trend-3", 35), ("trend-1", 29)])
+        self.assertEqual(top[0].window, ONE_HOUR)
+        stub.DropPosts(PostIds(post_ids=["trend-3"]))
+        top = list(stub.GetTrendingPosts(TrendingRequest(window=FIVE_MINUTES)))
+        self.assertEqual([item.post.post_id for item in top if item.post.post_id.startswith("trend-")], ["trend-1"])
+        with self.assertRaises(grpc.RpcError) as raised:
+            list(stub.GetTrendingPosts(TrendingRequest(window=7)))
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+
+
+class TestIntrospection(unittest.TestCase):
+    def test_accountant_tracks_writes_and_drops(self):
+        accountant = introspection.StoreAccountant(top_posts=2)
+        posts = {}
+        for post_id in ("a", "b", "c"):
+            posts[post_id] = Post(post_id=post_id, title="x" * 100)
+            accountant.post_added(post_id, posts[post_id])
+        for i, post_id in enumerate("abbccc"):
+            accountant.comment_added(str(i), Comment(post_id=post_id))
+            accountant.index_grew(post_id, 1, "abbccc"[:i + 1].count(post_id))
+
+        structures = {name: (entries, size) for name, entries, size in accountant.structures(posts, {})}
+        self.assertEqual(structures["posts"][0], 3)
+        self.assertGreater(structures["posts"][1], 300)
+        self.assertEqual(structures["comments"][0], 6)
+        self.assertEqual(structures["post_comments"][0], 3)
+        stats = accountant.stats(posts, {})
+        self.assertEqual([(p.post_id, p.comments) for p in stats.largest_posts], [("c", 3), ("b", 2)])
+
+        accountant.post_removed("c", posts.pop("c"))
+        accountant.index_removed("c", 3)
+        stats = accountant.stats(posts, {})
+        self.assertEqual(stats.structures[0].entries, 2)
+        self.assertLess(stats.total_bytes_delta, 0)
+        self.assertEqual([p.post_id for p in stats.largest_posts], ["b"])
+
+    def test_seed_finds_largest_posts_of_a_snapshot_without_decoding(self):
+        post_comments = {str(i): [f"{i}-{j}" for j in range(i)] for i in range(10)}
+        comments = {comment_id: Comment(comment_id=comment_id) for ids in post_comments.values() for comment_id in ids}
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "snapshot.bin")
+        snapshot.write_snapshot(path, {str(i): Post(post_id=str(i)) for i in range(10)}, comments, post_comments)
+        posts, comments, post_comments = snapshot.load_snapshot(path)
+        post_comments["9"] = post_comments["9"] + ["9-extra"]
+
+        accountant = introspection.StoreAccountant(top_posts=3)
+        accountant.seed(posts, comments, post_comments, index_sizes=snapshot.index_sizes(post_comments))
+
+        stats = accountant.stats(posts, comments)
+        self.assertEqual([(p.post_id, p.comments) for p in stats.largest_posts], [("9", 10), ("8", 8), ("7", 7)])
+        self.assertEqual(post_comments.resident, 1)
+
+    def test_store_stats_rpc_reports_growth(self):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        add_RedditServiceServicer_to_server(RedditServicer(), server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+
+        before = stub.GetStoreStats(StoreStatsRequest())
+        stub.CreatePost(Post(post_id="stats-1", title="Large"))
+        for i in range(30):
+            stub.CreateComment(Comment(comment_id=f"stats-c{i}", post_id="stats-1", text="comment"))
+        after = stub.GetStoreStats(StoreStatsRequest(top_posts=1))
+
+        self.assertEqual((after.posts - before.posts, after.comments - before.comments), (1, 30))
+        self.assertGreater(after.total_bytes_delta, 0)
+        self.assertEqual([(p.post_id, p.comments) for p in after.largest_posts], [("stats-1", 30)])
+        growth = {s.name: s.bytes_delta for s in after.structures}
+        self.assertGreater(growth["comments"], growth["posts"])
+
+        stub.DropPosts(PostIds(post_ids=["stats-1"]))
+        dropped = stub.GetStoreStats(StoreStatsRequest())
+        self.assertEqual(dropped.comments, before.comments)
+        self.assertNotIn("stats-1", [p.post_id for p in dropped.largest_posts])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,696 @@
+# Author - Akshita Patil
+
+import collections
+import glob
+import os
+import sys
+import threading
+import time
+from collections.abc import MutableMapping
+
+from google.protobuf.internal.decoder import _DecodeVarint32
+from google.protobuf.internal.encoder import _VarintBytes
+
+from data_model_pb2 import Post, Comment
+import introspection
+
+"""
+    Hot/cold tiering of posts, spilling inactive posts to on-disk segments.
+
+    A post and its comment subtree (its comments and its entry in the comment index) move
+    between tiers together. Resident posts are kept in order of last access. Two things
+    send the least recently used posts to the current segment file and drop them from
+    memory: the estimated resident bytes going over the memory budget, or a post staying
+    idle for longer than max_idle. A spilled post leaves behind only its segment location,
+    plus one comment ID -> post ID entry for each of its comments.
+
+    The stores are wrapped in TieredStore mappings. The first lookup of a spilled post, of
+    one of its comments or of its index entry faults the whole post back in, so the read
+    paths (GetPostContent, GetTopComments, ExpandCommentBranch) and the writes need no
+    changes. Segments are append-only. Once most of a segment's posts have been faulted
+    back in, the remaining ones are copied forward and the file is deleted.
+
+    Spilling must not race with writes that mutate entities in place, such as votes. So
+    maintain() runs with the server's write lock held: after each write, every few
+    thousand records of a bulk import, and periodically from a sweeper. A burst of faults
+    during reads can hold memory above the budget until the next sweep.
+
+    Lookups of keys that were never stored miss without taking the tier lock: a post is
+    always either in the hot stores or marked spilled, and a counter of moves between the
+    tiers tells a miss from a post caught mid-move. A fault reads its segment outside the
+    lock; a latch per post makes concurrent faults of the same post wait for the first
+    one, so faults of different posts don't serialize on disk reads.
+    """
+
+POSTS = 0
+COMMENTS = 1
+INDEX = 2
+
+# Size of a segment file before a new one is started
+SEGMENT_BYTES = 64 << 20
+# Eviction brings resident bytes down to this fraction of the budget, so writes near the
+# budget don't spill a post each
+LOW_WATERMARK = 0.9
+# Segments whose live bytes fall below this fraction are compacted
+COMPACT_BELOW = 0.25
+
+# In-memory cost of an entity beyond its serialized bytes: the message object and its ID
+_ENTITY_OVERHEAD = introspection.MESSAGE_OVERHEAD + sys.getsizeof("")
+# Per spilled post: its location tuple and dict slot; per spilled comment: a dict slot
+_SPILLED_POST_BYTES = sys.getsizeof((0, 0, 0, True)) + 3 * 8
+_SPILLED_COMMENT_BYTES = 3 * 8
+# Per resident post: its [bytes, last access] entry in the LRU order
+_RESIDENT_POST_BYTES = sys.getsizeof([0, 0.0]) + 4 * 8
+
+
+def _encode(post, comment_ids, comments):
+    # varint-prefixed post, index flag and size, then each comment ID and comment; a comment
+    # missing from the store has length 0, stored comments have their length + 1
+    data = post.SerializeToString()
+    parts = [_VarintBytes(len(data)), data, _VarintBytes(0 if comment_ids is None else len(comment_ids) + 1)]
+    for comment_id, comment in comments:
+        encoded_id = comment_id.encode("utf-8")
+        parts += (_VarintBytes(len(encoded_id)), encoded_id)
+        if comment is None:
+            parts.append(b"\x00")
+        else:
+            data = comment.SerializeToString()
+            parts += (_VarintBytes(len(data) + 1), data)
+    return b"".join(parts)
+
+
+def _decode(data):
+    # Returns (post, comment IDs or None, [(comment ID, comment or None)])
+    length, position = _DecodeVarint32(data, 0)
+    post = Post.FromString(data[position:position + length])
+    position += length
+    count, position = _DecodeVarint32(data, position)
+    comments = []
+    for _ in range(count - 1):
+        length, position = _DecodeVarint32(data, position)
+        comment_id = data[position:position + length].decode("utf-8")
+        position += length
+        length, position = _DecodeVarint32(data, position)
+        comment = Comment.FromString(data[position:position + length - 1]) if length else None
+        position += max(length - 1, 0)
+        comments.append((comment_id, comment))
+    return post, [comment_id for comment_id, _ in comments] if count else None, comments
+
+
+class SegmentStore:
+    """
+        Append-only segment files of serialized records.
+
+        A record is addressed by (segment, offset, length). Records are released once they
+        are read back into memory; a segment is deleted when none of its records is live.
+
+        Args:
+            directory (str): Directory for the segment files; stale segments are removed.
+            segment_bytes (int): Size of a segment before a new one is started.
+        """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(directory, "segment-*.dat")):
+            os.remove(stale)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._fds = {}
+        self._sizes = {}
+        self._live = {}
+        self._next = 0
+        self.active = None
+        self._roll()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.dat")
+
+    def _roll(self):
+        previous = self.active
+        self.active = self._next
+        self._next += 1
+        self._fds[self.active] = os.open(self._path(self.active), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        self._sizes[self.active] = self._live[self.active] = 0
+        if previous is not None and not self._live[previous]:
+            self._delete(previous)
+
+    def _delete(self, segment):
+        os.close(self._fds.pop(segment))
+        os.remove(self._path(segment))
+        del self._sizes[segment], self._live[segment]
+
+    def append(self, data):
+        """Writes a record; returns its (segment, offset, length)."""
+        if self._sizes[self.active] and self._sizes[self.active] + len(data) > self.segment_bytes:
+            self._roll()
+        segment = self.active
+        offset = self._sizes[segment]
+        os.pwrite(self._fds[segment], data, offset)
+        self._sizes[segment] += len(data)
+        self._live[segment] += len(data)
+        return segment, offset, len(data)
+
+    def read(self, location):
+        segment, offset, length = location[:3]
+        return os.pread(self._fds[segment], length, offset)
+
+    def release(self, location):
+        """Marks a record dead, deleting its segment if nothing in it is live any more."""
+        segment, _, length = location[:3]
+        self._live[segment] -= length
+        if not self._live[segment] and segment != self.active:
+            self._delete(segment)
+
+    def sparse_segments(self, below=COMPACT_BELOW):
+        """Full segments whose live bytes are under a fraction of their size."""
+        return [segment for segment, size in self._sizes.items()
+                if segment != self.active and self._live[segment] < below * size]
+
+    def disk_bytes(self):
+        return sum(self._sizes.values())
+
+    def reset(self):
+        """Deletes every segment and starts an empty one."""
+        self.close()
+        self.active = None
+        self._roll()
+
+    def close(self):
+        """Deletes every segment."""
+        for segment in list(self._fds):
+            self._delete(segment)
+
+
+class ColdTier:
+    """
+        Residency of posts and their comment subtrees, with cold posts spilled to disk.
+
+        Args:
+            directory (str): Directory for the segment files.
+            budget_bytes (int): Estimated bytes of resident posts and comments to stay under;
+                None for no budget.
+            max_idle (float): Seconds without access after which a post is spilled
+                regardless of the budget; None to spill only over budget.
+            segment_bytes (int): Size of a segment file.
+            clock (callable): Source of access times, in seconds.
+        """
+
+    def __init__(self, directory, budget_bytes, max_idle=None, segment_bytes=SEGMENT_BYTES, clock=time.monotonic):
+        self.segments = SegmentStore(directory, segment_bytes)
+        self.budget_bytes = budget_bytes
+        self.max_idle = max_idle
+        self._clock = clock
+        self._lock = threading.Lock()
+        # post ID -> [estimated bytes, last access], least recently used first
+        self._resident = collections.OrderedDict()
+        self.resident_bytes = 0
+        # post ID -> (segment, offset, length, has index entry)
+        self._spilled = {}
+        self._spilled_indexes = 0
+        self._segment_posts = collections.defaultdict(set)
+        self._cold_comments = {}
+        # post ID -> Event set once the post is back in memory, for posts being read from disk
+        self._faulting = {}
+        # Bumped before and after every spill and fault-in, so lock-free misses can tell
+        # whether a post moved between tiers while they looked
+        self._moves = 0
+        # Running estimate of a comment's resident bytes, for posts whose comments weren't seen written
+        self._comment_bytes = _ENTITY_OVERHEAD + 64
+        # Called with the ID of each spilled post, e.g. to drop caches that reference its comments
+        self.on_spill = []
+        self.faults = 0
+        self.fault_seconds = 0.0
+        self.spills = 0
+        self._stores = None
+
+    def wrap(self, posts, comments, post_comments):
+        """
+            Puts stores under the tier.
+
+            Posts already in a plain dict are resident from the start; posts of a lazily
+            loaded store become resident when they are first accessed.
+
+            Returns:
+                tuple: TieredStore views (posts, comments, post_comments) to use in their place.
+            """
+        self._stores = (posts, comments, post_comments)
+        if isinstance(posts, dict):
+            for post_id, post in list(posts.items()):
+                self._register(post_id, post)
+        return tuple(TieredStore(self, store, kind) for kind, store in enumerate(self._stores))
+
+    def unwrap(self):
+        """Faults every spilled post back in and returns the plain (posts, comments, post_comments)."""
+        with self._lock:
+            spilled = list(self._spilled)
+        for post_id in spilled:
+            self._fault_in(post_id)
+        stores = self._stores
+        self.close()
+        return stores
+
+    def close(self):
+        with self._lock:
+            self.segments.close()
+            self._reset()
+
+    def _reset(self):
+        self._resident.clear()
+        self.resident_bytes = 0
+        self._spilled = {}
+        self._spilled_indexes = 0
+        self._segment_posts.clear()
+        self._cold_comments = {}
+
+    def clear(self):
+        """Drops every spilled post along with the hot stores, which are only cleared together."""
+        with self._lock:
+            for store in self._stores:
+                store.clear()
+            self.segments.reset()
+            self._reset()
+
+    def is_cold(self, kind, key):
+        if kind == COMMENTS:
+            return key in self._cold_comments
+        location = self._spilled.get(key)
+        return location is not None and (kind == POSTS or location[3])
+
+    def cold_count(self, kind):
+        return (len(self._spilled), len(self._cold_comments), self._spilled_indexes)[kind]
+
+    def cold_keys(self, kind):
+        with self._lock:
+            if kind == COMMENTS:
+                return list(self._cold_comments)
+            return [post_id for post_id, location in self._spilled.items() if kind == POSTS or location[3]]
+
+    def cold_items(self, kind):
+        """Yields the spilled entries of one store, read from disk without faulting them in."""
+        with self._lock:
+            spilled = list(self._spilled.items())
+        for post_id, location in spilled:
+            with self._lock:
+                # Skip posts faulted in since; their segment may be gone
+                if self._spilled.get(post_id) is not location:
+                    continue
+                data = self.segments.read(location)
+            post, comment_ids, comments = _decode(data)
+            if kind == POSTS:
+                yield post_id, post
+            elif kind == INDEX:
+                if comment_ids is not None:
+                    yield post_id, comment_ids
+            else:
+                yield from ((comment_id, comment) for comment_id, comment in comments if comment is not None)
+
+    def fault(self, kind, key):
+        """
+            Returns an entry that missed in its hot store, faulting its post in from disk.
+
+            Raises:
+                KeyError: If the entry isn't spilled either.
+            """
+        hot = self._stores[kind]
+        while True:
+            moves = self._moves
+            post_id = self._cold_comments.get(key) if kind == COMMENTS else key
+            if post_id is not None and post_id in self._spilled:
+                value = self._fault_in(post_id, kind, key)
+                if value is not None:
+                    return value
+                # Faulted in by another thread, and possibly spilled again since
+                continue
+            value = hot.get(key)
+            if value is not None:
+                return value
+            # Neither resident nor spilled, and no post moved between tiers while we looked
+            if moves == self._moves and not moves & 1:
+                raise KeyError(key)
+            time.sleep(0)
+
+    def _fault_in(self, post_id, kind=POSTS, key=None):
+        # Reads a spilled post back into the hot stores and returns the entry (kind, key) of
+        # it. The segment is read outside the tier lock; a concurrent fault of the same post
+        # waits for this one and returns None.
+        with self._lock:
+            latch = self._faulting.get(post_id)
+            location = None
+            if latch is None:
+                location = self._spilled.get(post_id)
+                if location is None:
+                    return None
+                latch = self._faulting[post_id] = threading.Event()
+                # Compaction leaves the record alone, and it stays live until released below
+                self._segment_posts[location[0]].discard(post_id)
+        if location is None:
+            latch.wait()
+            return None
+
+        start = time.perf_counter()
+        try:
+            data = self.segments.read(location)
+            post, comment_ids, comments = _decode(data)
+        except BaseException:
+            with self._lock:
+                self._faulting.pop(post_id, None)
+                if self._spilled.get(post_id) is location:
+                    self._segment_posts[location[0]].add(post_id)
+            latch.set()
+            raise
+        value = None
+        with self._lock:
+            self._faulting.pop(post_id, None)
+            # Unless the tier was cleared while the segment was read
+            if self._spilled.get(post_id) is location:
+                self._install(post_id, location, data, post, comment_ids, comments)
+                self.faults += 1
+                self.fault_seconds += time.perf_counter() - start
+                value = self._stores[kind].get(post_id if key is None else key)
+        latch.set()
+        return value
+
+    def _install(self, post_id, location, data, post, comment_ids, comments):
+        # Entries go into the hot stores before they stop being marked spilled, so a reader
+        # always finds them in one or the other; _moves is odd while they move
+        self._moves += 1
+        posts, hot_comments, index = self._stores
+        # The post goes in last, so readers that find it also find its comments
+        for comment_id, comment in comments:
+            if comment is not None:
+                hot_comments[comment_id] = comment
+        if comment_ids is not None:
+            index[post_id] = comment_ids
+        posts[post_id] = post
+        del self._spilled[post_id]
+        for comment_id, comment in comments:
+            if comment is not None:
+                del self._cold_comments[comment_id]
+        if comment_ids is not None:
+            self._spilled_indexes -= 1
+        self.segments.release(location)
+        estimate = len(data) + (1 + len(comments)) * _ENTITY_OVERHEAD
+        self._resident[post_id] = [estimate, self._clock()]
+        self.resident_bytes += estimate
+        self._moves += 1
+
+    def touch(self, post_id, post):
+        """Records an access to a post, making it the most recently used."""
+        with self._lock:
+            entry = self._resident.get(post_id)
+            if entry is not None:
+                entry[1] = self._clock()
+                self._resident.move_to_end(post_id)
+                return
+        self._register(post_id, post)
+
+    def _register(self, post_id, post):
+        # Starts tracking a resident post that wasn't written or faulted in through the tier
+        with self._lock:
+            if post_id in self._resident or post_id in self._spilled:
+                return
+            index = self._stores[INDEX].get(post_id)
+            estimate = introspection.entity_bytes(post_id, post) + len(index or ()) * self._comment_bytes
+            self._resident[post_id] = [estimate, self._clock()]
+            self.resident_bytes += estimate
+
+    def write(self, kind, key, value):
+        """Stores an entry in its hot store, faulting in a spilled post it belongs to first."""
+        post_id = value.post_id if kind == COMMENTS else key
+        if post_id in self._spilled or (kind == COMMENTS and key in self._cold_comments):
+            for owner in (post_id, self._cold_comments.get(key) if kind == COMMENTS else None):
+                if owner is not None:
+                    self._fault_in(owner)
+        hot = self._stores[kind]
+        added = kind == COMMENTS and key not in hot
+        hot[key] = value
+        if kind == POSTS:
+            self.touch(key, value)
+        elif added:
+            size = introspection.entity_bytes(key, value)
+            with self._lock:
+                entry = self._resident.get(post_id)
+                if entry is not None:
+                    entry[0] += size
+                    self.resident_bytes += size
+
+    def delete(self, kind, key):
+        hot = self._stores[kind]
+        if key not in hot:
+            self.fault(kind, key)
+        value = hot.pop(key)
+        with self._lock:
+            if kind == POSTS:
+                entry = self._resident.pop(key, None)
+                if entry is not None:
+                    self.resident_bytes -= entry[0]
+            elif kind == COMMENTS:
+                entry = self._resident.get(value.post_id)
+                if entry is not None:
+                    size = min(entry[0], introspection.entity_bytes(key, value))
+                    entry[0] -= size
+                    self.resident_bytes -= size
+        return value
+
+    def maintain(self):
+        """
+            Spills least recently used posts until resident bytes are under the budget and
+            no resident post is idle, then compacts sparse segments. Call with the server's
+            write lock held.
+
+            Returns:
+                int: Posts spilled.
+            """
+        spilled = 0
+        with self._lock:
+            target = None
+            if self.budget_bytes is not None and self.resident_bytes > self.budget_bytes:
+                target = self.budget_bytes * LOW_WATERMARK
+            idle_before = None if self.max_idle is None else self._clock() - self.max_idle
+            while self._resident:
+                post_id, (_, last_access) = next(iter(self._resident.items()))
+                if not ((target is not None and self.resident_bytes > target)
+                        or (idle_before is not None and last_access < idle_before)):
+                    break
+                self._spill(post_id)
+                spilled += 1
+            if spilled:
+                self._compact()
+        return spilled
+
+    def _spill(self, post_id):
+        size, _ = self._resident.pop(post_id)
+        self.resident_bytes -= size
+        posts, comments, index = self._stores
+        post = posts.get(post_id)
+        if post is None:
+            return
+        self._moves += 1
+        comment_ids = index.get(post_id)
+        subtree = [(comment_id, comments.get(comment_id)) for comment_id in comment_ids or ()]
+        data = _encode(post, comment_ids, subtree)
+        location = self.segments.append(data) + (comment_ids is not None,)
+        self._spilled[post_id] = location
+        self._segment_posts[location[0]].add(post_id)
+        stored = 0
+        for comment_id, comment in subtree:
+            if comment is not None:
+                self._cold_comments[comment_id] = post_id
+                del comments[comment_id]
+                stored += 1
+        if comment_ids is not None:
+            del index[post_id]
+            self._spilled_indexes += 1
+        del posts[post_id]
+        self._moves += 1
+        if stored:
+            self._comment_bytes = (self._comment_bytes * 7 + size // (stored + 1)) // 8
+        self.spills += 1
+        for callback in self.on_spill:
+            callback(post_id)
+
+    def _compact(self):
+        # Copies the live posts of sparse segments into the active one, deleting the old files
+        for segment in self.segments.sparse_segments():
+            for post_id in self._segment_posts.pop(segment, ()):
+                location = self._spilled[post_id]
+                moved = self.segments.append(self.segments.read(location)) + location[3:]
+                self._spilled[post_id] = moved
+                self._segment_posts[moved[0]].add(post_id)
+                self.segments.release(location)
+
+    def stats(self):
+        with self._lock:
+            return {"resident posts": len(self._resident), "resident bytes": self.resident_bytes,
+                    "spilled posts": len(self._spilled), "spilled comments": len(self._cold_comments),
+                    "disk bytes": self.segments.disk_bytes(), "faults": self.faults, "spills": self.spills,
+                    "fault ms": self.fault_seconds / self.faults * 1000 if self.faults else 0.0}
+
+    def size(self):
+        """Returns (spilled posts, estimated bytes of the tier's own bookkeeping), for memory accounting."""
+        with self._lock:
+            return len(self._spilled), (sys.getsizeof(self._spilled) + sys.getsizeof(self._cold_comments)
+                                        + sys.getsizeof(self._resident)
+                                        + len(self._spilled) * _SPILLED_POST_BYTES
+                                        + len(self._cold_comments) * _SPILLED_COMMENT_BYTES
+                                        + len(self._resident) * _RESIDENT_POST_BYTES)
+
+
+class TieredStore(MutableMapping):
+    """
+        One of the stores under a ColdTier: resident entries in the wrapped mapping, the
+        rest faulted in from disk on access.
+
+        Lookups of posts count as accesses for the LRU order. Iterating items() reads
+        spilled entries from disk without making them resident.
+
+        Args:
+            tier (ColdTier): The tier.
+            hot (dict): The mapping of resident entries.
+            kind: POSTS, COMMENTS or INDEX.
+        """
+
+    def __init__(self, tier, hot, kind):
+        self._tier = tier
+        self._hot = hot
+        self._kind = kind
+
+    def __getitem__(self, key):
+        try:
+            value = self._hot[key]
+        except KeyError:
+            value = self._tier.fault(self._kind, key)
+        if self._kind == POSTS:
+            self._tier.touch(key, value)
+        return value
+
+    def get(self, key, default=None):
+        # The path of every store lookup: one probe of the hot mapping when the entry is resident
+        value = self._hot.get(key)
+        if value is None:
+            try:
+                value = self._tier.fault(self._kind, key)
+            except KeyError:
+                return default
+        if self._kind == POSTS:
+            self._tier.touch(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._tier.write(self._kind, key, value)
+
+    def __delitem__(self, key):
+        self._tier.delete(self._kind, key)
+
+    def __contains__(self, key):
+        return key in self._hot or self._tier.is_cold(self._kind, key)
+
+    def __iter__(self):
+        yield from list(self._hot)
+        yield from self._tier.cold_keys(self._kind)
+
+    def __len__(self):
+        return len(self._hot) + self._tier.cold_count(self._kind)
+
+    def items(self):
+        for key in list(self._hot):
+            value = self._hot.get(key)
+            if value is not None:
+                yield key, value
+        yield from self._tier.cold_items(self._kind)
+
+    def clear(self):
+        self._tier.clear()
+
+
+def benchmark(budget_mb=64, post_count=20_000, comments_per_post=40, requests=100_000, skew=1.2,
+              new_post_every=20, samples=20):
+    """
+        Replays a long-tail read workload against the stores, with or without tiering.
+
+        Posts are created continuously, and reads pick a post by its age rank from a Zipf
+        distribution, so most reads go to recent posts and a long tail reaches old ones.
+        Each read is a GetTopComments-style ranking. Run the variants in separate processes
+        (see __main__), since freed memory isn't reliably returned to the OS.
+
+        Args:
+            budget_mb (float): Memory budget; 0 keeps everything in memory.
+
+        Returns:
+            dict: Read latencies (hot and cold-fault percentiles), RSS samples and tier stats.
+        """
+    import bisect
+    import itertools
+    import random
+    import tempfile
+    import server
+    import topn_cache
+
+    rng = random.Random(1)
+    directory = tempfile.TemporaryDirectory()
+    if budget_mb:
+        tier = server.enable_tiering(directory.name, int(budget_mb * (1 << 20)))
+    else:
+        tier = None
+    text = "A comment of typical length, with a few words in it " * 2
+
+    def create(p):
+        post_id = f"p{p}"
+        server.store_post(post_id, Post(post_id=post_id, title=f"Post {p}", author=f"user{p % 997}"))
+        for c in range(comments_per_post):
+            comment_id = f"{post_id}-{c}"
+            server.store_comment(comment_id, Comment(comment_id=comment_id, post_id=post_id, text=text,
+                                                     author=f"user{c % 991}", score=rng.randrange(1000)))
+
+    start = time.perf_counter()
+    for p in range(post_count):
+        create(p)
+    load_time = time.perf_counter() - start
+    created = post_count
+    cumulative = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(post_count * 2)))
+
+    def read(post_id):
+        post = server.posts.get(post_id)
+        topn_cache.rank_comments(server.post_comments.get(post_id, []), server.comments, 10)
+        return post
+
+    hot, cold, rss = [], [], []
+    for i in range(requests):
+        if i % new_post_every == 0:
+            create(created)
+            created += 1
+        total = cumulative[created - 1]
+        rank = bisect.bisect_left(cumulative, rng.random() * total, 0, created - 1)
+        faults = tier.faults if tier else 0
+        start = time.perf_counter()
+        read(f"p{created - 1 - rank}")
+        elapsed = time.perf_counter() - start
+        (cold if tier and tier.faults > faults else hot).append(elapsed)
+        if i % (requests // samples) == 0:
+            rss.append(introspection.rss_bytes())
+
+    def percentiles(latencies):
+        latencies.sort()
+        return tuple(latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else 0.0
+                     for q in (0.5, 0.99))
+
+    results = {"hot ms": percentiles(hot), "cold ms": percentiles(cold), "cold reads": len(cold),
+               "rss mb": [r / (1 << 20) for r in rss], "load s": load_time}
+    label = f"budget {budget_mb} MB" if budget_mb else "no tiering"
+    print(f"{label}: {created:,} posts, {created * comments_per_post:,} comments, loaded in {load_time:.1f} s")
+    print(f"  hot reads  p50 {results['hot ms'][0]:.3f} ms  p99 {results['hot ms'][1]:.3f} ms  ({len(hot):,})")
+    if tier:
+        print(f"  cold reads p50 {results['cold ms'][0]:.3f} ms  p99 {results['cold ms'][1]:.3f} ms  ({len(cold):,}, "
+              f"{len(cold) / requests:.1%} of reads)")
+        print("  " + ", ".join(f"{name} {value:,.2f}" if isinstance(value, float) else f"{name} {value:,}"
+                               for name, value in tier.stats().items()))
+    steady = results["rss mb"][len(rss) // 2:]
+    print(f"  RSS {results['rss mb'][0]:.0f} MB after loading, steady state {min(steady):.0f}-{max(steady):.0f} MB")
+    if tier:
+        server.disable_tiering()
+    directory.cleanup()
+    return results
+
+
+if __name__ == '__main__':
+    benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 64)
@@ -0,0 +1,431 @@
+# Author - Akshita Patil
+
+import bisect
+import collections
+import contextvars
+import heapq
+import itertools
+import threading
+
+import grpc
+
+from data_model_pb2 import Comment
+
+"""
+    Materialized top-comment views for hot posts.
+
+    GetTopComments traffic concentrates on a few hot posts, and ranking a post's comments
+    on every request costs O(comments). TopCommentsViews keeps, for the most recently
+    requested posts, the post's best `depth + slack` comments in rank order, together
+    with their response messages already serialized.
+
+    Views are updated in place as comments are created and voted on, so they never go
+    stale; hiding a comment takes it out of its view. Ranking is by score, highest
+    first, with ties in creation order. Every
+    comment outside a view ranks below every comment inside it. A member voted down past
+    the bottom of its view leaves it, so a view can shrink. A view that no longer covers
+    a request is rebuilt from the post's comments on the next read.
+
+    Pre-encoded responses reach the wire through PreEncodedInterceptor, which lets the
+    comment-stream RPCs yield bytes instead of messages.
+    """
+
+# Set while a comment-stream handler may yield pre-encoded bytes
+_raw_responses = contextvars.ContextVar("raw_responses", default=False)
+
+_RAW_METHODS = ("/RedditService/GetTopComments", "/RedditService/GetTopCommentsBatched")
+
+
+def response_comment(comment_id, comment):
+    """Builds the GetTopComments response message of a stored comment."""
+    return Comment(
+        comment_id=comment_id,
+        text=comment.text,
+        author=comment.author,
+        score=comment.score,
+        hidden=comment.hidden,
+        publication_date=comment.publication_date,
+        replies_exist=False
+    )
+
+
+def rank_comments(comment_ids, comments, n, hidden=None):
+    """
+        Ranks a post's comments by score, highest first, ties in creation order.
+
+        Args:
+            comment_ids (list): The post's comment IDs in creation order.
+            comments: The comment store.
+            n (int): How many to return.
+            hidden (moderation.HiddenComments): Positions to skip without looking them up.
+
+        Returns:
+            list: (rank key, comment ID, comment) for the best n comments.
+        """
+    positions = enumerate(comment_ids)
+    if hidden is not None:
+        positions = itertools.compress(positions, itertools.chain(hidden.visible_mask(), itertools.repeat(1)))
+    candidates = []
+    for position, comment_id in positions:
+        comment = comments.get(comment_id)
+        if comment is not None:
+            candidates.append(((-comment.score, position), comment_id, comment))
+    return heapq.nsmallest(n, candidates, key=lambda candidate: candidate[0])
+
+
+def raw_responses_allowed():
+    return _raw_responses.get()
+
+
+class _View:
+    __slots__ = ("keys", "members", "encoded", "encoded_bytes", "total")
+
+    def __init__(self, ranked, total):
+        # Rank keys in order, the (key, comment) of each member, and cached encodings
+        self.keys = [(key, comment_id) for key, comment_id, _ in ranked]
+        self.members = {comment_id: (key, comment) for key, comment_id, comment in ranked}
+        self.encoded = {}
+        self.encoded_bytes = 0
+        self.total = total
+
+    def covers(self, n):
+        # True if the view holds the post's top n comments
+        return len(self.keys) >= n or len(self.keys) == self.total
+
+    def insert(self, key, comment_id, comment, limit):
+        bisect.insort(self.keys, (key, comment_id))
+        self.members[comment_id] = (key, comment)
+        if len(self.keys) > limit:
+            _, dropped = self.keys.pop()
+            del self.members[dropped]
+            self.forget_encoding(dropped)
+
+    def remove(self, comment_id):
+        key, _ = self.members.pop(comment_id)
+        del self.keys[bisect.bisect_left(self.keys, (key, comment_id))]
+        self.forget_encoding(comment_id)
+        return key
+
+    def forget_encoding(self, comment_id):
+        data = self.encoded.pop(comment_id, None)
+        if data is not None:
+            self.encoded_bytes -= len(data)
+
+
+class TopCommentsViews:
+    """
+        LRU cache of per-post materialized top-comment lists.
+
+        Args:
+            capacity (int): Posts with a view; the least recently read are evicted.
+            depth (int): Largest N served from a view; deeper requests are ranked on demand.
+            slack (int): Extra members kept so votes moving comments down rarely force a rebuild.
+        """
+
+    def __init__(self, capacity=1024, depth=100, slack=28):
+        self.capacity = capacity
+        self.depth = depth
+        self.limit = depth + slack
+        self.hits = 0
+        self.misses = 0
+        self._views = collections.OrderedDict()
+        # Posts whose view is being built -> whether they were written to meanwhile
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def ranked(self, post_id, n, comment_ids, comments, hidden=None):
+        """
+            Returns the top n visible comments of a post, from its view when it has one.
+
+            Args:
+                post_id (str): The post.
+                n (int): How many comments.
+                comment_ids (list): The post's comment IDs in creation order, for rebuilding.
+                comments: The comment store.
+                hidden (moderation.HiddenComments): The post's hidden comments, left out.
+
+            Returns:
+                tuple: The view the comments came from (None if ranked on demand) and a
+                list of (comment ID, comment), best first.
+            """
+        if n > self.depth:
+            return None, [(comment_id, comment)
+                          for _, comment_id, comment in rank_comments(comment_ids, comments, n, hidden)]
+
+        with self._lock:
+            view = self._views.get(post_id)
+            if view is not None and view.covers(n):
+                self._views.move_to_end(post_id)
+                self.hits += 1
+                return view, [(comment_id, view.members[comment_id][1]) for _, comment_id in view.keys[:n]]
+            self.misses += 1
+            self._building[post_id] = False
+
+        total = len(comment_ids) - (hidden.count if hidden is not None else 0)
+        view = _View(rank_comments(comment_ids, comments, self.limit, hidden), total)
+        with self._lock:
+            # A view ranked while the post was written to may have missed the write
+            if not self._building.pop(post_id, True):
+                self._views[post_id] = view
+                self._views.move_to_end(post_id)
+                if len(self._views) > self.capacity:
+                    self._views.popitem(last=False)
+        return view, [(comment_id, view.members[comment_id][1]) for _, comment_id in view.keys[:n]]
+
+    def responses(self, view, ranked, raw):
+        """
+            Builds the responses of ranked comments.
+
+            Args:
+                view: The view returned by ranked(), whose encodings are reused.
+                ranked (list): (comment ID, comment) pairs from ranked().
+                raw (bool): Return serialized responses instead of messages.
+
+            Returns:
+                list: Comment messages, or their serialized bytes when raw is set.
+            """
+        if not raw:
+            return [response_comment(comment_id, comment) for comment_id, comment in ranked]
+        if view is None:
+            return [response_comment(comment_id, comment).SerializeToString() for comment_id, comment in ranked]
+        with self._lock:
+            encoded = view.encoded
+            result = []
+            for comment_id, comment in ranked:
+                data = encoded.get(comment_id)
+                if data is None:
+                    data = response_comment(comment_id, comment).SerializeToString()
+                    if comment_id in view.members:
+                        encoded[comment_id] = data
+                        view.encoded_bytes += len(data)
+                result.append(data)
+            return result
+
+    def comment_added(self, post_id, comment_id, comment, position):
+        """
+            Updates a post's view after a comment is created.
+
+            Args:
+                post_id (str): The post of the comment.
+                comment_id (str): The new comment.
+                comment: The stored Comment.
+                position (int): Index of the comment in the post's comment list.
+            """
+        with self._lock:
+            view = self._written(post_id)
+            if view is None:
+                return
+            complete = len(view.keys) == view.total
+            view.total += 1
+            key = (-comment.score, position)
+            if complete or (view.keys and (key, comment_id) < view.keys[-1]):
+                view.insert(key, comment_id, comment, self.limit)
+
+    def comment_changed(self, post_id, comment_id, comment, position_of):
+        """
+            Updates a post's view after a comment's score changes.
+
+            Args:
+                post_id (str): The post of the comment.
+                comment_id (str): The voted comment.
+                comment: The stored Comment, already updated.
+                position_of (callable): Returns the comment's index in the post's comment
+                    list; only called when a comment outside the view may join it.
+            """
+        with self._lock:
+            view = self._written(post_id)
+            if view is None:
+                return
+            member = view.members.get(comment_id)
+            if member is not None:
+                old_worst = view.keys[-1]
+                key = (-comment.score, member[0][1])
+                view.remove(comment_id)
+                # Comments outside the view rank below its old bottom; past that, this one
+                # may have fallen behind them, so it leaves the view
+                if (key, comment_id) < old_worst or len(view.keys) + 1 == view.total:
+                    view.insert(key, comment_id, comment, self.limit)
+            elif view.keys and -comment.score <= view.keys[-1][0][0]:
+                key = (-comment.score, position_of())
+                if (key, comment_id) < view.keys[-1]:
+                    view.insert(key, comment_id, comment, self.limit)
+
+    def comment_removed(self, post_id, comment_id):
+        """
+            Updates a post's view after one of its comments is hidden.
+
+            Args:
+                post_id (str): The post of the comment.
+                comment_id (str): The hidden comment.
+            """
+        with self._lock:
+            view = self._written(post_id)
+            if view is None:
+                return
+            view.total -= 1
+            if comment_id in view.members:
+                view.remove(comment_id)
+
+    def discard(self, post_id):
+        """Drops a post's view, e.g. when the post is removed or a comment is replaced."""
+        with self._lock:
+            self._written(post_id)
+            self._views.pop(post_id, None)
+
+    def clear(self):
+        with self._lock:
+            for post_id in self._building:
+                self._building[post_id] = True
+            self._views.clear()
+
+    def _written(self, post_id):
+        if post_id in self._building:
+            self._building[post_id] = True
+        return self._views.get(post_id)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def size(self):
+        """Returns (views, estimated bytes), for memory accounting."""
+        with self._lock:
+            members = sum(len(view.keys) for view in self._views.values())
+            encoded = sum(view.encoded_bytes for view in self._views.values())
+            # Per member: two key tuples, the list slot and members dict entry, and an
+            # encoded bytes object header
+            return len(self._views), members * 240 + encoded
+
+
+def encode_batch(encoded_comments):
+    """Serializes a CommentBatch from already serialized comments."""
+    parts = []
+    for data in encoded_comments:
+        parts.append(b"\n" + _varint(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class PreEncodedInterceptor(grpc.ServerInterceptor):
+    """
+        Server interceptor that lets the comment-stream RPCs yield pre-encoded bytes.
+
+        Bytes pass through the response serializer unchanged; messages are serialized as
+        usual. Must be the last interceptor, so it wraps the original serializer.
+        """
+
+    def __init__(self):
+        self._wrapped = {}
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler_call_details.method not in _RAW_METHODS:
+            return handler
+        cached = self._wrapped.get(handler_call_details.method)
+        if cached is not None and cached[0] is handler:
+            return cached[1]
+
+        serializer = handler.response_serializer
+        behavior = handler.unary_stream
+
+        def passthrough(message):
+            return message if isinstance(message, bytes) else serializer(message)
+
+        wrapped = handler._replace(unary_stream=lambda request, context: _raw_stream(behavior, request, context),
+                                   response_serializer=passthrough)
+        self._wrapped[handler_call_details.method] = (handler, wrapped)
+        return wrapped
+
+
+def _raw_stream(behavior, request, context):
+    # Runs the handler's generator with raw responses allowed, one step at a time
+    token = _raw_responses.set(True)
+    try:
+        iterator = iter(behavior(request, context))
+    finally:
+        _raw_responses.reset(token)
+    while True:
+        token = _raw_responses.set(True)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _raw_responses.reset(token)
+        yield item
+
+
+def benchmark(post_count=500, comments_per_post=500, requests=20000, vote_fraction=0.1, skew=1.1):
+    """
+        Compares GetTopComments served from views with the on-demand path.
+
+        Runs an in-process server and a Zipf-skewed mix of top-comment reads (N of 10, 25
+        or 50) and VoteComment calls, first with views disabled, then enabled, through
+        both GetTopComments and GetTopCommentsBatched.
+
+        Returns:
+            dict: (configuration, method) -> (hit rate, p50 seconds, p99 seconds).
+        """
+    import random
+    import time
+    from concurrent import futures
+    from data_model_pb2 import Post, TopCommentsRequest, VoteRequest, VoteAction
+    from data_model_pb2_grpc import RedditServiceStub, add_RedditServiceServicer_to_server
+    import server
+
+    rng = random.Random(1)
+    for p in range(post_count):
+        post_id = f"p{p}"
+        server.store_post(post_id, Post(post_id=post_id))
+        for c in range(comments_per_post):
+            comment_id = f"{post_id}-{c}"
+            server.store_comment(comment_id, Comment(comment_id=comment_id, post_id=post_id, score=rng.randint(0, 100),
+                                                     text="A comment of typical length " * 3, author=f"user{c}"))
+    weights = [1 / (rank + 1) ** skew for rank in range(post_count)]
+    operations = [(rng.choices(range(post_count), weights)[0], rng.random() < vote_fraction, rng.choice((10, 25, 50)))
+                  for _ in range(requests)]
+
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), interceptors=[PreEncodedInterceptor()])
+    add_RedditServiceServicer_to_server(server.RedditServicer(), grpc_server)
+    port = grpc_server.add_insecure_port("localhost:0")
+    grpc_server.start()
+    stub = RedditServiceStub(grpc.insecure_channel(f"localhost:{port}"))
+    results = {}
+    try:
+        for method in ("GetTopComments", "GetTopCommentsBatched"):
+            for name, views in (("on demand", TopCommentsViews(capacity=0)), ("views", TopCommentsViews())):
+                server.top_views = views
+                call = getattr(stub, method)
+                latencies = []
+                for p, vote, n in operations:
+                    post_id = f"p{p}"
+                    if vote:
+                        comment_id = f"{post_id}-{rng.randrange(comments_per_post)}"
+                        stub.VoteComment(VoteRequest(post_id=post_id, comment_id=comment_id,
+                                                     action=rng.choice((VoteAction.UPVOTE, VoteAction.DOWNVOTE))))
+                        continue
+                    start = time.perf_counter()
+                    for _ in call(TopCommentsRequest(post_id=post_id, N=n)):
+                        pass
+                    latencies.append(time.perf_counter() - start)
+                latencies.sort()
+                p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+                results[name, method] = (views.hit_rate(), p50, p99)
+                print(f"{method:<22}{name:<10} hit rate {views.hit_rate():6.1%}  p50 {p50 * 1000:6.2f} ms  "
+                      f"p99 {p99 * 1000:6.2f} ms")
+    finally:
+        grpc_server.stop(None)
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,371 @@
+# Author - Akshita Patil
+
+import collections
+import contextvars
+import json
+import random
+import threading
+import time
+
+import grpc
+
+"""
+    Lightweight request tracing for the Reddit service.
+
+    A trace is a tree of spans: one root span per RPC, with child spans for the stages
+    inside it (store access, ranking, message construction, serialization, and every
+    message of a response stream). The current span is tracked in a context variable,
+    so servicer code only calls tracing.span("stage") and never passes spans around.
+
+    Sampling is decided once per trace, by the client when it sends trace metadata or
+    by the server's sample rate otherwise. Unsampled requests get a shared no-op span,
+    so tracing costs a context variable lookup per stage.
+
+    Trace context travels in gRPC metadata:
+
+        x-trace-id       128-bit trace ID (hex)
+        x-parent-span-id 64-bit ID of the caller's span (hex)
+        x-trace-sampled  "1" or "0"
+    """
+
+TRACE_ID_KEY = "x-trace-id"
+PARENT_SPAN_ID_KEY = "x-parent-span-id"
+SAMPLED_KEY = "x-trace-sampled"
+
+_current = contextvars.ContextVar("current_span", default=None)
+# Root span of the unary RPC being handled, ended once its response is serialized
+_unary_root = contextvars.ContextVar("unary_root", default=None)
+# Makes Span.end idempotent when the serializer and an RPC callback race to end a root
+_end_lock = threading.Lock()
+
+
+class Span:
+    """
+        A timed operation within a trace.
+
+        Use as a context manager, or call end() explicitly.
+        """
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes",
+                 "_token")
+    sampled = True
+
+    def __init__(self, tracer, name, trace_id, parent_id):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self._token = None
+
+    def child(self, name):
+        return Span(self.tracer, name, self.trace_id, self.span_id)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        with _end_lock:
+            if self.end_ns is not None:
+                return
+            self.end_ns = time.perf_counter_ns()
+        self.tracer.exporter.export(self)
+
+    def metadata(self):
+        """Returns the gRPC metadata that continues this trace in a downstream call."""
+        return ((TRACE_ID_KEY, self.trace_id), (PARENT_SPAN_ID_KEY, self.span_id), (SAMPLED_KEY, "1"))
+
+    @property
+    def duration_us(self):
+        return ((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1000
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_us": round(self.duration_us, 3),
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _current.reset(self._token)
+        self.end()
+
+
+class _NoopSpan:
+    # Stands in for spans of unsampled traces; every operation does nothing
+    __slots__ = ()
+    sampled = False
+
+    def child(self, name):
+        return self
+
+    def set_attribute(self, key, value):
+        pass
+
+    def end(self):
+        pass
+
+    def metadata(self):
+        return ((SAMPLED_KEY, "0"),)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name):
+    """
+        Opens a child span of the current span.
+
+        Args:
+            name (str): The stage being timed, e.g. 'store.lookup'.
+
+        Returns:
+            A span to use as a context manager; a no-op span when the request isn't sampled.
+        """
+    current = _current.get()
+    if current is None:
+        return NOOP_SPAN
+    return current.child(name)
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+class InMemoryExporter:
+    """Keeps the most recent finished spans in memory, for tests and debugging."""
+
+    def __init__(self, max_spans=10000):
+        self.spans = collections.deque(maxlen=max_spans)
+
+    def export(self, finished):
+        self.spans.append(finished)
+
+    def traces(self):
+        """Groups the retained spans by trace ID."""
+        grouped = {}
+        for finished in self.spans:
+            grouped.setdefault(finished.trace_id, []).append(finished)
+        return grouped
+
+    def close(self):
+        pass
+
+
+class FileExporter:
+    """
+        Appends finished spans to a file as JSON lines.
+
+        Args:
+            path (str): The file to append to.
+            flush_every (int): Spans buffered between flushes.
+        """
+
+    def __init__(self, path, flush_every=100):
+        self._file = open(path, "a", buffering=1 << 16)
+        self._lock = threading.Lock()
+        self._flush_every = flush_every
+        self._pending = 0
+
+    def export(self, finished):
+        line = json.dumps(finished.to_dict(), separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= self._flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """
+        Starts traces and sends their finished spans to an exporter.
+
+        Args:
+            exporter: Object with an export(span) method.
+            sample_rate (float): Fraction of new traces to sample, between 0 and 1.
+        """
+
+    def __init__(self, exporter, sample_rate=1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_trace(self, name, trace_id=None, parent_id=None, sampled=None):
+        """
+            Starts the root span of a trace, or continues a remote one.
+
+            Args:
+                name (str): Name of the root span.
+                trace_id (str): ID of the remote trace being continued.
+                parent_id (str): ID of the remote parent span.
+                sampled (bool): The caller's sampling decision; None to decide here.
+
+            Returns:
+                Span: The root span, or NOOP_SPAN if the trace isn't sampled.
+            """
+        if sampled is None:
+            sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        if not sampled:
+            return NOOP_SPAN
+        return Span(self, name, trace_id or f"{random.getrandbits(128):032x}", parent_id)
+
+    def start_from_metadata(self, name, metadata):
+        """Starts the server-side root span of an RPC from its invocation metadata."""
+        trace_id = parent_id = sampled = None
+        for key, value in metadata or ():
+            if key == TRACE_ID_KEY:
+                trace_id = value
+            elif key == PARENT_SPAN_ID_KEY:
+                parent_id = value
+            elif key == SAMPLED_KEY:
+                sampled = value == "1"
+        return self.start_trace(name, trace_id, parent_id, sampled)
+
+
+class TracingInterceptor(grpc.ServerInterceptor):
+    """
+        Server interceptor that opens a root span per RPC.
+
+        Unary responses get a 'serialize' child span. For response streams, each message
+        gets a 'stream.send' span covering the time the handler is suspended at its
+        yield (serialization and the wait on the stream writer), with 'serialize' inside.
+
+        Args:
+            tracer (Tracer): The tracer to start spans with.
+        """
+
+    def __init__(self, tracer):
+        self._tracer = tracer
+        self._wrapped = {}
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler.request_streaming:
+            return handler
+        cached = self._wrapped.get(handler_call_details.method)
+        if cached is not None and cached[0] is handler:
+            return cached[1]
+
+        name = handler_call_details.method.rsplit("/", 1)[-1]
+        serializer = _traced_serializer(handler.response_serializer)
+        if handler.response_streaming:
+            wrapped = handler._replace(unary_stream=self._trace_stream(name, handler.unary_stream),
+                                       response_serializer=serializer)
+        else:
+            wrapped = handler._replace(unary_unary=self._trace_unary(name, handler.unary_unary),
+                                       response_serializer=serializer)
+        self._wrapped[handler_call_details.method] = (handler, wrapped)
+        return wrapped
+
+    def _trace_unary(self, name, behavior):
+        tracer = self._tracer
+
+        def traced(request, context):
+            root = tracer.start_from_metadata(name, context.invocation_metadata())
+            if not root.sampled:
+                # Clear whatever an earlier RPC on this pool thread left behind, so neither
+                # the handler nor the serializer attaches to a stale trace
+                _current.set(None)
+                _unary_root.set(None)
+                return behavior(request, context)
+            # The root stays current until the response has been serialized. gRPC skips the
+            # serializer when the call is cancelled or times out, so the root is also ended
+            # when the RPC terminates; whichever comes first ends it.
+            _current.set(root)
+            _unary_root.set(root)
+            context.add_callback(root.end)
+            try:
+                return behavior(request, context)
+            except BaseException as e:
+                root.set_attribute("error", type(e).__name__)
+                _unary_root.set(None)
+                _current.set(None)
+                root.end()
+                raise
+
+        return traced
+
+    def _trace_stream(self, name, behavior):
+        tracer = self._tracer
+
+        def traced(request, context):
+            root = tracer.start_from_metadata(name, context.invocation_metadata())
+            if not root.sampled:
+                return behavior(request, context)
+            return _traced_stream(root, behavior, request, context)
+
+        return traced
+
+
+def _traced_stream(root, behavior, request, context):
+    messages = 0
+    try:
+        token = _current.set(root)
+        try:
+            iterator = iter(behavior(request, context))
+        finally:
+            _current.reset(token)
+        while True:
+            token = _current.set(root)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            send = root.child("stream.send")
+            send.set_attribute("index", messages)
+            messages += 1
+            token = _current.set(send)
+            try:
+                yield item
+            finally:
+                _current.reset(token)
+                send.end()
+    finally:
+        root.set_attribute("messages", messages)
+        root.end()
+
+
+def _traced_serializer(serializer):
+    def traced(message):
+        current = _current.get()
+        if current is None:
+            return serializer(message)
+        try:
+            with current.child("serialize") as serialize:
+                data = serializer(message)
+                serialize.set_attribute("bytes", len(data))
+            return data
+        finally:
+            root = _unary_root.get()
+            if root is not None:
+                # Serializing a unary response is the last stage of its RPC
+                _unary_root.set(None)
+                _current.set(None)
+                root.end()
+
+    return traced
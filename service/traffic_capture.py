@@ -0,0 +1,318 @@
+# Author - Akshita Patil
+
+import argparse
+import queue
+import random
+import struct
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from google.protobuf import descriptor_pb2
+
+import data_model_pb2
+from data_model_pb2_grpc import RedditServiceStub
+
+"""
+    Traffic capture and deterministic replay for performance regression testing.
+
+    CaptureInterceptor records the raw request bytes of incoming RPCs, as they arrive
+    off the wire, to a compact binary file. Requests are never re-serialized, and the
+    file is written by a background thread through a bounded queue, so capture costs
+    a queue put per sampled request and drops records rather than slowing the server.
+
+    File layout (little-endian):
+
+        header  b"RDTCAP1\\n", start time (double, Unix seconds), method count (uint16),
+                then each method name as uint16 length + UTF-8 bytes
+        record  method index (uint8), gap since previous record in microseconds (uint32),
+                request length (uint32), request bytes
+
+    replay() drives a RedditServiceStub with a capture at 1x, Nx or maximum speed and
+    returns per-method latencies; compare() lines up the distributions of two builds.
+    """
+
+MAGIC = b"RDTCAP1\n"
+_HEADER = struct.Struct("<dH")
+_NAME_LENGTH = struct.Struct("<H")
+_RECORD = struct.Struct("<BII")
+_MAX_GAP_US = 0xFFFFFFFF
+
+_SERVICE = data_model_pb2.DESCRIPTOR.services_by_name["RedditService"]
+
+# The client-facing RPCs; admin and replication streams are not worth replaying
+DEFAULT_METHODS = (
+    "CreatePost", "VotePost", "GetPostContent", "CreateComment",
+    "VoteComment", "GetTopComments", "ExpandCommentBranch", "MonitorUpdates",
+    "GetTopCommentsBatched", "ExpandCommentBranchBatched", "GetUserActivity", "GetTrendingPosts",
+)
+
+
+def _method_info(name):
+    method = _SERVICE.methods_by_name[name]
+    method_proto = descriptor_pb2.MethodDescriptorProto()
+    method.CopyToProto(method_proto)
+    return getattr(data_model_pb2, method.input_type.name), method_proto.server_streaming
+
+
+class CaptureWriter:
+    """
+        Writes capture records to a file from a background thread.
+
+        Args:
+            path (str): Destination capture file.
+            methods: Names of the RPCs that may be recorded.
+            max_pending (int): Records buffered before new ones are dropped.
+            flush_interval (float): Seconds between flushes to disk.
+        """
+
+    def __init__(self, path, methods=DEFAULT_METHODS, max_pending=65536, flush_interval=1.0):
+        self.methods = list(methods)
+        self.recorded = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._flush_interval = flush_interval
+        self._file = open(path, "wb", buffering=1 << 20)
+        self._file.write(MAGIC + _HEADER.pack(time.time(), len(self.methods)))
+        for name in self.methods:
+            encoded = name.encode("utf-8")
+            self._file.write(_NAME_LENGTH.pack(len(encoded)) + encoded)
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def record(self, method_index, data):
+        """
+            Queues one request for writing; drops it if the writer has fallen behind.
+
+            Args:
+                method_index (int): Index of the RPC in self.methods.
+                data (bytes): The serialized request.
+            """
+        try:
+            self._queue.put_nowait((method_index, time.perf_counter_ns(), data))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def _run(self):
+        previous = None
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                method_index, timestamp, data = item
+                gap_us = 0 if previous is None else min((timestamp - previous) // 1000, _MAX_GAP_US)
+                previous = timestamp
+                self._file.write(_RECORD.pack(method_index, gap_us, len(data)))
+                self._file.write(data)
+                self.recorded += 1
+            if time.monotonic() - last_flush >= self._flush_interval:
+                self._file.flush()
+                last_flush = time.monotonic()
+        self._file.flush()
+
+
+class CaptureInterceptor(grpc.ServerInterceptor):
+    """
+        Server interceptor that records a sample of incoming requests.
+
+        Requests are captured by wrapping the handler's request deserializer, so the bytes
+        recorded are exactly the bytes received.
+
+        Args:
+            writer (CaptureWriter): Where sampled requests are written.
+            sample_rate (float): Fraction of requests to record, between 0 and 1.
+        """
+
+    def __init__(self, writer, sample_rate=1.0):
+        self._writer = writer
+        self._sample_rate = sample_rate
+        self._indexes = {f"/RedditService/{name}": i for i, name in enumerate(writer.methods)}
+        self._wrapped = {}
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        method_index = self._indexes.get(handler_call_details.method)
+        if handler is None or method_index is None:
+            return handler
+
+        cached = self._wrapped.get(handler_call_details.method)
+        if cached is not None and cached[0] is handler:
+            return cached[1]
+
+        deserializer = handler.request_deserializer
+        writer = self._writer
+        sample_rate = self._sample_rate
+
+        def capture(data):
+            if sample_rate >= 1.0 or random.random() < sample_rate:
+                writer.record(method_index, data)
+            return deserializer(data)
+
+        wrapped = handler._replace(request_deserializer=capture)
+        self._wrapped[handler_call_details.method] = (handler, wrapped)
+        return wrapped
+
+
+def read_capture(path):
+    """
+        Reads a capture file.
+
+        Args:
+            path (str): The capture file.
+
+        Yields:
+            tuple: (method name, seconds since the first record, request bytes).
+
+        Raises:
+            ValueError: If the file is not a capture file or is truncated.
+        """
+    with open(path, "rb", buffering=1 << 20) as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a traffic capture")
+        _, count = _HEADER.unpack(fh.read(_HEADER.size))
+        methods = []
+        for _ in range(count):
+            (length,) = _NAME_LENGTH.unpack(fh.read(_NAME_LENGTH.size))
+            methods.append(fh.read(length).decode("utf-8"))
+
+        offset_us = 0
+        while True:
+            header = fh.read(_RECORD.size)
+            if not header:
+                return
+            if len(header) != _RECORD.size:
+                raise ValueError("Truncated capture record")
+            method_index, gap_us, length = _RECORD.unpack(header)
+            data = fh.read(length)
+            if len(data) != length:
+                raise ValueError("Truncated capture record")
+            offset_us += gap_us
+            yield methods[method_index], offset_us / 1e6, data
+
+
+def replay(path, stub, speed=1.0, concurrency=32, timeout=10.0):
+    """
+        Replays a capture against a server and measures the latency of each call.
+
+        Calls are issued open-loop on their original schedule divided by speed, so a
+        slow server doesn't slow the offered load. speed=None replays as fast as the
+        worker pool allows.
+
+        Args:
+            path (str): The capture file.
+            stub (RedditServiceStub): Stub of the server under test.
+            speed (float): Replay speed multiplier, or None for maximum speed.
+            concurrency (int): Maximum calls in flight.
+            timeout (float): Deadline of each call in seconds.
+
+        Returns:
+            dict: Method name -> list of latencies in seconds (failed calls excluded).
+        """
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    method_info = {}
+
+    def call(name, data):
+        request_class, server_streaming = method_info[name]
+        request = request_class.FromString(data)
+        start = time.perf_counter()
+        try:
+            response = getattr(stub, name)(request, timeout=timeout)
+            if server_streaming:
+                for _ in response:
+                    pass
+        except grpc.RpcError:
+            with lock:
+                errors[name] = errors.get(name, 0) + 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(name, []).append(elapsed)
+
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        pending = []
+        for name, offset, data in read_capture(path):
+            if name not in method_info:
+                method_info[name] = _method_info(name)
+            if speed:
+                delay = start + offset / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pending.append(pool.submit(call, name, data))
+            if len(pending) >= concurrency * 4:
+                # Keep the backlog bounded when replaying faster than the server answers
+                futures.wait(pending[:concurrency])
+                pending = [p for p in pending if not p.done()]
+        futures.wait(pending)
+
+    for name, count in errors.items():
+        print(f"{name}: {count} failed calls")
+    return latencies
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def compare(baseline, candidate, fractions=(0.5, 0.9, 0.99)):
+    """
+        Compares the latency distributions of two replays, method by method.
+
+        Args:
+            baseline (dict): Latencies from replay() against the baseline build.
+            candidate (dict): Latencies from replay() against the candidate build.
+            fractions: The percentiles to compare.
+
+        Returns:
+            list: One (method, percentile, baseline seconds, candidate seconds, change)
+            tuple per method and percentile; change is the relative difference.
+        """
+    rows = []
+    for name in sorted(set(baseline) | set(candidate)):
+        for fraction in fractions:
+            before = percentile(baseline.get(name, []), fraction)
+            after = percentile(candidate.get(name, []), fraction)
+            change = (after - before) / before if before else 0.0
+            rows.append((name, fraction, before, after, change))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'method':<22}{'pct':>6}{'baseline ms':>14}{'candidate ms':>14}{'change':>10}")
+    for name, fraction, before, after, change in rows:
+        print(f"{name:<22}{'p' + format(fraction * 100, 'g'):>6}{before * 1000:>14.3f}{after * 1000:>14.3f}"
+              f"{change:>+10.1%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay captured traffic against one or two servers")
+    parser.add_argument("capture")
+    parser.add_argument("--target", default="localhost:50053", help="server under test (the baseline build)")
+    parser.add_argument("--compare", metavar="HOST:PORT", help="second server (the candidate build)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    parser.add_argument("--max-speed", action="store_true", help="replay as fast as possible")
+    args = parser.parse_args()
+
+    speed = None if args.max_speed else args.speed
+    baseline = replay(args.capture, RedditServiceStub(grpc.insecure_channel(args.target)), speed)
+    if args.compare:
+        candidate = replay(args.capture, RedditServiceStub(grpc.insecure_channel(args.compare)), speed)
+        print_comparison(compare(baseline, candidate))
+    else:
+        print_comparison(compare(baseline, baseline))
@@ -0,0 +1,254 @@
+# Author - Akshita Patil
+
+import bisect
+import collections
+import sys
+import threading
+import time
+from array import array
+
+from data_model_pb2 import FIVE_MINUTES, ONE_HOUR, ONE_DAY
+
+"""
+    Vote velocity of posts, and the posts trending over sliding windows.
+
+    Every voted post has one fixed-size array of counters. For each window it holds a ring
+    of time buckets: 10 of 30 s for five minutes, 12 of 5 minutes for an hour and 24 of an
+    hour for a day. At the end come the post's net votes in each window. A vote adds to the
+    current bucket of each ring and to each total, in O(1).
+
+    Votes leave a window when their bucket slides out of it. Each window queues the posts
+    voted on in each of its buckets. When a bucket expires, only those posts' slots are
+    cleared and subtracted from their totals. Nothing is rescanned, and each vote is expired
+    once per window.
+
+    Each window ranks posts by net votes in an ordered index: posts grouped by total, plus
+    the distinct totals in a sorted list. A change of total moves one post between groups.
+    Reading the top k walks down from the highest total, in O(k + totals visited). Within a
+    total, the post that reached it last comes first.
+    """
+
+# Window -> (seconds per bucket, buckets)
+WINDOWS = {
+    FIVE_MINUTES: (30, 10),
+    ONE_HOUR: (300, 12),
+    ONE_DAY: (3600, 24),
+}
+
+# Counters per post: every ring, then one total per window
+_SLOTS = sum(buckets for _, buckets in WINDOWS.values()) + len(WINDOWS)
+_ZEROS = bytes(array("i").itemsize * _SLOTS)
+# Per voted post: its counter array and dict slot
+_POST_BYTES = sys.getsizeof(array("i", _ZEROS)) + 3 * 8
+# Per post ranked in a window, and per post queued for expiry in a bucket: a dict or set slot
+_RANKED_BYTES = 3 * 8
+_QUEUED_BYTES = 2 * 8
+
+
+class _Window:
+    __slots__ = ("bucket_seconds", "buckets", "offset", "total_slot", "expiring", "groups", "totals", "last_bucket")
+
+    def __init__(self, bucket_seconds, buckets, offset, total_slot):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        # Where the window's ring and total sit in a post's counters
+        self.offset = offset
+        self.total_slot = total_slot
+        # (bucket number, IDs of the posts voted on in it), oldest first
+        self.expiring = collections.deque()
+        # Net votes -> {post ID: None} in the order the posts reached it, for totals above 0
+        self.groups = {}
+        self.totals = []
+        self.last_bucket = 0
+
+    def move(self, post_id, old, new):
+        # Re-ranks a post whose total changed
+        if old > 0:
+            group = self.groups[old]
+            del group[post_id]
+            if not group:
+                del self.groups[old]
+                del self.totals[bisect.bisect_left(self.totals, old)]
+        if new > 0:
+            group = self.groups.get(new)
+            if group is None:
+                group = self.groups[new] = {}
+                bisect.insort(self.totals, new)
+            group[post_id] = None
+
+
+class TrendingIndex:
+    """
+        Per-post vote counters over time buckets, and the top posts of each window.
+
+        Args:
+            clock (callable): Current time in seconds.
+        """
+
+    def __init__(self, clock=time.time):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._counters = {}
+            self._windows = {}
+            offset = 0
+            for total_slot, (window, (bucket_seconds, buckets)) in enumerate(WINDOWS.items(), _SLOTS - len(WINDOWS)):
+                self._windows[window] = _Window(bucket_seconds, buckets, offset, total_slot)
+                offset += buckets
+
+    def vote(self, post_id, delta):
+        """
+            Counts a vote on a post.
+
+            Args:
+                post_id (str): The voted post.
+                delta (int): +1 for an upvote, -1 for a downvote.
+            """
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            counters = self._counters.get(post_id)
+            if counters is None:
+                counters = self._counters[post_id] = array("i", _ZEROS)
+            for window in self._windows.values():
+                # Never behind the newest queued bucket, even if the clock steps back
+                bucket = window.last_bucket = max(int(now // window.bucket_seconds), window.last_bucket)
+                counters[window.offset + bucket % window.buckets] += delta
+                total = counters[window.total_slot]
+                counters[window.total_slot] = total + delta
+                window.move(post_id, total, total + delta)
+                if window.expiring and window.expiring[-1][0] == bucket:
+                    window.expiring[-1][1].add(post_id)
+                else:
+                    window.expiring.append((bucket, {post_id}))
+
+    def _expire(self, now):
+        # Subtracts the buckets that slid out of each window from the posts voted on in them
+        for window in self._windows.values():
+            cutoff = int(now // window.bucket_seconds) - window.buckets
+            while window.expiring and window.expiring[0][0] <= cutoff:
+                bucket, post_ids = window.expiring.popleft()
+                slot = window.offset + bucket % window.buckets
+                for post_id in post_ids:
+                    counters = self._counters.get(post_id)
+                    if counters is None or not counters[slot]:
+                        continue
+                    total = counters[window.total_slot]
+                    counters[window.total_slot] = total - counters[slot]
+                    window.move(post_id, total, total - counters[slot])
+                    counters[slot] = 0
+                    if not any(counters):
+                        # Votes of the post all expired; it costs nothing until voted on again
+                        del self._counters[post_id]
+
+    def remove(self, post_id):
+        """Forgets a removed post."""
+        with self._lock:
+            counters = self._counters.pop(post_id, None)
+            if counters is not None:
+                for window in self._windows.values():
+                    window.move(post_id, counters[window.total_slot], 0)
+
+    def votes(self, post_id, window):
+        """Net votes of a post over a window."""
+        with self._lock:
+            self._expire(self._clock())
+            counters = self._counters.get(post_id)
+            return 0 if counters is None else counters[self._windows[window].total_slot]
+
+    def top(self, window, count, accept=None):
+        """
+            Returns the posts with the most net votes over a window.
+
+            Args:
+                window: FIVE_MINUTES, ONE_HOUR or ONE_DAY.
+                count (int): Maximum posts.
+                accept (callable): Takes a post ID; posts it rejects (e.g. hidden ones) are
+                    skipped without counting towards `count`.
+
+            Returns:
+                list: (post ID, net votes) pairs, most votes first. Only posts that gained
+                votes on balance are ranked.
+
+            Raises:
+                KeyError: If the window is unknown.
+            """
+        with self._lock:
+            self._expire(self._clock())
+            ranked = self._windows[window]
+            result = []
+            for total in reversed(ranked.totals):
+                for post_id in reversed(ranked.groups[total]):
+                    if accept is None or accept(post_id):
+                        result.append((post_id, total))
+                        if len(result) >= count:
+                            return result
+            return result
+
+    def size(self):
+        """Returns (voted posts, estimated bytes), for memory accounting."""
+        with self._lock:
+            ranked = sum(len(group) for window in self._windows.values() for group in window.groups.values())
+            queued = sum(len(post_ids) for window in self._windows.values() for _, post_ids in window.expiring)
+            return len(self._counters), (sys.getsizeof(self._counters) + len(self._counters) * _POST_BYTES
+                                         + ranked * _RANKED_BYTES + queued * _QUEUED_BYTES)
+
+
+def benchmark(posts=100_000, votes=1_000_000, skew=1.1, seconds=2 * 86400, queries=2000, k=25):
+    """
+        Replays a stream of votes spread over simulated time and measures the cost per
+        vote, the memory per voted post and the latency of a top-k query. Compares the
+        query with ranking every post by rescanning its counters.
+
+        Returns:
+            dict: Measurements by name.
+        """
+    import random
+
+    rng = random.Random(1)
+    weights = [1 / (rank + 1) ** skew for rank in range(posts)]
+    post_ids = [str(i) for i in range(posts)]
+    # The popular posts change over time: each draw is shifted by a drifting offset
+    drawn = rng.choices(range(posts), weights, k=votes)
+    now = [0.0]
+    index = TrendingIndex(clock=lambda: now[0])
+    step = seconds / votes
+
+    start = time.perf_counter()
+    for i, rank in enumerate(drawn):
+        now[0] = i * step
+        index.vote(post_ids[(rank + i // 50_000) % posts], 1 if rng.random() < 0.8 else -1)
+    vote_time = (time.perf_counter() - start) / votes
+    voted, estimated = index.size()
+
+    start = time.perf_counter()
+    for i in range(queries):
+        index.top(list(WINDOWS)[i % len(WINDOWS)], k)
+    query_time = (time.perf_counter() - start) / queries
+
+    def rescan(window):
+        total_slot = index._windows[window].total_slot
+        return sorted(((counters[total_slot], post_id) for post_id, counters in index._counters.items()),
+                      reverse=True)[:k]
+
+    start = time.perf_counter()
+    for window in WINDOWS:
+        rescan(window)
+    rescan_time = (time.perf_counter() - start) / len(WINDOWS)
+    for window in WINDOWS:
+        expected = [total for total, _ in rescan(window) if total > 0]
+        assert [total for _, total in index.top(window, k)] == expected
+
+    results = {"vote us": vote_time * 1e6, "bytes/post": estimated / max(voted, 1), "query us": query_time * 1e6,
+               "rescan ms": rescan_time * 1000}
+    print(f"{votes:,} votes over {seconds / 3600:.0f} h on {posts:,} posts: {results['vote us']:.2f} us per vote, "
+          f"{voted:,} posts with live votes at {results['bytes/post']:.0f} B each")
+    print(f"top {k}: {results['query us']:.1f} us from the index, {results['rescan ms']:.1f} ms rescanning counters")
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()